@@ -0,0 +1,212 @@
+import math
+import time
+
+import numpy as np
+
+from primitives import Point, Line, Arc
+
+# Maximum absolute deviation (mm, rad) between StrafeBatch and the scalar Strafe
+# for the same parameters. The scalar path round-trips the tangent angle through
+# degrees, so results agree to rounding noise, well below this bound.
+BATCH_TOLERANCE = 1e-9
+
+
+class TraceArrays:
+    """Structure-of-arrays geometry of one trace (minus or plus) for a batch of strafes.
+
+    Arc columns follow the scalar primitive order: [:, 0] is the first bend,
+    [:, 1] the second bend. The tangent line joins the two bends.
+    """
+
+    def __init__(self, n: int):
+        self.start_x = np.zeros(n)
+        self.start_y = np.zeros(n)
+        self.end_x = np.zeros(n)
+        self.end_y = np.zeros(n)
+
+        self.arc_center_x = np.zeros((n, 2))
+        self.arc_center_y = np.zeros((n, 2))
+        self.arc_radius = np.zeros((n, 2))
+        self.arc_start_angle = np.zeros((n, 2))
+        self.arc_end_angle = np.zeros((n, 2))
+
+        self.line_start_x = np.zeros(n)
+        self.line_start_y = np.zeros(n)
+        self.line_end_x = np.zeros(n)
+        self.line_end_y = np.zeros(n)
+
+        self.arc_length = np.zeros((n, 2))
+        self.line_length = np.zeros(n)
+        self.trace_length = np.zeros(n)
+
+    def arc_sweep_angle(self):
+        # Swept angle as drawn, normalized to [-π, π] like Arc.get_sweep_angle
+        return np.remainder(self.arc_end_angle - self.arc_start_angle + math.pi, 2 * math.pi) - math.pi
+
+    def arc_exit_points(self):
+        return (self.arc_center_x + self.arc_radius * np.cos(self.arc_end_angle),
+                self.arc_center_y + self.arc_radius * np.sin(self.arc_end_angle))
+
+    def primitives(self, i: int, trace_width: float):
+        # Materialize row i as scalar primitives, in the same order as Strafe
+        arcs = [Arc(Point(float(self.arc_center_x[i, k]), float(self.arc_center_y[i, k])),
+                    float(self.arc_radius[i, k]),
+                    float(self.arc_start_angle[i, k]),
+                    float(self.arc_end_angle[i, k]),
+                    trace_width) for k in range(2)]
+        line = Line(Point(float(self.line_start_x[i]), float(self.line_start_y[i])),
+                    Point(float(self.line_end_x[i]), float(self.line_end_y[i])),
+                    trace_width)
+        return arcs + [line]
+
+
+# StrafeBatch computes the geometry of many strafes in one vectorized pass.
+# Parameters are broadcast against each other, so scalars and arrays can be mixed:
+# - trace_width, trace_gap, offset_x, radius_scale, middle_tangent_angle: as for Strafe
+# - start_x, start_y: starting point of each pair (defaults to the origin)
+
+class StrafeBatch:
+    def __init__(self, trace_width, trace_gap, offset_x, radius_scale, middle_tangent_angle, start_x=0.0, start_y=0.0):
+        (self.trace_width, self.trace_gap, self.offset_x, self.radius_scale,
+         self.middle_tangent_angle, self.start_x, self.start_y) = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(value, dtype=float)) for value in
+              (trace_width, trace_gap, offset_x, radius_scale, middle_tangent_angle, start_x, start_y)))
+
+        self.offset_dir = self.offset_x >= 0
+
+        self.minus = TraceArrays(len(self))
+        self.plus = TraceArrays(len(self))
+
+        self.calculate_trace()
+        self.calculate_trace_length()
+
+    def __len__(self):
+        return self.offset_x.shape[0]
+
+    def calculate_trace(self):
+        right = self.offset_dir
+        angle = self.middle_tangent_angle
+        half_center_width = self.trace_width / 2 + self.trace_gap / 2
+
+        self.minus.start_x = self.start_x - half_center_width
+        self.plus.start_x = self.start_x + half_center_width
+        self.minus.start_y = self.start_y.copy()
+        self.plus.start_y = self.start_y.copy()
+
+        trace_center_width = np.fabs(self.plus.start_x - self.minus.start_x)
+
+        self.small_radius = np.fabs(self.offset_x * self.radius_scale)
+        self.big_radius = self.small_radius + trace_center_width
+
+        first_bend_center_x = np.where(right, self.plus.start_x + self.small_radius, self.minus.start_x - self.small_radius)
+        second_bend_center_x = np.where(right,
+                                        self.offset_x + trace_center_width / 2 - self.big_radius,
+                                        self.offset_x - trace_center_width / 2 + self.big_radius)
+        second_bend_center_y = np.fabs(self.offset_x * 2)
+
+        first_start = np.where(right, math.pi, 0.0)
+        first_end = np.where(right, -math.pi - angle, angle)
+        second_start = np.where(right, 0.0, math.pi)
+        second_end = np.where(right, -(2 * math.pi) - angle, math.pi + angle)
+
+        # The inner trace of each bend gets the small radius
+        minus_radius = (np.where(right, self.big_radius, self.small_radius),
+                        np.where(right, self.small_radius, self.big_radius))
+        plus_radius = (minus_radius[1], minus_radius[0])
+
+        for trace, radius in ((self.minus, minus_radius), (self.plus, plus_radius)):
+            trace.arc_center_x = np.stack((first_bend_center_x, second_bend_center_x), axis=1)
+            trace.arc_center_y = np.stack((self.start_y, second_bend_center_y), axis=1)
+            trace.arc_radius = np.stack(radius, axis=1)
+            trace.arc_start_angle = np.stack((first_start, second_start), axis=1)
+            trace.arc_end_angle = np.stack((first_end, second_end), axis=1)
+            self._calculate_tangent_line(trace)
+
+    def _calculate_tangent_line(self, trace: TraceArrays):
+        # Same construction as Strafe.calculate_trace: a unit tangent at the exit of
+        # the first bend, extended to the exit x of the second bend, which is then
+        # shifted in y so that it meets the line.
+        exit_x, exit_y = trace.arc_exit_points()
+        tangent_angle = trace.arc_end_angle[:, 0] + math.pi / 2
+        tangent_end_x = exit_x[:, 0] + np.cos(tangent_angle)
+        tangent_end_y = exit_y[:, 0] + np.sin(tangent_angle)
+
+        target_x = exit_x[:, 1]
+        vertical = exit_x[:, 0] == tangent_end_x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (tangent_end_y - exit_y[:, 0]) / (tangent_end_x - exit_x[:, 0])
+            intersect_y = slope * (target_x - exit_x[:, 0]) + exit_y[:, 0]
+
+        trace.line_start_x = np.where(vertical, target_x, exit_x[:, 0])
+        trace.line_start_y = exit_y[:, 0]
+        trace.line_end_x = target_x
+        trace.line_end_y = np.where(vertical, tangent_end_y, intersect_y)
+
+        trace.arc_center_y[:, 1] -= exit_y[:, 1] - trace.line_end_y
+
+        trace.end_x = trace.arc_center_x[:, 1] + trace.arc_radius[:, 1] * np.cos(trace.arc_start_angle[:, 1])
+        trace.end_y = trace.arc_center_y[:, 1] + trace.arc_radius[:, 1] * np.sin(trace.arc_start_angle[:, 1])
+
+    def calculate_trace_length(self):
+        for trace in (self.minus, self.plus):
+            trace.arc_length = trace.arc_radius * np.fabs(trace.arc_sweep_angle())
+            trace.line_length = np.hypot(trace.line_end_x - trace.line_start_x, trace.line_end_y - trace.line_start_y)
+            trace.trace_length = trace.arc_length.sum(axis=1) + trace.line_length
+
+        self.minus_trace_length = self.minus.trace_length
+        self.plus_trace_length = self.plus.trace_length
+
+    def primitives(self, i: int):
+        # Scalar (minus_primitives, plus_primitives) for row i
+        width = float(self.trace_width[i])
+        return self.minus.primitives(i, width), self.plus.primitives(i, width)
+
+    def max_abs_error(self, i: int, strafe):
+        # Largest deviation between row i and a scalar Strafe built from the same parameters
+        errors = [math.fabs(self.minus_trace_length[i] - strafe.minus_trace_length),
+                  math.fabs(self.plus_trace_length[i] - strafe.plus_trace_length)]
+        for trace, reference in ((self.minus, strafe.minus_primitives), (self.plus, strafe.plus_primitives)):
+            for k in range(2):
+                errors += [math.fabs(trace.arc_center_x[i, k] - reference[k].center.x),
+                           math.fabs(trace.arc_center_y[i, k] - reference[k].center.y),
+                           math.fabs(trace.arc_radius[i, k] - reference[k].radius),
+                           math.fabs(trace.arc_start_angle[i, k] - reference[k].start_angle),
+                           math.fabs(trace.arc_end_angle[i, k] - reference[k].end_angle)]
+            line = reference[2]
+            errors += [math.fabs(trace.line_start_x[i] - line.start.x),
+                       math.fabs(trace.line_start_y[i] - line.start.y),
+                       math.fabs(trace.line_end_x[i] - line.end.x),
+                       math.fabs(trace.line_end_y[i] - line.end.y)]
+        return max(errors)
+
+
+def random_parameters(n: int, seed: int = 0):
+    # Representative sweep: both directions, small to large radius scales
+    rng = np.random.default_rng(seed)
+    offset = rng.uniform(0.5, 10.0, n) * rng.choice((-1.0, 1.0), n)
+    return (rng.uniform(0.08, 0.5, n), rng.uniform(0.08, 0.5, n), offset,
+            rng.uniform(0.05, 2.0, n), rng.uniform(0.2, 1.5, n))
+
+
+if __name__ == "__main__":
+
+    import sys
+    from strafe import Strafe
+
+    # Usage: batch.py [count] - times the batch engine and checks it against Strafe
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    parameters = random_parameters(count)
+
+    start_time = time.perf_counter()
+    batch = StrafeBatch(*parameters)
+    elapsed = time.perf_counter() - start_time
+    print(f"StrafeBatch: {count} strafes in {elapsed:.4f} s ({count / elapsed:,.0f} strafes/s)")
+
+    checked = min(count, 1000)
+    worst = 0.0
+    for i in range(checked):
+        strafe = Strafe(Point(0, 0), *(float(column[i]) for column in parameters))
+        worst = max(worst, batch.max_abs_error(i, strafe))
+    print(f"Max deviation from Strafe over {checked} strafes: {worst:.3e} (tolerance {BATCH_TOLERANCE:.0e})")
+
+    exit(0 if worst <= BATCH_TOLERANCE else 1)
@@ -0,0 +1,123 @@
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boardscan import scan_board
+
+# Board scan on a synthetic .kicad_pcb with a known set of jogs.
+#
+#   python benchmarks/bench_boardscan.py [track segments]
+#
+# Every diff pair is a route of straight runs, cut into short collinear segments
+# the way interactive routing leaves them, with a 1:3 diagonal jog between runs.
+# Routes are rotated in 45 degree steps. The scan must find every jog with the
+# width, gap and offset it was drawn with.
+
+WIDTHS = (0.1, 0.15, 0.2)
+GAPS = (0.1, 0.15)
+OFFSETS = (-1.0, -0.5, -0.25, 0.25, 0.5, 1.0)
+JOGS_PER_PAIR = 10
+RUN_LENGTH = 3.0  # mm
+PIECES_PER_RUN = 14
+JOG_SLOPE = 3  # run along the pair per unit of offset
+
+
+def offset_polyline(points, distance: float):
+    # Polyline moved by distance to the right, corners mitred so the spacing stays constant
+    normals = list()
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        normals.append(((y1 - y0) / length, -(x1 - x0) / length))
+    moved = [(points[0][0] + normals[0][0] * distance, points[0][1] + normals[0][1] * distance)]
+    for (x, y), (ax, ay), (bx, by) in zip(points[1:-1], normals, normals[1:]):
+        scale = distance / (1 + ax * bx + ay * by)
+        moved.append((x + (ax + bx) * scale, y + (ay + by) * scale))
+    moved.append((points[-1][0] + normals[-1][0] * distance, points[-1][1] + normals[-1][1] * distance))
+    return moved
+
+
+def pair_route(rng, jogs: int):
+    # Centre line corners travelling +y, and the offset of every jog
+    points = [(0.0, 0.0)]
+    offsets = list()
+    x = y = 0.0
+    for _ in range(jogs):
+        y += RUN_LENGTH
+        points.append((x, y))
+        offset = rng.choice(OFFSETS)
+        x += offset
+        y += JOG_SLOPE * math.fabs(offset)
+        points.append((x, y))
+        offsets.append(offset)
+    points.append((x, y + RUN_LENGTH))
+    return points, offsets
+
+
+def segment_lines(points, pieces: int):
+    # Straight runs (every other polyline edge) cut into pieces, jog diagonals left whole
+    for i, ((x0, y0), (x1, y1)) in enumerate(zip(points, points[1:])):
+        count = pieces if i % 2 == 0 else 1
+        for k in range(count):
+            yield (x0 + (x1 - x0) * k / count, y0 + (y1 - y0) * k / count,
+                   x0 + (x1 - x0) * (k + 1) / count, y0 + (y1 - y0) * (k + 1) / count)
+
+
+def write_board(path: str, segments: int, seed: int = 1):
+    """Write a synthetic board with about the given number of segments, returns the expected jogs"""
+    rng = random.Random(seed)
+    per_pair = 2 * ((JOGS_PER_PAIR + 1) * PIECES_PER_RUN + JOGS_PER_PAIR)
+    pairs = max(1, segments // per_pair)
+    expected = list()
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('(kicad_pcb\n\t(version 20240108)\n\t(generator "pcbnew")\n\t(net 0 "")\n')
+        for i in range(pairs):
+            f.write(f'\t(net {2 * i + 1} "/DP{i}_P")\n\t(net {2 * i + 2} "/DP{i}_N")\n')
+        for i in range(pairs):
+            width, gap = rng.choice(WIDTHS), rng.choice(GAPS)
+            points, offsets = pair_route(rng, JOGS_PER_PAIR)
+            expected += [(width, gap, offset) for offset in offsets]
+            angle = rng.randrange(8) * math.pi / 4
+            cos_a, sin_a = math.cos(angle), math.sin(angle)
+            origin_x, origin_y = (i % 100) * 60.0, (i // 100) * 60.0
+            for net, side in ((2 * i + 1, -1), (2 * i + 2, 1)):
+                trace = offset_polyline(points, side * (width + gap) / 2)
+                # Rotate, move and snap to the nm grid in board coordinates (y down)
+                trace = [(round(origin_x + x * cos_a - y * sin_a, 6), round(origin_y - (x * sin_a + y * cos_a), 6))
+                         for x, y in trace]
+                for x0, y0, x1, y1 in segment_lines(trace, PIECES_PER_RUN):
+                    f.write(f'\t(segment\n\t\t(start {round(x0, 6)} {round(y0, 6)})\n\t\t(end {round(x1, 6)} {round(y1, 6)})\n'
+                            f'\t\t(width {width})\n\t\t(layer "F.Cu")\n\t\t(net {net})\n'
+                            f'\t\t(uuid "{count:08x}-0000-4000-8000-000000000000")\n\t)\n')
+                    count += 1
+        f.write(")\n")
+    return count, pairs, expected
+
+
+if __name__ == "__main__":
+
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+
+    with tempfile.TemporaryDirectory() as root:
+        board = os.path.join(root, "synthetic.kicad_pcb")
+        start_time = time.perf_counter()
+        count, pairs, expected = write_board(board, segments)
+        print(f"Wrote {count} segments on {pairs} pairs ({os.path.getsize(board) / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start_time:.2f} s")
+
+        summary = scan_board(board, os.path.join(root, "strafes.pretty"), workers=1)
+        timings = summary["timings"]
+        print("  ".join(f"{stage} {seconds:.2f} s" for stage, seconds in timings.items()))
+        print(f"{summary['elements'] / timings['total']:.0f} segments/s, {len(summary['jogs'])} jogs, "
+              f"{summary['footprints']} footprints, {summary['infeasible']} infeasible")
+
+        found = sorted((width, gap, offset) for *_, width, gap, offset, _, _, _ in summary["jogs"])
+        if found != sorted(expected):
+            print(f"MISMATCH: expected {len(expected)} jogs, found {len(found)}")
+            exit(1)
+        print("All jogs found with the width, gap and offset they were drawn with")
@@ -0,0 +1,111 @@
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clearance import Placement, build_primitives, candidate_pairs, check_clearance, pair_distances
+from primitives import Point
+from strafe import Strafe
+
+# Clearance check of many placed strafes and tracks.
+#
+#   python benchmarks/bench_clearance.py [placements] [workers]
+#
+# Strafes from a small set are placed on a jittered grid at 45 degree rotations,
+# dense enough that neighbours come close, with straight and arced tracks between
+# them. Before timing the full check, a small scene is checked twice: the grid
+# index against all pairs, and the exact distances against dense sampling.
+
+FOOTPRINTS = ((0.15, 0.2, 0.5, 0.3, 0.9), (0.1, 0.1, -0.8, 0.5, 1.0), (0.2, 0.15, 1.2, 0.4, 0.8))
+PITCH = 4.0  # mm between grid positions
+JITTER = 0.6  # mm
+TRACK_WIDTH = 0.2
+CLEARANCE = 0.2
+SAMPLES = 1000  # points per primitive when sampling distances
+
+
+def make_scene(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    strafes = [Strafe(Point(0, 0), *parameters) for parameters in FOOTPRINTS]
+    columns = max(1, int(math.sqrt(count)))
+    placements = [Placement(rng.choice(strafes), (i % columns) * PITCH + rng.uniform(-JITTER, JITTER),
+                            (i // columns) * PITCH + rng.uniform(-JITTER, JITTER), rng.randrange(8) * 45.0,
+                            name=f"S{i}") for i in range(count)]
+
+    # One track between each pair of grid columns, alternating segments and arcs, in boardscan's y-up coordinates
+    elements = list()
+    rows = count // columns + 1
+    for column in range(columns - 1):
+        x = (column + 0.5) * PITCH
+        for row in range(rows):
+            y0, y1 = row * PITCH, (row + 1) * PITCH
+            mid = (x + 0.3, -(y0 + y1) / 2) if row % 2 else None
+            elements.append((x, -y0, x, -y1, TRACK_WIDTH, mid))
+    return placements, {("/TRACK", "F.Cu"): elements}
+
+
+def sample(primitives, k: int):
+    t = np.linspace(0, 1, SAMPLES)
+    if primitives.kind[k] == 0:
+        return primitives.ax[k] + t * (primitives.bx[k] - primitives.ax[k]), primitives.ay[k] + t * (primitives.by[k] - primitives.ay[k])
+    angle = primitives.start[k] + t * primitives.sweep[k]
+    return primitives.cx[k] + primitives.radius[k] * np.cos(angle), primitives.cy[k] + primitives.radius[k] * np.sin(angle)
+
+
+def validate(seed: int = 2):
+    placements, tracks = make_scene(100, seed)
+    primitives = build_primitives(placements, tracks)
+    columns = primitives.columns()
+
+    # Grid pairs against every pair of primitives that may be checked
+    i, j = np.triu_indices(len(primitives), 1)
+    owner, net = primitives.owner, primitives.net
+    keep = (owner[i] != owner[j]) & ~((owner[i] < 0) & (owner[j] < 0)) & ~((net[i] == net[j]) & (net[i] >= 0))
+    i, j = i[keep], j[keep]
+    distance = pair_distances(columns, i, j)[0]
+    close = distance - (primitives.width[i] + primitives.width[j]) / 2 < CLEARANCE
+    expected = set(zip(i[close].tolist(), j[close].tolist()))
+    found = set()
+    for a, b in candidate_pairs(primitives, CLEARANCE):
+        found.update((min(p, q), max(p, q)) for p, q in zip(a.tolist(), b.tolist()))
+    missing = expected - found
+    print(f"Index: {len(found)} candidate pairs of {len(i)}, {len(expected)} within clearance, {len(missing)} missed")
+
+    # Exact distances against dense sampling, which can only be longer
+    rng = np.random.default_rng(seed)
+    picks = np.concatenate((rng.choice(np.flatnonzero(close), 150), rng.choice(len(i), 50)))
+    worst, below = 0.0, 0
+    for k in picks:
+        ax, ay = sample(primitives, i[k])
+        bx, by = sample(primitives, j[k])
+        sampled = np.hypot(ax[:, None] - bx[None], ay[:, None] - by[None]).min()
+        below += distance[k] > sampled + 1e-9
+        worst = max(worst, sampled - distance[k])
+    print(f"Distances: {len(picks)} pairs sampled, {below} exact distances above the sampled ones, "
+          f"sampled at most {worst * 1000:.2f} um longer")
+    return not missing and not below
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    if not validate():
+        print("MISMATCH")
+        exit(1)
+
+    placements, tracks = make_scene(count)
+    start_time = time.perf_counter()
+    summary = check_clearance(placements, tracks, CLEARANCE, workers=workers)
+    elapsed = time.perf_counter() - start_time
+    timings = summary["timings"]
+    print(f"\n{count} placements: {summary['primitives']} primitives, {summary['candidates']} candidate pairs, "
+          f"{len(summary['violations'])} violations in {elapsed:.2f} s")
+    print("  ".join(f"{stage} {seconds:.2f} s" for stage, seconds in timings.items()))
+    print(f"{summary['primitives'] / elapsed:.0f} primitives/s, {summary['candidates'] / timings['distance']:.0f} exact pairs/s")
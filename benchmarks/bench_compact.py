@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library import build_library
+from roundtrip import read_footprint
+from sexpr import tokenize
+
+# File size and parse time of a generated library in the default output mode
+# against nanometre-quantized output, with and without indentation.
+#
+#   python benchmarks/bench_compact.py [offsets per side]
+#
+# Parse time is measured with the streaming reader of roundtrip.py, once
+# tokenizing whole files and once extracting pads, as a stand-in for KiCad
+# loading the library.
+
+MODES = (
+    ("default", {}),
+    ("quantized", {"quantize": True}),
+    ("quantized, no indent", {"quantize": True, "indent": False}),
+)
+ROUNDS = 7
+
+
+def library_grid(offsets: int):
+    offset_values = [round(0.1 + i * 0.05, 9) for i in range(offsets)]
+    return [{"trace_width": [0.1, 0.15, 0.2], "trace_gap": [0.1, 0.2],
+             "offset": [-o for o in offset_values] + offset_values,
+             "radius_scale": [0.2, 0.35], "middle_tangent_angle": [0.7, 1.1]}]
+
+
+def parse_time(paths, parse):
+    start_time = time.perf_counter()
+    for path in paths:
+        parse(path)
+    return time.perf_counter() - start_time
+
+
+def tokenize_file(path: str):
+    with open(path, encoding="utf-8") as f:
+        for _ in tokenize(f):
+            pass
+
+
+if __name__ == "__main__":
+
+    offsets = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    grid = library_grid(offsets)
+
+    with tempfile.TemporaryDirectory() as root:
+        libraries = list()
+        for name, options in MODES:
+            output_dir = os.path.join(root, name.replace(" ", "_").replace(",", ""))
+            build_library(grid, output_dir, use_cache=False, verify="off", deterministic_uuids=True, **options)
+            paths = sorted(entry.path for entry in os.scandir(output_dir) if entry.name.endswith(".kicad_mod"))
+            libraries.append((name, paths, sum(os.path.getsize(path) for path in paths)))
+
+        # Modes take turns in every round, so that drifting machine load hits them alike
+        best = {name: [float("inf"), float("inf")] for name, *_ in libraries}
+        for _ in range(ROUNDS):
+            for name, paths, _ in libraries:
+                best[name][0] = min(best[name][0], parse_time(paths, tokenize_file))
+                best[name][1] = min(best[name][1], parse_time(paths, read_footprint))
+        results = [(name, len(paths), size, *best[name]) for name, paths, size in libraries]
+
+    _, _, base_size, base_tokens, base_pads = results[0]
+    print(f"{results[0][1]} footprints")
+    print(f"{'mode':22} {'size':>10} {'tokenize':>12} {'read pads':>12}")
+    for name, count, size, tokens, pads in results:
+        print(f"{name:22} {size / count:7.0f} B {tokens / count * 1e6:9.1f} us {pads / count * 1e6:9.1f} us"
+              f"   ({(1 - size / base_size) * 100:4.1f}% smaller, {(1 - tokens / base_tokens) * 100:4.1f}% / "
+              f"{(1 - pads / base_pads) * 100:4.1f}% faster)")
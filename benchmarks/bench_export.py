@@ -0,0 +1,97 @@
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import StrafeBatch, random_parameters
+from export import export_library, tessellate_batch
+from primitives import DEFAULT_CHORD_TOLERANCE, Point
+from strafe import Strafe
+
+# Tessellation and polyline export.
+#
+#   python benchmarks/bench_export.py [strafes]
+#
+# Random strafes are tessellated in one batch and one Arc.tessellate call at a time,
+# which must give the same points. The chord error is measured at the middle of every
+# chord of every arc, and the point count is compared with the fixed 100 points per
+# arc of the interactive preview. Then a grid library is exported in each format.
+
+SCALAR_STRAFES = 500
+PREVIEW_ARC_POINTS = 100
+EXPORT_GRID = [{"trace_width": [0.1, 0.15, 0.2], "trace_gap": [0.1, 0.15, 0.2],
+                "offset": [round(0.25 * i, 6) for i in range(-40, 41) if i],
+                "radius_scale": [0.2, 0.5, 1.0], "middle_tangent_angle": [0.6, 0.9, 1.2, 1.5]}]
+
+
+def scalar_polylines(parameters, count: int):
+    # Both traces of each strafe from per-primitive tessellation, in footprint coordinates
+    polylines = list()
+    for i in range(count):
+        strafe = Strafe(Point(0, 0), *(float(column[i]) for column in parameters))
+        for first, second, line in (strafe.minus_primitives, strafe.plus_primitives):
+            points = first.tessellate() + second.tessellate()[::-1][1 if line.length <= 0 else 0:]
+            polylines.append([(x, -y) for x, y in points])
+    return polylines
+
+
+def chord_error(batch: StrafeBatch, polylines):
+    # Largest distance from a chord midpoint to its arc, over all chords of all arcs
+    worst = 0.0
+    for trace_index, trace in enumerate((batch.minus, batch.plus)):
+        for i in range(len(batch)):
+            points = polylines.footprint(i)[trace_index][1]
+            for k in range(2):
+                cx, cy, radius = trace.arc_center_x[i, k], -trace.arc_center_y[i, k], trace.arc_radius[i, k]
+                on_arc = np.fabs(np.hypot(points[:, 0] - cx, points[:, 1] - cy) - radius) < 1e-9
+                # Consecutive points both on this arc are its chords
+                chord = on_arc[:-1] & on_arc[1:]
+                middle = (points[:-1][chord] + points[1:][chord]) / 2
+                if len(middle):
+                    worst = max(worst, float((radius - np.hypot(middle[:, 0] - cx, middle[:, 1] - cy)).max()))
+    return worst
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    parameters = random_parameters(count)
+    batch = StrafeBatch(*parameters)
+
+    start_time = time.perf_counter()
+    polylines = tessellate_batch(batch)
+    elapsed = time.perf_counter() - start_time
+    print(f"Batch: {count} strafes, {len(polylines.points)} points in {elapsed:.3f} s ({count / elapsed:,.0f} strafes/s)")
+
+    scalar_count = min(count, SCALAR_STRAFES)
+    start_time = time.perf_counter()
+    reference = scalar_polylines(parameters, scalar_count)
+    scalar_elapsed = (time.perf_counter() - start_time) / scalar_count
+    mismatch = 0.0
+    for k, points in enumerate(reference):
+        found = polylines.points[polylines.offsets[k]:polylines.offsets[k + 1]]
+        mismatch = max(mismatch, math.inf if len(found) != len(points) else float(np.fabs(found - np.array(points)).max()))
+    print(f"Scalar Arc.tessellate: {scalar_elapsed * 1e6:.0f} us/strafe, batch is {scalar_elapsed / (elapsed / count):.0f}x faster, "
+          f"largest difference {mismatch:.1e} mm")
+
+    sample = StrafeBatch(*(column[:scalar_count] for column in parameters))
+    error = chord_error(sample, tessellate_batch(sample))
+    arcs = 4 * count
+    print(f"Chord error at most {error * 1000:.3f} um for a {DEFAULT_CHORD_TOLERANCE * 1000:.0f} um tolerance, "
+          f"{(len(polylines.points) - 2 * count) / arcs:.1f} chords per arc on average, "
+          f"{len(polylines.points)} points against {arcs * PREVIEW_ARC_POINTS} at {PREVIEW_ARC_POINTS} per arc")
+    if mismatch > 1e-9 or error > DEFAULT_CHORD_TOLERANCE * (1 + 1e-9):
+        print("MISMATCH")
+        exit(1)
+
+    with tempfile.TemporaryDirectory() as root:
+        print()
+        for export_format, target in (("dxf", "dxf"), ("dxf", "dxf.zip"), ("svg", "svg"), ("npz", "polylines.npz")):
+            summary = export_library(EXPORT_GRID, os.path.join(root, target), export_format)
+            print(f"  {export_format} to {target:14} {summary['exported']} footprints, {summary['points']} points, "
+                  f"{summary['bytes_written'] / 1e6:6.1f} MB in {summary['elapsed']:.2f} s ({summary['throughput']:.0f} footprints/s)")
@@ -0,0 +1,59 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Startup benchmark: wall time of `import strafe` in a fresh interpreter.
+# Fails when the median exceeds the budget, or when importing strafe pulls in
+# plotting libraries that only previews need.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET = 0.15  # seconds
+HEADLESS_FORBIDDEN = ("matplotlib", "numpy", "jinja2")
+
+PROBE = f"""
+import sys, time
+start_time = time.perf_counter()
+import strafe
+elapsed = time.perf_counter() - start_time
+loaded = [m for m in {HEADLESS_FORBIDDEN!r} if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure_import(runs: int = 10):
+    timings = list()
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True).stdout.split()
+        timings.append(float(output[0]))
+        if len(output) > 1:
+            loaded.update(output[1].split(","))
+    return timings, sorted(loaded)
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure `import strafe` wall time in fresh interpreters")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Maximum median import time (s)")
+    parser.add_argument("--runs", type=int, default=10, help="Interpreter starts to measure")
+    args = parser.parse_args()
+
+    timings, loaded = measure_import(args.runs)
+    median = statistics.median(timings)
+    print(f"import strafe: median {median * 1000:.1f} ms, min {min(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: import strafe loaded {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print("FAIL: import time over budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
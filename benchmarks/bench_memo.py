@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memo import GeometryMemo
+from primitives import Point
+from render import render_footprint
+from strafe import Strafe
+
+# Memoized geometry and footprint parameters.
+#
+#   python benchmarks/bench_memo.py [requests] [distinct]
+#
+# A layout script asks for footprint parameters of a few hundred parameter sets
+# over and over, in random order. Offsets are computed as a script would, as
+# step * k, which gives values like 0.30000000000000004 that quantize to the same
+# key as 0.3. The same requests are answered without memoization, from the memo,
+# from a memo too small for them, and from a fresh process and from parallel
+# processes sharing one SQLite store.
+
+DISTINCT = 300
+SMALL_CACHE = 100
+PROCESSES = 4
+
+
+def make_requests(count: int, distinct: int, seed: int = 0):
+    rng = random.Random(seed)
+    parameter_sets = [(rng.choice((0.1, 0.15, 0.2)), rng.choice((0.1, 0.2)), 0.1 * rng.randint(1, 40) * rng.choice((-1, 1)),
+                       rng.choice((0.2, 0.5, 1.0)), rng.choice((0.6, 0.9, 1.2))) for _ in range(distinct)]
+    return [rng.choice(parameter_sets) for _ in range(count)]
+
+
+def uncached(requests):
+    for parameters in requests:
+        Strafe(Point(0, 0), *parameters).generate_footprint_parameters(deterministic_uuids=True)
+
+
+def memoized(memo, requests):
+    for parameters in requests:
+        memo.footprint_parameters(*parameters)
+    return memo.stats()
+
+
+def timed(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start_time, result
+
+
+def store_worker(store_path, requests):
+    return timed(memoized, GeometryMemo(store_path=store_path), requests)
+
+
+def report(label: str, elapsed: float, count: int, baseline: float, stats=None):
+    line = f"  {label:28} {elapsed:6.2f} s {elapsed / count * 1e6:7.1f} us/request {baseline / elapsed:6.1f}x"
+    if stats is not None:
+        line += (f"  hit rate {stats['hit_rate']:.1%} ({stats['hits']} memory, {stats['store_hits']} store, "
+                 f"{stats['misses']} computed), {stats['size']} entries, {stats['evictions']} evicted")
+    print(line)
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else DISTINCT
+    requests = make_requests(count, distinct)
+    keys = len({tuple(round(value, 9) for value in parameters) for parameters in requests})
+    print(f"{count} requests of {distinct} parameter sets, {keys} after quantization")
+
+    # The memo must give the same footprints as building them directly
+    memo = GeometryMemo()
+    mismatches = sum(render_footprint(memo.footprint_parameters(*parameters)) !=
+                     render_footprint(Strafe(Point(0, 0), *(round(value, 9) for value in parameters))
+                                      .generate_footprint_parameters(deterministic_uuids=True))
+                     for parameters in requests[:200])
+
+    baseline, _ = timed(uncached, requests)
+    report("uncached", baseline, count, baseline)
+    elapsed, stats = timed(memoized, GeometryMemo(), requests)
+    report("memo", elapsed, count, baseline, stats)
+    elapsed, stats = timed(memoized, GeometryMemo(maxsize=SMALL_CACHE), requests)
+    report(f"memo, {SMALL_CACHE} entries", elapsed, count, baseline, stats)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "geometry.sqlite")
+        memo = GeometryMemo(store_path=store_path)
+        elapsed, stats = timed(memoized, memo, requests)
+        memo.store.close()
+        report("memo + store, cold", elapsed, count, baseline, stats)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            elapsed, stats = executor.submit(store_worker, store_path, requests).result()
+        report("new process, warm store", elapsed, count, baseline, stats)
+
+        shared_path = os.path.join(directory, "shared.sqlite")
+        with ProcessPoolExecutor(max_workers=PROCESSES) as executor:
+            results = list(executor.map(store_worker, [shared_path] * PROCESSES, [requests] * PROCESSES))
+        computed = sum(stats["misses"] for _, stats in results)
+        stats = max((stats for _, stats in results), key=lambda stats: stats["store_size"])
+        print(f"  {PROCESSES} processes, one new store: {computed} computations for {PROCESSES * keys} without sharing, "
+              f"store holds {stats['store_size']} entries in {stats['store_bytes'] / 1e6:.1f} MB")
+
+    if mismatches:
+        print(f"MISMATCH in {mismatches} footprints")
+        exit(1)
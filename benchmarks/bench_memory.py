@@ -0,0 +1,231 @@
+import copy
+import gc
+import itertools
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from primitives import Point
+from strafe import Strafe
+
+# Memory and allocation benchmark for Strafe construction.
+#
+#   python benchmarks/bench_memory.py [strafes]
+#
+# Compares three ways of keeping a sweep of strafes:
+#   before:          the geometry as it was built before primitives got __slots__,
+#                    copied below: dict-backed Point/Arc/Line objects and
+#                    calculate_trace deep-copying every center and float it reuses
+#   Strafe objects:  the current Strafe, slotted primitives without deepcopy
+#   PrimitiveBuffer: only each current trace packed into one typed array
+# For each, the memory and blocks still held by the kept strafes, the peak while
+# building one strafe, and the build rate under tracemalloc.
+
+ALLOCATION_SAMPLES = 1000
+END_POINT_TOLERANCE = 1e-9  # mm
+
+
+class BeforePoint:
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+
+class BeforeLine:
+    def __init__(self, start: BeforePoint, end: BeforePoint, width: float):
+        self.start = start
+        self.end = end
+        self.width = width
+
+        self.length = self.calculate_length()
+
+    def calculate_length(self):
+        return math.hypot(self.end.x - self.start.x, self.end.y - self.start.y)
+
+    def extend_to_intersection_with_x(self, x: float):
+        if self.start.x == self.end.x:
+            return BeforeLine(BeforePoint(x, self.start.y), BeforePoint(x, self.end.y), self.width)
+        slope = (self.end.y - self.start.y) / (self.end.x - self.start.x)
+        y_intersect = slope * (x - self.start.x) + self.start.y
+        return BeforeLine(BeforePoint(self.start.x, self.start.y), BeforePoint(x, y_intersect), self.width)
+
+
+class BeforeArc:
+    def __init__(self, center: BeforePoint, radius: float, start_angle: float, end_angle: float, width: float):
+        self.center = center
+        self.radius = radius
+        self.start_angle = start_angle
+        self.end_angle = end_angle
+        self.width = width
+
+    def get_start_point(self):
+        return BeforePoint(self.center.x + self.radius * math.cos(self.start_angle),
+                           self.center.y + self.radius * math.sin(self.start_angle))
+
+    def get_exit_point(self):
+        return BeforePoint(self.center.x + self.radius * math.cos(self.end_angle),
+                           self.center.y + self.radius * math.sin(self.end_angle))
+
+    def get_tangent_line(self, length: float):
+        exit_point = self.get_exit_point()
+        tangent_angle = math.degrees(self.end_angle + math.pi / 2)
+        end_x = exit_point.x + length * math.cos(math.radians(tangent_angle))
+        end_y = exit_point.y + length * math.sin(math.radians(tangent_angle))
+        return BeforeLine(exit_point, BeforePoint(end_x, end_y), self.width)
+
+    def calculate_length(self):
+        return self.radius * (self.end_angle - self.start_angle)
+
+
+class BeforeStrafe:
+    # Strafe.__init__, calculate_trace and calculate_trace_length before the change
+
+    def __init__(self, start: BeforePoint, trace_width: float, trace_gap: float, offset_x: float, radius_scale: float,
+                 middle_tangent_angle: float):
+        self.start = start
+        self.trace_width = trace_width
+        self.trace_gap = trace_gap
+        self.offset_x = offset_x
+        self.radius_scale = radius_scale
+        self.middle_tangent_angle = middle_tangent_angle
+        self.name_suffix = ""
+
+        self.minus_primitives = list()
+        self.plus_primitives = list()
+        self.offset_dir = self.offset_x >= 0
+        self.plus_trace_length = 0.0
+        self.minus_trace_length = 0.0
+
+        self.calculate_trace()
+        self.calculate_trace_length()
+
+    def calculate_trace(self):
+        self.minus_start_point = BeforePoint(self.start.x - (self.trace_width / 2 + self.trace_gap / 2), self.start.y)
+        self.plus_start_point = BeforePoint(self.start.x + (self.trace_width / 2 + self.trace_gap / 2), self.start.y)
+
+        trace_center_width = math.fabs(self.plus_start_point.x - self.minus_start_point.x)
+
+        small_radius = math.fabs(self.offset_x * self.radius_scale)
+        big_radius = small_radius + copy.deepcopy(trace_center_width)
+
+        if self.offset_dir:
+            first_bend_center = BeforePoint(self.plus_start_point.x + small_radius, self.plus_start_point.y)
+            second_bend_center = BeforePoint(self.offset_x + (copy.deepcopy(trace_center_width) / 2) - copy.deepcopy(big_radius),
+                                             math.fabs(self.offset_x * 2))
+            self.minus_primitives.append(BeforeArc(copy.deepcopy(first_bend_center), big_radius, math.pi,
+                                                   -math.pi - self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(BeforeArc(copy.deepcopy(first_bend_center), small_radius, math.pi,
+                                                  -math.pi - self.middle_tangent_angle, self.trace_width))
+            self.minus_primitives.append(BeforeArc(copy.deepcopy(second_bend_center), small_radius, 0,
+                                                   -(2 * math.pi) - self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(BeforeArc(copy.deepcopy(second_bend_center), big_radius, 0,
+                                                  -(2 * math.pi) - self.middle_tangent_angle, self.trace_width))
+        else:
+            first_bend_center = BeforePoint(self.minus_start_point.x - small_radius, self.minus_start_point.y)
+            second_bend_center = BeforePoint(self.offset_x - (copy.deepcopy(trace_center_width) / 2) + big_radius,
+                                             math.fabs(self.offset_x * 2))
+            self.minus_primitives.append(BeforeArc(copy.deepcopy(first_bend_center), small_radius, 0,
+                                                   self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(BeforeArc(copy.deepcopy(first_bend_center), big_radius, 0,
+                                                  self.middle_tangent_angle, self.trace_width))
+            self.minus_primitives.append(BeforeArc(copy.deepcopy(second_bend_center), big_radius, math.pi,
+                                                   math.pi + self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(BeforeArc(copy.deepcopy(second_bend_center), small_radius, math.pi,
+                                                  math.pi + self.middle_tangent_angle, self.trace_width))
+
+        self.minus_primitives.append(self.minus_primitives[0].get_tangent_line(1))
+        self.minus_primitives[-1] = self.minus_primitives[-1].extend_to_intersection_with_x(self.minus_primitives[1].get_exit_point().x)
+        diff = self.minus_primitives[1].get_exit_point().y - self.minus_primitives[-1].end.y
+        self.minus_primitives[1].center.y -= diff
+
+        self.plus_primitives.append(self.plus_primitives[0].get_tangent_line(1))
+        self.plus_primitives[-1] = self.plus_primitives[-1].extend_to_intersection_with_x(self.plus_primitives[1].get_exit_point().x)
+        diff = self.plus_primitives[1].get_exit_point().y - self.plus_primitives[-1].end.y
+        self.plus_primitives[1].center.y -= diff
+
+        self.minus_end_point = self.minus_primitives[1].get_start_point()
+        self.plus_end_point = self.plus_primitives[1].get_start_point()
+
+    def calculate_trace_length(self):
+        self.minus_trace_length = sum(primitive.calculate_length() for primitive in self.minus_primitives)
+        self.plus_trace_length = sum(primitive.calculate_length() for primitive in self.plus_primitives)
+
+
+def sweep(count: int):
+    for i in range(count):
+        offset = 0.5 + (i % 200) * 0.05
+        yield (0.1 + (i % 5) * 0.05, 0.15, offset if i % 2 else -offset, 0.1 + (i % 7) * 0.1, 0.4 + (i % 11) * 0.1)
+
+
+def measure(name: str, count: int, build):
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    kept = [build(parameters) for parameters in sweep(count)]
+    elapsed = time.perf_counter() - start_time
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+
+    # Bytes allocated at once while building one strafe that is then dropped, temporaries included
+    building = 0
+    for parameters in itertools.islice(sweep(count), ALLOCATION_SAMPLES):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        build(parameters)
+        building += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    del kept
+
+    result = {"retained": current / count, "blocks": blocks / count, "building": building / ALLOCATION_SAMPLES,
+              "peak": peak, "rate": count / elapsed}
+    print(f"{name:<16} retained {result['retained']:6.0f} B/strafe in {result['blocks']:5.1f} blocks, "
+          f"peak building one {result['building']:6.0f} B, peak {peak / 2**20:6.1f} MiB, "
+          f"{result['rate']:7,.0f} strafes/s (traced)")
+    return result
+
+
+def build_before(parameters):
+    return BeforeStrafe(BeforePoint(0, 0), *parameters)
+
+
+def build_strafe(parameters):
+    return Strafe(Point(0, 0), *parameters)
+
+
+def build_buffers(parameters):
+    return Strafe(Point(0, 0), *parameters).get_primitive_buffers()
+
+
+def largest_end_point_difference(count: int):
+    # The copied geometry must still be the one the current Strafe builds
+    difference = 0.0
+    for parameters in sweep(count):
+        before, after = build_before(parameters), build_strafe(parameters)
+        for name in ("minus_start_point", "plus_start_point", "minus_end_point", "plus_end_point"):
+            a, b = getattr(before, name), getattr(after, name)
+            difference = max(difference, abs(a.x - b.x), abs(a.y - b.y))
+    return difference
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    difference = largest_end_point_difference(min(count, ALLOCATION_SAMPLES))
+    print(f"{count} strafes, largest end point difference before/after {difference:.1e} mm")
+    before = measure("before", count, build_before)
+    after = measure("Strafe objects", count, build_strafe)
+    buffers = measure("PrimitiveBuffer", count, build_buffers)
+    print(f"Strafe objects retain {before['retained'] / after['retained']:.1f}x less memory in "
+          f"{before['blocks'] / after['blocks']:.1f}x fewer blocks than before, "
+          f"and build {after['rate'] / before['rate']:.1f}x faster")
+    print(f"PrimitiveBuffer retains {after['retained'] / buffers['retained']:.1f}x less memory than Strafe objects, "
+          f"{before['retained'] / buffers['retained']:.1f}x less than before")
+
+    if difference > END_POINT_TOLERANCE:
+        print("MISMATCH")
+        exit(1)
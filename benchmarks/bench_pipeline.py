@@ -0,0 +1,176 @@
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from primitives import Point
+from render import render_footprint
+from strafe import Strafe, GENERATOR_VERSION
+
+# Benchmark suite for the footprint generation pipeline.
+#
+#   python benchmarks/bench_pipeline.py run -o results.json
+#   python benchmarks/bench_pipeline.py compare baseline.json results.json --threshold 0.1
+#
+# Every stage runs over the same parameter sweep. A stage's result is the best
+# time per footprint over several repeats, which is the least noisy estimate.
+
+DEFAULT_THRESHOLD = 0.10
+
+
+def parameter_sweep():
+    # (trace_width, trace_gap, offset, radius_scale, middle_tangent_angle):
+    # left and right offsets, small and large radius ratios, shallow to steep middle tangents
+    sweep = list()
+    for offset in (-4.0, 4.0):
+        for radius_scale in (0.05, 2.0):
+            for angle in (0.3, math.pi / 2, 2.5):
+                sweep.append((0.2, 0.2, offset, radius_scale, angle))
+    return sweep
+
+
+def time_stage(run, cases, repeats: int, min_time: float):
+    # Calls run(case) for every case, looping until min_time has passed, and
+    # returns the best seconds per call over the repeats
+    best = math.inf
+    for _ in range(repeats):
+        calls = 0
+        start_time = time.perf_counter()
+        while True:
+            for case in cases:
+                run(case)
+            calls += len(cases)
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def build_stages(output_dir: str):
+    # Each stage maps a parameter tuple to one unit of work. Inputs that belong to
+    # earlier stages are prepared up front so that only the stage itself is timed.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from preview import render_thumbnail
+    from viz import TraceVisualizer
+
+    strafes = {p: Strafe(Point(0, 0), *p) for p in parameter_sweep()}
+    parameters = {p: strafe.generate_footprint_parameters(deterministic_uuids=True) for p, strafe in strafes.items()}
+    rendered = {p: render_footprint(parameters[p]) for p in strafes}
+    paths = {p: os.path.join(output_dir, f"{strafe.generate_footprint_name()}_{i}.kicad_mod")
+             for i, (p, strafe) in enumerate(strafes.items())}
+
+    def write_file(p):
+        with open(paths[p], "w", encoding="utf-8") as f:
+            f.write(rendered[p])
+
+    def visualize(p):
+        viz = TraceVisualizer(figsize=(4, 3))
+        for primitive in strafes[p].minus_primitives:
+            primitive.draw(viz, color='blue', width=p[0])
+        for primitive in strafes[p].plus_primitives:
+            primitive.draw(viz, color='red', width=p[0])
+        viz.fig.canvas.draw()
+        plt.close(viz.fig)
+
+    return {
+        "strafe_init": lambda p: Strafe(Point(0, 0), *p),
+        "footprint_parameters": lambda p: strafes[p].generate_footprint_parameters(),
+        "footprint_parameters_deterministic": lambda p: strafes[p].generate_footprint_parameters(deterministic_uuids=True),
+        "render_template": lambda p: render_footprint(parameters[p], "template"),
+        "render_sexpr": lambda p: render_footprint(parameters[p], "sexpr"),
+        "file_write": write_file,
+        "visualize": visualize,
+        "thumbnail_png": lambda p: render_thumbnail(strafes[p], paths[p][:-len(".kicad_mod")] + ".png"),
+    }
+
+
+def run_benchmarks(repeats: int = 5, min_time: float = 0.2, stages=None):
+    cases = parameter_sweep()
+    output_dir = tempfile.mkdtemp(prefix="strafe_bench_")
+    try:
+        results = dict()
+        for name, run in build_stages(output_dir).items():
+            if stages and name not in stages:
+                continue
+            seconds = time_stage(run, cases, repeats, min_time)
+            results[name] = {"seconds_per_footprint": seconds, "footprints_per_second": 1 / seconds}
+            print(f"{name:<36} {seconds * 1e6:10.1f} us/footprint {1 / seconds:12,.0f} footprints/s")
+    finally:
+        shutil.rmtree(output_dir)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generator_version": GENERATOR_VERSION,
+            "cases": len(cases),
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    # Returns the stages that got slower than the baseline by more than threshold (a fraction)
+    regressions = list()
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<36} {'(new)':>10}")
+            continue
+        ratio = result["seconds_per_footprint"] / baseline["results"][name]["seconds_per_footprint"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        print(f"{name:<36} {(ratio - 1) * 100:+9.1f}% {flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the footprint generation pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and save the results as JSON")
+    run_parser.add_argument("-o", "--output", default="bench_results.json", help="Results file")
+    run_parser.add_argument("--repeats", type=int, default=5, help="Repeats per stage, the best one counts")
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    run_parser.add_argument("--stage", action="append", help="Only run this stage (repeatable)")
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files and flag regressions")
+    compare_parser.add_argument("baseline", help="Results file to compare against")
+    compare_parser.add_argument("current", help="New results file")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Slowdown fraction that counts as a regression")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_benchmarks(args.repeats, args.min_time, args.stage)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,130 @@
+import gc
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import random_parameters
+from primitives import Arc, Line, Point
+from strafe import Strafe
+from transform import DEFAULT_ROTATIONS, rotate_footprints, rotated_variants
+
+# Pre-rotated footprint variants.
+#
+#   python benchmarks/bench_transform.py [strafes]
+#
+# Every strafe is wanted in the eight 45 degree rotations. From scratch, each
+# variant builds its own Strafe and rotates its primitives one at a time about the
+# start point. With transforms, one Strafe per parameter set is built and all eight
+# variants come from one matrix product over its primitive records, per strafe or for
+# all strafes at once. All must place every arc and line end at the same points. Then
+# the variants are rendered too.
+# As in timeit, the garbage collector is off while timing: both sides allocate the
+# same kind of objects, and its passes would otherwise land on either at random.
+
+RENDER_STRAFES = 200
+
+
+def rotate_point(point: Point, center: Point, cos: float, sin: float):
+    dx, dy = point.x - center.x, point.y - center.y
+    return Point(center.x + cos * dx - sin * dy, center.y + sin * dx + cos * dy)
+
+
+def scratch_variant(parameters, degrees: float):
+    # One rotated footprint from its own Strafe, primitive by primitive
+    strafe = Strafe(Point(0, 0), *parameters, name_suffix=f"_rot{degrees:g}" if degrees else "")
+    if not degrees:
+        return strafe
+    angle = math.radians(degrees)
+    cos, sin = math.cos(angle), math.sin(angle)
+    center = strafe.start
+
+    def rotate(primitive):
+        if isinstance(primitive, Arc):
+            return Arc(rotate_point(primitive.center, center, cos, sin), primitive.radius, primitive.start_angle + angle,
+                       primitive.end_angle + angle, primitive.width)
+        return Line(rotate_point(primitive.start, center, cos, sin), rotate_point(primitive.end, center, cos, sin), primitive.width)
+
+    strafe.minus_primitives = [rotate(primitive) for primitive in strafe.minus_primitives]
+    strafe.plus_primitives = [rotate(primitive) for primitive in strafe.plus_primitives]
+    for name in ("minus_start_point", "plus_start_point", "minus_end_point", "plus_end_point"):
+        setattr(strafe, name, rotate_point(getattr(strafe, name), center, cos, sin))
+    return strafe
+
+
+def end_points(footprint):
+    points = list()
+    for primitive in footprint.minus_primitives + footprint.plus_primitives:
+        if isinstance(primitive, Arc):
+            points += [primitive.get_start_point(), primitive.get_exit_point()]
+        else:
+            points += [primitive.start, primitive.end]
+    points += [footprint.minus_start_point, footprint.plus_start_point, footprint.minus_end_point, footprint.plus_end_point]
+    return points
+
+
+def largest_difference(first, second):
+    return max(max(abs(a.x - b.x), abs(a.y - b.y)) for a, b in zip(end_points(first), end_points(second)))
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rotations = DEFAULT_ROTATIONS
+    columns = random_parameters(count)
+    parameter_sets = [tuple(float(column[i]) for column in columns) for i in range(count)]
+    variants = count * len(rotations)
+
+    gc.disable()
+    start_time = time.perf_counter()
+    scratch = [scratch_variant(parameters, degrees) for parameters in parameter_sets for degrees in rotations]
+    scratch_elapsed = time.perf_counter() - start_time
+    gc.collect()
+
+    start_time = time.perf_counter()
+    single = [variant for parameters in parameter_sets for variant in rotated_variants(Strafe(Point(0, 0), *parameters), rotations)]
+    single_elapsed = time.perf_counter() - start_time
+    gc.collect()
+
+    start_time = time.perf_counter()
+    strafes = [Strafe(Point(0, 0), *parameters) for parameters in parameter_sets]
+    transformed = [variant for variants_of_strafe in rotate_footprints(strafes, rotations) for variant in variants_of_strafe]
+    transform_elapsed = time.perf_counter() - start_time
+    gc.enable()
+
+    difference = max(largest_difference(a, b) for a, b in zip(scratch, transformed))
+    difference = max(difference, max(largest_difference(a, b) for a, b in zip(single, transformed)))
+    names = all(a.generate_footprint_name() == b.generate_footprint_name() for a, b in zip(scratch, transformed))
+    lengths = all(a.minus_trace_length == b.minus_trace_length and a.plus_trace_length == b.plus_trace_length
+                  for a, b in zip(scratch, transformed))
+    print(f"Geometry: {count} strafes x {len(rotations)} rotations = {variants} variants")
+    print(f"  from scratch  {scratch_elapsed:.2f} s ({variants / scratch_elapsed:,.0f} variants/s)")
+    print(f"  per strafe    {single_elapsed:.2f} s ({variants / single_elapsed:,.0f} variants/s), "
+          f"{scratch_elapsed / single_elapsed:.1f}x faster, rotated_variants of each Strafe")
+    print(f"  batched       {transform_elapsed:.2f} s ({variants / transform_elapsed:,.0f} variants/s), "
+          f"{scratch_elapsed / transform_elapsed:.1f}x faster, rotate_footprints of all strafes at once")
+    print(f"  largest end point difference {difference:.1e} mm, names match: {names}, trace lengths match: {lengths}")
+
+    # Rendering is the same for both, so the end to end gain is smaller
+    render_count = min(count, RENDER_STRAFES)
+    gc.disable()
+    start_time = time.perf_counter()
+    for parameters in parameter_sets[:render_count]:
+        for degrees in rotations:
+            scratch_variant(parameters, degrees).render_footprint(deterministic_uuids=True)
+    scratch_render = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    strafes = [Strafe(Point(0, 0), *parameters) for parameters in parameter_sets[:render_count]]
+    for variants_of_strafe in rotate_footprints(strafes, rotations):
+        for variant in variants_of_strafe:
+            variant.render_footprint(deterministic_uuids=True)
+    transform_render = time.perf_counter() - start_time
+    gc.enable()
+    print(f"\nRendered: {render_count * len(rotations)} footprints, from scratch {scratch_render:.2f} s, "
+          f"transformed {transform_render:.2f} s ({scratch_render / transform_render:.2f}x)")
+
+    if difference > 1e-9 or not names or not lengths:
+        print("MISMATCH")
+        exit(1)
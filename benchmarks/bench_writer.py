@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import writer
+from primitives import Point
+from strafe import Strafe
+from writer import FootprintWriter
+
+# Output throughput of the pipelined writer against writing files one at a time.
+#
+#   python benchmarks/bench_writer.py [footprints] [simulated latency in ms ...]
+#
+# Footprints are rendered once up front, so only output is timed. A network share
+# is simulated by sleeping before every file is created, which is where a remote
+# file system spends its round trips; 0 measures the local disk as is. The archive
+# targets create a single file, so they pay the latency once.
+
+THREAD_COUNTS = (1, 4, 8, 16)
+
+
+def render_footprints(count: int):
+    footprints = list()
+    for i in range(count):
+        offset = round(0.1 + 0.01 * (i // 2), 6) * (1 if i % 2 else -1)
+        strafe = Strafe(Point(0, 0), 0.15, 0.2, offset, 0.3, 0.9)
+        footprints.append((f"{strafe.generate_footprint_name()}.kicad_mod", strafe.render_footprint(deterministic_uuids=True)))
+    return footprints
+
+
+def write_sequential(directory: str, footprints, latency: float):
+    # What generate_footprint_file does per footprint: open, write, close
+    os.makedirs(directory, exist_ok=True)
+    for file_name, content in footprints:
+        time.sleep(latency)
+        with open(os.path.join(directory, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def write_pipelined(target: str, footprints, threads: int):
+    with FootprintWriter(target, threads=threads) as output:
+        for file_name, content in footprints:
+            output.submit(file_name, content)
+
+
+def timed(function, *args):
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latencies = [float(value) / 1000 for value in sys.argv[2:]] or [0.0, 0.002]
+    footprints = render_footprints(count)
+    print(f"{count} footprints, {sum(len(content) for _, content in footprints) / 1e6:.1f} MB")
+
+    write_atomic = writer.write_atomic
+    for latency in latencies:
+        def slow_write_atomic(path, content):
+            time.sleep(latency)
+            write_atomic(path, content)
+        writer.write_atomic = slow_write_atomic
+
+        with tempfile.TemporaryDirectory() as root:
+            results = [("sequential open/write/close",
+                        timed(write_sequential, os.path.join(root, "sequential"), footprints, latency))]
+            for threads in THREAD_COUNTS:
+                results.append((f"pipelined, {threads} writer threads",
+                                timed(write_pipelined, os.path.join(root, f"threads{threads}"), footprints, threads)))
+            for extension in (".zip", ".tar"):
+                results.append((f"single {extension} archive",
+                                timed(write_pipelined, os.path.join(root, f"strafe.pretty{extension}"), footprints, 1)))
+
+        print(f"\nSimulated latency {latency * 1000:.1f} ms per file")
+        baseline = results[0][1]
+        for name, elapsed in results:
+            print(f"  {name:32} {elapsed:7.3f} s  {count / elapsed:8.0f} files/s  {baseline / elapsed:5.1f}x")
+    writer.write_atomic = write_atomic
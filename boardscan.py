@@ -0,0 +1,502 @@
+import csv
+import math
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from library import build_footprint, check_parameters
+from primitives import Point
+from render import RENDER_BACKENDS
+from sexpr import CHUNK_SIZE, QuotedString, iter_nodes, tokenize, unquote
+from solver import solve_strafe
+from strafe import Strafe
+
+# Finds every place on a board where a differential pair jogs sideways, and
+# generates a matching Strafe footprint for each.
+#
+# The .kicad_pcb file is streamed through the S-expression reader, keeping only
+# net declarations and track segments and arcs. Nets are paired by name suffix
+# (USB_D+ / USB_D-, LVDS0_P / LVDS0_N), per copper layer the tracks of each net are
+# chained end to end, and collinear segments are merged into straight runs. A jog
+# is a straight run, a few elements that turn away, and a straight run in the
+# original direction again; its offset is how far the exit run lies to the right
+# of the entry run.
+#
+# Jogs of the positive net are matched to jogs of the negative net at the same
+# place through a grid hash of entry points, so matching stays linear in the
+# number of jogs. The gap is the spacing of the two entry runs minus the trace
+# width, the span available to the footprint runs from the first trace leaving
+# its entry run to the last one reaching its exit run.
+#
+# Jogs are grouped by width, gap and offset, rounded to the quantum. The solver
+# picks the largest bend radius that fits the shortest span of each group, and
+# one footprint per group is generated by the library build workers.
+#
+# Board coordinates have y pointing down; everything here uses y up, like Strafe.
+
+DIFF_PAIR_SUFFIXES = (("+", "-"), ("P", "N"))
+
+DEFAULT_QUANTUM = 0.001  # mm, width, gap and offset are rounded to this for deduplication and names
+DEFAULT_MIN_OFFSET = 0.01  # mm, smaller lateral offsets are not jogs
+DEFAULT_MIN_RADIUS = 0.1  # mm, inner bend radius of generated strafes
+DEFAULT_PAIR_DISTANCE = 2.0  # mm, farthest apart the two jogs of a pair may start
+
+ANGLE_TOLERANCE = 1e-3  # rad, runs this close in direction count as parallel
+COS_TOLERANCE = math.cos(ANGLE_TOLERANCE)
+MAX_JOG_ELEMENTS = 6  # elements between the entry and exit runs of a jog
+KEY_SCALE = 1e5  # endpoints are matched on a 10 nm grid
+
+# Track nodes as KiCad writes them: start, optional mid, end, width, optional flags, layer, net, then
+# fields without nested nodes up to the closing parenthesis. Anything else goes through the S-expression reader
+_QUOTED = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_ATOM = r'[^\s()"]+'
+TRACK_START_PATTERN = re.compile(r'\((?:segment|arc)[\s)]')
+TRACK_PATTERN = re.compile(
+    r'\((segment|arc)\s+\(start\s+(' + _ATOM + r')\s+(' + _ATOM + r')\)\s*(?:\(mid\s+(' + _ATOM + r')\s+(' + _ATOM + r')\)\s*)?'
+    r'\(end\s+(' + _ATOM + r')\s+(' + _ATOM + r')\)\s*\(width\s+(' + _ATOM + r')\)\s*(?:\(locked(?:\s+' + _ATOM + r')?\)\s*)?'
+    r'\(layer\s+(' + _QUOTED + '|' + _ATOM + r')\)\s*\(net\s+(' + _QUOTED + '|' + _ATOM + r')\)'
+    r'(?:\s*\([^()"]*(?:' + _QUOTED + r'[^()"]*)*\))*\s*\)')
+NET_PATTERN = re.compile(r'\(net\s+(' + _ATOM + r')\s+(' + _QUOTED + r')\s*\)')
+
+REPORT_COLUMNS = ("positive_net", "negative_net", "layer", "x", "y", "rotation", "trace_width", "trace_gap", "offset",
+                  "span", "footprint_name", "status")
+
+
+def _track_element(x0, y0, x1, y1, width, mid=None):
+    # None for zero-length tracks, which connect nothing
+    x0, y0, x1, y1 = float(x0), -float(y0), float(x1), -float(y1)
+    if x0 == x1 and y0 == y1:
+        return None
+    return x0, y0, x1, y1, float(width), (float(mid[0]), -float(mid[1])) if mid else None
+
+
+def _scan_tracks(f, net_names, tracks):
+    # Fast path: whole track nodes by regular expression, chunk by chunk. Returns False
+    # if any track node did not match, for example fields in an unexpected order
+    buffer = ""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        buffer += chunk
+        # Track nodes do not nest, so text before the last track start holds only whole ones
+        cut = len(buffer)
+        if chunk:
+            last = None
+            for last in TRACK_START_PATTERN.finditer(buffer):
+                pass
+            cut = last.start() if last is not None else buffer.rfind("\n") + 1
+        text = buffer[:cut]
+        buffer = buffer[cut:]
+
+        matched = 0
+        for head, x0, y0, mid_x, mid_y, x1, y1, width, layer, net in TRACK_PATTERN.findall(text):
+            matched += 1
+            element = _track_element(x0, y0, x1, y1, width, (mid_x, mid_y) if head == "arc" else None)
+            if element is not None:
+                tracks[(unquote(net) if net[0] == '"' else net, unquote(layer) if layer[0] == '"' else layer)].append(element)
+        if matched != len(TRACK_START_PATTERN.findall(text)):
+            return False
+        for net, name in NET_PATTERN.findall(text):
+            net_names[net] = unquote(name)
+        if not chunk:
+            return True
+
+
+def _parse_tracks(f, net_names, tracks):
+    # Any layout, through the S-expression reader
+    for node in iter_nodes(tokenize(f), {"net", "segment", "arc"}):
+        head = node[0]
+        if head == "net":
+            # Declarations are (net <id> "<name>"), pad and zone nets repeat them
+            if len(node) == 3:
+                net_names[node[1]] = node[2]
+            continue
+
+        fields = {item[0]: item[1:] for item in node if isinstance(item, list) and item}
+        if not all(key in fields for key in ("start", "end", "width", "net")):
+            continue
+        element = _track_element(*fields["start"][:2], *fields["end"][:2], fields["width"][0],
+                                 fields["mid"][:2] if head == "arc" and "mid" in fields else None)
+        if element is not None:
+            tracks[(fields["net"][0], fields.get("layer", [None])[0])].append(element)
+
+
+def read_board(path: str):
+    """
+    Stream the tracks of a .kicad_pcb file
+
+    Args:
+        path (str): Board file
+
+    Returns:
+        dict: (net name, layer) -> list of track elements (x0, y0, x1, y1, width, mid), y pointing up,
+              mid the (x, y) middle point of arcs and None for segments
+    """
+
+    net_names = dict()
+    tracks = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        if not _scan_tracks(f, net_names, tracks):
+            net_names.clear()
+            tracks.clear()
+            f.seek(0)
+            _parse_tracks(f, net_names, tracks)
+
+    # Segments refer to nets by number, newer files by name
+    named = defaultdict(list)
+    for (net, layer), elements in tracks.items():
+        name = net if isinstance(net, QuotedString) else net_names.get(net, net)
+        named[(str(name), str(layer))] += elements
+    return dict(named)
+
+
+def pair_nets(net_names):
+    """
+    Pair differential nets by name suffix
+
+    Returns:
+        list: (positive net, negative net) name tuples, in sorted order
+    """
+
+    names = set(net_names)
+    pairs = list()
+    for name in sorted(names):
+        for positive, negative in DIFF_PAIR_SUFFIXES:
+            if name.endswith(positive) and len(name) > len(positive):
+                partner = name[:-len(positive)] + negative
+                if partner in names:
+                    pairs.append((name, partner))
+                    break
+    return pairs
+
+
+def point_key(x: float, y: float):
+    return round(x * KEY_SCALE), round(y * KEY_SCALE)
+
+
+def build_chains(elements):
+    """
+    Chain track elements that share endpoints into paths, broken at branches and dead ends
+
+    Returns:
+        list: Paths, each a list of elements oriented in walking direction
+    """
+
+    ends = defaultdict(list)
+    keys = list()
+    for index, (x0, y0, x1, y1, *_) in enumerate(elements):
+        start, end = point_key(x0, y0), point_key(x1, y1)
+        keys.append((start, end))
+        ends[start].append(index)
+        ends[end].append(index)
+
+    used = bytearray(len(elements))
+
+    def walk(index, key):
+        chain = list()
+        while True:
+            used[index] = 1
+            x0, y0, x1, y1, width, mid = elements[index]
+            start, end = keys[index]
+            if start == key:
+                chain.append((x0, y0, x1, y1, width, mid))
+                key = end
+            else:
+                chain.append((x1, y1, x0, y0, width, mid))
+                key = start
+            incident = ends[key]
+            if len(incident) != 2:
+                return chain
+            index = incident[1] if incident[0] == index else incident[0]
+            if used[index]:
+                return chain
+
+    chains = list()
+    for key, incident in ends.items():
+        if len(incident) != 2:
+            for index in incident:
+                if not used[index]:
+                    chains.append(walk(index, key))
+    # What is left are closed loops
+    for index in range(len(elements)):
+        if not used[index]:
+            chains.append(walk(index, keys[index][0]))
+    return chains
+
+
+def straight_runs(chain):
+    # Chain elements with collinear consecutive segments merged: (x0, y0, x1, y1, width, is_arc, ux, uy)
+    runs = list()
+    for x0, y0, x1, y1, width, mid in chain:
+        is_arc = mid is not None
+        length = math.hypot(x1 - x0, y1 - y0)
+        ux, uy = (x1 - x0) / length, (y1 - y0) / length
+        if runs and not is_arc:
+            last = runs[-1]
+            if not last[5] and last[6] * ux + last[7] * uy >= COS_TOLERANCE and last[4] == width:
+                x0, y0 = last[0], last[1]
+                length = math.hypot(x1 - x0, y1 - y0)
+                runs[-1] = (x0, y0, x1, y1, width, False, (x1 - x0) / length, (y1 - y0) / length)
+                continue
+        runs.append((x0, y0, x1, y1, width, is_arc, ux, uy))
+    return runs
+
+
+def find_jogs(chain, min_offset: float = DEFAULT_MIN_OFFSET):
+    """
+    Lateral jogs along a chain
+
+    A jog leaves a straight run, turns away through at most MAX_JOG_ELEMENTS elements
+    that all move forward, and continues on a straight run parallel to the first.
+
+    Returns:
+        list: (entry x, entry y, exit x, exit y, ux, uy, offset, span, width) per jog, where the entry is the
+              end of the entry run, the exit the start of the exit run and (ux, uy) the direction of travel
+    """
+
+    runs = straight_runs(chain)
+    jogs = list()
+    k = 0
+    while k < len(runs) - 2:
+        x0, y0, x1, y1, width, is_arc, ux, uy = runs[k]
+        if is_arc:
+            k += 1
+            continue
+        found = None
+        for m in range(k + 1, min(k + 2 + MAX_JOG_ELEMENTS, len(runs))):
+            sx0, sy0, sx1, sy1, _, s_arc, sux, suy = runs[m]
+            if (sx1 - sx0) * ux + (sy1 - sy0) * uy < -1e-9:
+                break  # turns back, as in a meander
+            if not s_arc and sux * ux + suy * uy >= COS_TOLERANCE:
+                found = m if m > k + 1 else None
+                break
+        if found is None:
+            k += 1
+            continue
+
+        ex, ey = runs[found][0], runs[found][1]
+        dx, dy = ex - x1, ey - y1
+        offset = dx * uy - dy * ux  # along the right-hand normal (uy, -ux)
+        if math.fabs(offset) >= min_offset:
+            jogs.append((x1, y1, ex, ey, ux, uy, offset, dx * ux + dy * uy, width))
+        k = found
+    return jogs
+
+
+def match_jogs(positive_jogs, negative_jogs, max_distance: float = DEFAULT_PAIR_DISTANCE, offset_tolerance: float = None):
+    """
+    Match the jogs of the two nets of a pair through a grid hash of their entry points
+
+    Args:
+        positive_jogs, negative_jogs (list): Jogs as returned by find_jogs
+        max_distance (float, optional): Largest spacing of the two entry points, along and across the pair (mm)
+        offset_tolerance (float, optional): Largest offset difference of matched jogs (mm), default max_distance / 100
+
+    Returns:
+        list: (x, y, ux, uy, width, gap, offset, span) per matched jog, where (x, y) is the start of the
+              footprint on the centre line of the pair
+    """
+
+    if offset_tolerance is None:
+        offset_tolerance = max_distance / 100
+    grid = defaultdict(list)
+    for index, jog in enumerate(negative_jogs):
+        grid[(math.floor(jog[0] / max_distance), math.floor(jog[1] / max_distance))].append(index)
+
+    used = bytearray(len(negative_jogs))
+    matches = list()
+    for ax0, ay0, ax1, ay1, ux, uy, a_offset, _, a_width in positive_jogs:
+        cell_x, cell_y = math.floor(ax0 / max_distance), math.floor(ay0 / max_distance)
+        best, best_distance = None, math.inf
+        for cx in (cell_x - 1, cell_x, cell_x + 1):
+            for cy in (cell_y - 1, cell_y, cell_y + 1):
+                for index in grid.get((cx, cy), ()):
+                    bx0, by0, _, _, bux, buy, b_offset, _, b_width = negative_jogs[index]
+                    if used[index] or bux * ux + buy * uy < COS_TOLERANCE or \
+                            math.fabs(b_offset - a_offset) > offset_tolerance:
+                        continue
+                    along = (bx0 - ax0) * ux + (by0 - ay0) * uy
+                    across = (bx0 - ax0) * uy - (by0 - ay0) * ux
+                    if math.fabs(along) > max_distance or not (a_width + b_width) / 2 < math.fabs(across) <= max_distance:
+                        continue
+                    distance = math.fabs(along) + math.fabs(across)
+                    if distance < best_distance:
+                        best, best_distance = index, distance
+        if best is None:
+            continue
+
+        used[best] = 1
+        bx0, by0, bx1, by1, _, _, b_offset, _, b_width = negative_jogs[best]
+        along = (bx0 - ax0) * ux + (by0 - ay0) * uy
+        across = (bx0 - ax0) * uy - (by0 - ay0) * ux
+        start = min(0.0, along)
+        end = max((ax1 - ax0) * ux + (ay1 - ay0) * uy, (bx1 - ax0) * ux + (by1 - ay0) * uy)
+        width = (a_width + b_width) / 2
+        # Centre line point where the first trace leaves its entry run; the right-hand normal is (uy, -ux)
+        x = ax0 + uy * across / 2 + ux * start
+        y = ay0 - ux * across / 2 + uy * start
+        matches.append((x, y, ux, uy, width, math.fabs(across) - width, (a_offset + b_offset) / 2, end - start))
+    return matches
+
+
+def quantize(value: float, quantum: float):
+    digits = max(0, -math.floor(math.log10(quantum) + 1e-9))
+    return round(round(value / quantum) * quantum, digits)
+
+
+def scan_board(path: str, output_dir: str = None, min_offset: float = DEFAULT_MIN_OFFSET,
+               min_radius: float = DEFAULT_MIN_RADIUS, max_pair_distance: float = DEFAULT_PAIR_DISTANCE,
+               quantum: float = DEFAULT_QUANTUM, workers: int = None, backend: str = "template",
+               deterministic_uuids: bool = True, report_path: str = None):
+    """
+    Find the diff pair jogs of a board and generate one Strafe footprint per distinct width, gap and offset
+
+    Args:
+        path (str): .kicad_pcb file
+        output_dir (str, optional): Library directory for the footprints. If None, only scans and solves
+        min_offset (float, optional): Smallest lateral offset taken for a jog (mm)
+        min_radius (float, optional): Smallest inner bend radius of the strafes (mm)
+        max_pair_distance (float, optional): Farthest apart the jogs of the two nets of a pair may start (mm)
+        quantum (float, optional): Width, gap and offset are rounded to multiples of this (mm)
+        workers (int, optional): Worker processes generating footprints, defaults to the CPU count
+        backend (str, optional): Render backend, see render.RENDER_BACKENDS
+        deterministic_uuids (bool, optional): Derive UUIDs from footprint names
+        report_path (str, optional): Per-jog report (CSV)
+
+    Returns:
+        dict: Counts of track elements, pairs, jogs, footprints and infeasible jogs, the jogs themselves,
+              generation errors and the time spent per stage
+    """
+
+    timings = dict()
+    start_time = time.perf_counter()
+    tracks = read_board(path)
+    timings["read"] = time.perf_counter() - start_time
+
+    stage_time = time.perf_counter()
+    pairs = pair_nets({net for net, _ in tracks})
+    layers = defaultdict(list)
+    for net, layer in tracks:
+        layers[net].append(layer)
+
+    jogs = list()  # (positive net, negative net, layer, x, y, ux, uy, width, gap, offset, span)
+    for positive, negative in pairs:
+        for layer in layers[positive]:
+            if (negative, layer) not in tracks:
+                continue
+            positive_jogs = [jog for chain in build_chains(tracks[(positive, layer)]) for jog in find_jogs(chain, min_offset)]
+            negative_jogs = [jog for chain in build_chains(tracks[(negative, layer)]) for jog in find_jogs(chain, min_offset)]
+            for match in match_jogs(positive_jogs, negative_jogs, max_pair_distance):
+                jogs.append((positive, negative, layer, *match))
+    timings["pair"] = time.perf_counter() - stage_time
+
+    # One solver row per distinct (width, gap, offset, span), all solved in one call
+    stage_time = time.perf_counter()
+    keys = [(quantize(width, quantum), quantize(gap, quantum), quantize(offset, quantum), span)
+            for *_, width, gap, offset, span in jogs]
+    rows = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+    solution = None
+    if rows:
+        solution = solve_strafe(*np.array(list(rows)).T, min_radius=min_radius, objective="radius")
+
+    # Per (width, gap, offset) the footprint for the shortest feasible span fits every longer one
+    chosen = dict()
+    for key, row in rows.items():
+        footprint_key = key[:3]
+        if solution.feasible[row] and (footprint_key not in chosen or key[3] < chosen[footprint_key][0]):
+            chosen[footprint_key] = (key[3], round(float(solution.radius_scale[row]), 6),
+                                     round(float(solution.middle_tangent_angle[row]), 6))
+    timings["solve"] = time.perf_counter() - stage_time
+
+    stage_time = time.perf_counter()
+    footprints = dict()
+    errors = list()
+    parameters = [(*footprint_key, radius_scale, angle) for footprint_key, (_, radius_scale, angle) in chosen.items()]
+    valid = list()
+    for combination in parameters:
+        try:
+            check_parameters(*combination)
+            valid.append(combination)
+        except ValueError as e:
+            errors.append((combination, str(e)))
+    if output_dir is not None and valid:
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = [(c, output_dir, "", backend, deterministic_uuids, False, True, 0.0) for c in valid]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for combination, (footprint_name, error) in zip(valid, executor.map(build_footprint, jobs, chunksize=16)):
+                if error is None:
+                    footprints[combination[:3]] = footprint_name
+                else:
+                    errors.append((combination, error))
+    else:
+        for combination in valid:
+            footprints[combination[:3]] = Strafe(Point(0, 0), *combination).generate_footprint_name()
+    timings["generate"] = time.perf_counter() - stage_time
+
+    results = list()
+    infeasible = 0
+    for (positive, negative, layer, x, y, ux, uy, *_), key in zip(jogs, keys):
+        footprint_name = footprints.get(key[:3], "")
+        if not solution.feasible[rows[key]]:
+            status = "infeasible"
+            infeasible += 1
+        else:
+            status = "generated" if footprint_name else "error"
+        # Board coordinates, rotation counter-clockwise from the footprint's travel direction (up)
+        rotation = math.degrees(math.atan2(-ux, uy)) % 360
+        results.append((positive, negative, layer, round(x, 6), round(-y, 6), round(rotation, 3),
+                        *key[:3], round(key[3], 6), footprint_name, status))
+
+    if report_path is not None:
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(results)
+
+    timings["total"] = time.perf_counter() - start_time
+    return {
+        "elements": sum(len(elements) for elements in tracks.values()),
+        "pairs": len(pairs),
+        "jogs": results,
+        "footprints": len(footprints),
+        "infeasible": infeasible,
+        "errors": errors,
+        "timings": timings,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate Strafe footprints for every diff pair jog of a KiCad board")
+    parser.add_argument("board", help="Board file (.kicad_pcb)")
+    parser.add_argument("-o", "--output", default=None, help="Output .pretty directory (default: only report)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", default=None, help="Per-jog report (CSV)")
+    parser.add_argument("--min-offset", type=float, default=DEFAULT_MIN_OFFSET, help="Smallest lateral offset of a jog (mm)")
+    parser.add_argument("--min-radius", type=float, default=DEFAULT_MIN_RADIUS, help="Smallest inner bend radius (mm)")
+    parser.add_argument("--pair-distance", type=float, default=DEFAULT_PAIR_DISTANCE,
+                        help="Farthest apart the jogs of the two nets of a pair may start (mm)")
+    parser.add_argument("--quantum", type=float, default=DEFAULT_QUANTUM,
+                        help="Round width, gap and offset to multiples of this for deduplication (mm)")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, default="template", help="Footprint render backend")
+    args = parser.parse_args()
+
+    summary = scan_board(args.board, args.output, min_offset=args.min_offset, min_radius=args.min_radius,
+                         max_pair_distance=args.pair_distance, quantum=args.quantum, workers=args.jobs,
+                         backend=args.backend, report_path=args.report)
+
+    for parameters, error in summary["errors"]:
+        print(f"Skipped {parameters}: {error}")
+    timings = summary["timings"]
+    print(f"Read {summary['elements']} track elements in {timings['read']:.2f} s, "
+          f"found {len(summary['jogs'])} jogs on {summary['pairs']} diff pairs in {timings['pair']:.2f} s")
+    print(f"{summary['footprints']} distinct footprints, {summary['infeasible']} jogs too short for a strafe "
+          f"with radius >= {args.min_radius} mm" + (f", written to {args.output}" if args.output else ""))
+    print(f"Total {timings['total']:.2f} s")
+    if args.report:
+        print(f"Report written to {args.report}")
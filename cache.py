@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+from strafe import GENERATOR_VERSION
+
+# On-disk cache of a library build, stored next to the footprints it describes.
+# KiCad ignores files in a .pretty directory that are not footprints.
+CACHE_FILE_NAME = ".strafe_build_cache.json"
+
+
+def normalize_value(value):
+    # Floats that print the same must hash the same (0.30000000000000004 vs 0.3)
+    if isinstance(value, float):
+        return repr(round(value, 9) + 0.0)
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    return value
+
+
+def cache_key(**inputs):
+    # Content address of one footprint: its normalized inputs plus the generator version
+    normalized = {name: normalize_value(value) for name, value in inputs.items()}
+    normalized["generator_version"] = GENERATOR_VERSION
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class BuildCache:
+    """Maps cache keys to the footprint files rendered from them.
+
+    A footprint is up to date when its key is recorded and the file on disk still
+    has the size and modification time recorded when it was written, so a footprint
+    edited, deleted or overwritten since is regenerated.
+    """
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, CACHE_FILE_NAME)
+        self.output_dir = output_dir
+        self.entries = dict()
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = dict()
+
+    def is_current(self, key: str):
+        entry = self.entries.get(key)
+        current = False
+        if entry is not None:
+            try:
+                stat = os.stat(os.path.join(self.output_dir, entry["file"]))
+                current = stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+            except FileNotFoundError:
+                pass
+
+        if current:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return current
+
+    def record(self, key: str, file_name: str):
+        stat = os.stat(os.path.join(self.output_dir, file_name))
+        self.entries[key] = {"file": file_name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def save(self):
+        # Write to a temporary file first so an interrupted build never leaves a corrupt cache
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
+        os.replace(temp_path, self.path)
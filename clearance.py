@@ -0,0 +1,597 @@
+import csv
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from boardscan import read_board
+from roundtrip import read_footprint
+from sweep import arc_bounds
+
+# Copper clearance check for placed footprints.
+#
+# Every gr_line and gr_arc of the placed footprints' custom pads becomes one
+# primitive in board coordinates (y down, rotation counter-clockwise as seen in
+# KiCad), as do the tracks of a board if given. Primitives go into a uniform grid
+# by their bounding box, widened by half the trace width and half the clearance,
+# so any two primitives closer than the clearance share a cell. Pairs sharing a
+# cell are generated with array operations, and each pair is kept only in the
+# cell holding the lower corner of the overlap of their boxes, so no pair is
+# checked twice and no set of seen pairs is needed.
+#
+# Candidate pairs whose boxes overlap get the exact centre-line distance between
+# line segments and circular arcs, in chunks spread over a process pool. The
+# candidates are the end points of each primitive against the other, crossings,
+# and the points where the connecting line is normal to both (for an arc, through
+# its centre). Copper clearance is that distance minus half of both widths.
+#
+# Primitives of the same footprint instance are not checked against each other:
+# that spacing is the coupling gap, checked by verify.py. Neither are tracks
+# against tracks (the board's own DRC covers them), nor anything on the same net,
+# so tracks connecting to a footprint's pads pass when its nets are given.
+
+DEFAULT_CLEARANCE = 0.2  # mm, copper edge to copper edge
+DEFAULT_LAYER = "F.Cu"
+CLEARANCE_TOLERANCE = 1e-6  # mm, rounding allowance before a pair counts as a violation
+PAIR_BATCH = 1 << 21  # grid pairs generated at a time
+CHUNK_PAIRS = 1 << 15  # candidate pairs per worker task
+
+LINE = 0
+ARC = 1
+
+REPORT_COLUMNS = ("x", "y", "clearance", "first", "second")
+
+
+class Placement:
+    """A footprint instance on the board.
+
+    footprint is a Strafe or any other DiffPairFootprint, a .kicad_mod path, or a dict with
+    "footprint_name" and "pads" as from generate_footprint_parameters or roundtrip.read_footprint.
+    (x, y) is the footprint origin in board coordinates, rotation in degrees, counter-clockwise
+    as in KiCad. nets maps pad numbers to net names, name labels the instance in reports.
+    """
+
+    __slots__ = ("footprint", "x", "y", "rotation", "nets", "name")
+
+    def __init__(self, footprint, x: float = 0.0, y: float = 0.0, rotation: float = 0.0, nets: dict = None,
+                 name: str = None):
+        self.footprint = footprint
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.nets = nets or dict()
+        self.name = name
+
+
+def footprint_data(footprint):
+    # (footprint name, pads) of any footprint form Placement accepts
+    if isinstance(footprint, str):
+        footprint = read_footprint(footprint)
+    elif not isinstance(footprint, dict):
+        footprint = footprint.generate_footprint_parameters(deterministic_uuids=True)
+    return footprint["footprint_name"], footprint["pads"]
+
+
+def local_primitives(pads):
+    """
+    Custom pad primitives of a footprint in footprint coordinates
+
+    Returns:
+        tuple: (kind, start x, start y, mid x, mid y, end x, end y, width) arrays and the pad number of each
+    """
+
+    rows, numbers = list(), list()
+    for pad in pads:
+        for primitive in pad.get("primitives", ()):
+            x, y = pad["pos_x"], pad["pos_y"]
+            if primitive["type"] == "gr_arc":
+                rows.append((ARC, primitive["start_x"] + x, primitive["start_y"] + y, primitive["mid_x"] + x,
+                             primitive["mid_y"] + y, primitive["end_x"] + x, primitive["end_y"] + y, primitive["width"]))
+            else:
+                rows.append((LINE, primitive["start_x"] + x, primitive["start_y"] + y, 0.0, 0.0,
+                             primitive["end_x"] + x, primitive["end_y"] + y, primitive["width"]))
+            numbers.append(str(pad["number"]))
+    return np.array(rows, dtype=float).reshape(-1, 8), numbers
+
+
+class PrimitiveSet:
+    """Line segments and circular arcs in board coordinates, one row per primitive.
+
+    Lines use (ax, ay) -> (bx, by). Arcs also have centre, radius, start angle and signed
+    sweep, with (ax, ay) and (bx, by) their end points. owner is the placement index, -1
+    for tracks; net is a net number, -1 if unknown; label indexes labels.
+    """
+
+    def __init__(self, kind, ax, ay, mx, my, bx, by, width, owner, net, label, labels):
+        n = len(kind)
+        self.ax, self.ay, self.bx, self.by = ax, ay, bx, by
+        self.width = width
+        self.owner = owner
+        self.net = net
+        self.label = label
+        self.labels = labels
+
+        # Circle through start, mid and end; collinear arcs are taken as lines
+        with np.errstate(divide="ignore", invalid="ignore"):
+            d = 2 * (ax * (my - by) + mx * (by - ay) + bx * (ay - my))
+            a2, m2, b2 = ax * ax + ay * ay, mx * mx + my * my, bx * bx + by * by
+            cx = (a2 * (my - by) + m2 * (by - ay) + b2 * (ay - my)) / d
+            cy = (a2 * (bx - mx) + m2 * (ax - bx) + b2 * (mx - ax)) / d
+        self.kind = np.where((kind == ARC) & (np.fabs(d) > 1e-15) & np.isfinite(cx) & np.isfinite(cy), ARC, LINE)
+        arcs = self.kind == ARC
+        self.cx = np.where(arcs, cx, 0.0)
+        self.cy = np.where(arcs, cy, 0.0)
+        self.radius = np.where(arcs, np.hypot(ax - self.cx, ay - self.cy), 0.0)
+        self.start = np.arctan2(ay - self.cy, ax - self.cx)
+        end = np.arctan2(by - self.cy, bx - self.cx)
+        mid = np.arctan2(my - self.cy, mx - self.cx)
+        sweep = np.remainder(end - self.start, 2 * math.pi)
+        self.sweep = np.where(arcs, np.where(np.remainder(mid - self.start, 2 * math.pi) > sweep, sweep - 2 * math.pi, sweep), 0.0)
+
+        self.x_min = np.minimum(ax, bx)
+        self.x_max = np.maximum(ax, bx)
+        self.y_min = np.minimum(ay, by)
+        self.y_max = np.maximum(ay, by)
+        if arcs.any():
+            xs, ys = arc_bounds(self.cx[arcs], self.cy[arcs], self.radius[arcs], self.start[arcs], self.sweep[arcs])
+            xs, ys = np.stack(xs), np.stack(ys)
+            self.x_min[arcs], self.x_max[arcs] = xs.min(axis=0), xs.max(axis=0)
+            self.y_min[arcs], self.y_max[arcs] = ys.min(axis=0), ys.max(axis=0)
+        assert len(self.x_min) == n
+
+    def __len__(self):
+        return len(self.kind)
+
+    def columns(self):
+        # Arrays the distance kernels need, for sending to worker processes
+        return {name: getattr(self, name) for name in ("kind", "ax", "ay", "bx", "by", "cx", "cy", "radius", "start",
+                                                       "sweep", "width")}
+
+
+def build_primitives(placements, tracks=None, layer: str = DEFAULT_LAYER):
+    """
+    Collect the copper of placed footprints and board tracks
+
+    Args:
+        placements (list): Placement instances
+        tracks (dict, optional): (net name, layer) -> elements, as returned by boardscan.read_board
+        layer (str, optional): Copper layer of the tracks to include
+
+    Returns:
+        PrimitiveSet
+    """
+
+    net_ids = dict()
+    labels = list()
+    parts = list()  # (rows (n, 8), owner (n), net (n), label (n))
+
+    # Footprints are read once however often they are placed, then all instances of one are transformed at once
+    footprints = dict()
+    for index, placement in enumerate(placements):
+        key = placement.footprint if isinstance(placement.footprint, str) else id(placement.footprint)
+        if key not in footprints:
+            footprint_name, pads = footprint_data(placement.footprint)
+            footprints[key] = (footprint_name, *local_primitives(pads), list())
+        footprints[key][3].append(index)
+
+    for footprint_name, rows, numbers, indices in footprints.values():
+        if not len(rows):
+            continue
+        angle = np.radians([placements[i].rotation for i in indices])[:, None]
+        cos, sin = np.cos(angle), np.sin(angle)
+        origin_x = np.array([placements[i].x for i in indices])[:, None]
+        origin_y = np.array([placements[i].y for i in indices])[:, None]
+        placed = np.empty((len(indices), len(rows), 8))
+        placed[:, :, 0] = rows[:, 0]
+        placed[:, :, 7] = rows[:, 7]
+        for x_column in (1, 3, 5):
+            x, y = rows[:, x_column], rows[:, x_column + 1]
+            placed[:, :, x_column] = origin_x + x * cos + y * sin
+            placed[:, :, x_column + 1] = origin_y - x * sin + y * cos
+
+        nets = np.empty((len(indices), len(rows)), dtype=np.int64)
+        label = np.empty((len(indices), len(rows)), dtype=np.int64)
+        for k, i in enumerate(indices):
+            placement = placements[i]
+            name = placement.name or f"{footprint_name} #{i}"
+            pad_labels = dict()
+            for column, number in enumerate(numbers):
+                net = placement.nets.get(number)
+                nets[k, column] = net_ids.setdefault(net, len(net_ids)) if net else -1
+                if number not in pad_labels:
+                    pad_labels[number] = len(labels)
+                    labels.append(f"{name} pad {number}")
+                label[k, column] = pad_labels[number]
+        parts.append((placed.reshape(-1, 8), np.repeat(np.array(indices), len(rows)), nets.ravel(), label.ravel()))
+
+    for (net, track_layer), elements in (tracks or dict()).items():
+        if track_layer != layer or not elements:
+            continue
+        # boardscan elements have y pointing up
+        rows = np.array([(LINE if mid is None else ARC, x0, -y0, *((mid[0], -mid[1]) if mid else (0.0, 0.0)), x1, -y1, width)
+                         for x0, y0, x1, y1, width, mid in elements])
+        labels.append(f"track {net} ({track_layer})")
+        parts.append((rows, np.full(len(rows), -1), np.full(len(rows), net_ids.setdefault(net, len(net_ids))),
+                      np.full(len(rows), len(labels) - 1)))
+
+    if not parts:
+        parts.append((np.zeros((0, 8)), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)))
+    rows = np.concatenate([part[0] for part in parts])
+    owner, net, label = (np.concatenate([part[k] for part in parts]).astype(np.int64) for k in (1, 2, 3))
+    return PrimitiveSet(rows[:, 0].astype(np.int64), *rows[:, 1:7].T, rows[:, 7], owner, net, label, labels)
+
+
+def candidate_pairs(primitives: PrimitiveSet, clearance: float, cell_size: float = None):
+    """
+    Yield batches of primitive index pairs (i, j) whose widened bounding boxes overlap, each pair once
+
+    Args:
+        primitives (PrimitiveSet): Primitives to pair
+        clearance (float): Required clearance (mm); boxes are widened by half of it on every side
+        cell_size (float, optional): Grid cell size (mm), defaults to the 90th percentile of box sizes
+    """
+
+    n = len(primitives)
+    if n < 2:
+        return
+    margin = primitives.width / 2 + clearance / 2
+    x_min, x_max = primitives.x_min - margin, primitives.x_max + margin
+    y_min, y_max = primitives.y_min - margin, primitives.y_max + margin
+    if cell_size is None:
+        cell_size = float(np.percentile(np.maximum(x_max - x_min, y_max - y_min), 90))
+
+    origin_x, origin_y = x_min.min(), y_min.min()
+    ix0 = ((x_min - origin_x) // cell_size).astype(np.int64)
+    ix1 = ((x_max - origin_x) // cell_size).astype(np.int64)
+    iy0 = ((y_min - origin_y) // cell_size).astype(np.int64)
+    iy1 = ((y_max - origin_y) // cell_size).astype(np.int64)
+    rows = int(iy1.max()) + 1
+
+    # One entry per (cell, primitive) the box covers
+    nx, ny = ix1 - ix0 + 1, iy1 - iy0 + 1
+    counts = nx * ny
+    primitive = np.repeat(np.arange(n), counts)
+    local = np.arange(len(primitive)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell = (ix0[primitive] + local // ny[primitive]) * rows + iy0[primitive] + local % ny[primitive]
+    order = np.argsort(cell, kind="stable")
+    cell, primitive = cell[order], primitive[order]
+
+    # Every entry pairs with the entries after it in the same cell
+    boundaries = np.flatnonzero(np.diff(cell)) + 1
+    group_end = np.repeat(np.append(boundaries, len(cell)), np.diff(np.concatenate(([0], boundaries, [len(cell)]))))
+    partners = group_end - np.arange(len(cell)) - 1
+    cumulative = np.cumsum(partners)
+
+    owner, net, is_track = primitives.owner, primitives.net, primitives.owner < 0
+    start = 0
+    while start < len(cell):
+        done = cumulative[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(cumulative, done + PAIR_BATCH, side="right")))
+        entries = np.arange(start, stop)
+        batch_counts = partners[start:stop]
+        first = np.repeat(entries, batch_counts)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+        start = stop
+        if not len(first):
+            continue
+
+        i, j = primitive[first], primitive[second]
+        keep = (owner[i] != owner[j]) & ~(is_track[i] & is_track[j]) & ~((net[i] == net[j]) & (net[i] >= 0))
+        keep &= (x_min[i] <= x_max[j]) & (x_min[j] <= x_max[i]) & (y_min[i] <= y_max[j]) & (y_min[j] <= y_max[i])
+        # Only in the cell holding the lower corner of the overlap
+        corner_x = ((np.maximum(x_min[i], x_min[j]) - origin_x) // cell_size).astype(np.int64)
+        corner_y = ((np.maximum(y_min[i], y_min[j]) - origin_y) // cell_size).astype(np.int64)
+        keep &= corner_x * rows + corner_y == cell[first]
+        if keep.any():
+            yield i[keep], j[keep]
+
+
+def _in_sweep(angle, start, sweep):
+    return np.remainder((angle - start) * np.sign(sweep), 2 * math.pi) <= np.fabs(sweep) + 1e-12
+
+
+def _keep_closest(best, candidate, valid=None):
+    # Update best (distance, px, py, qx, qy) in place where the candidate is closer
+    closer = candidate[0] < best[0]
+    if valid is not None:
+        closer &= valid
+    for column, values in zip(best, candidate):
+        column[closer] = np.broadcast_to(values, closer.shape)[closer]
+
+
+def point_segment(px, py, ax, ay, bx, by):
+    # Distance from points to segments and the closest segment points
+    dx, dy = bx - ax, by - ay
+    squared = dx * dx + dy * dy
+    t = np.clip(((px - ax) * dx + (py - ay) * dy) / np.where(squared > 0, squared, 1.0), 0.0, 1.0)
+    qx, qy = ax + t * dx, ay + t * dy
+    return np.hypot(px - qx, py - qy), qx, qy
+
+
+def point_arc(px, py, cx, cy, radius, start, sweep, ax, ay, bx, by):
+    # Distance from points to arcs and the closest arc points
+    angle = np.arctan2(py - cy, px - cx)
+    on_arc = _in_sweep(angle, start, sweep)
+    to_start, to_end = np.hypot(px - ax, py - ay), np.hypot(px - bx, py - by)
+    nearer_start = to_start <= to_end
+    distance = np.where(on_arc, np.fabs(np.hypot(px - cx, py - cy) - radius), np.minimum(to_start, to_end))
+    qx = np.where(on_arc, cx + radius * np.cos(angle), np.where(nearer_start, ax, bx))
+    qy = np.where(on_arc, cy + radius * np.sin(angle), np.where(nearer_start, ay, by))
+    return distance, qx, qy
+
+
+def segment_segment(s, t):
+    # s and t are (ax, ay, bx, by) tuples of arrays. Returns (distance, px, py, qx, qy), p on s and q on t
+    sax, say, sbx, sby = s
+    tax, tay, tbx, tby = t
+    best = [np.full(len(sax), np.inf)] + [np.zeros(len(sax)) for _ in range(4)]
+    for px, py in ((sax, say), (sbx, sby)):
+        distance, qx, qy = point_segment(px, py, tax, tay, tbx, tby)
+        _keep_closest(best, (distance, px, py, qx, qy))
+    for qx, qy in ((tax, tay), (tbx, tby)):
+        distance, px, py = point_segment(qx, qy, sax, say, sbx, sby)
+        _keep_closest(best, (distance, px, py, qx, qy))
+
+    # Proper crossings; touching and collinear overlaps are found by the end points above
+    sdx, sdy, tdx, tdy = sbx - sax, sby - say, tbx - tax, tby - tay
+    o1 = sdx * (tay - say) - sdy * (tax - sax)
+    o2 = sdx * (tby - say) - sdy * (tbx - sax)
+    o3 = tdx * (say - tay) - tdy * (sax - tax)
+    o4 = tdx * (sby - tay) - tdy * (sbx - tax)
+    crossing = (o1 * o2 < 0) & (o3 * o4 < 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = o3 / (o3 - o4)
+    x, y = sax + u * sdx, say + u * sdy
+    _keep_closest(best, (np.zeros(len(sax)), x, y, x, y), crossing)
+    return best
+
+
+def segment_arc(s, arc):
+    # s is (ax, ay, bx, by), arc is (cx, cy, radius, start, sweep, ax, ay, bx, by). p on s, q on arc
+    sax, say, sbx, sby = s
+    cx, cy, radius, start, sweep, aax, aay, abx, aby = arc
+    best = [np.full(len(sax), np.inf)] + [np.zeros(len(sax)) for _ in range(4)]
+    for px, py in ((sax, say), (sbx, sby)):
+        distance, qx, qy = point_arc(px, py, *arc)
+        _keep_closest(best, (distance, px, py, qx, qy))
+    for qx, qy in ((aax, aay), (abx, aby)):
+        distance, px, py = point_segment(qx, qy, sax, say, sbx, sby)
+        _keep_closest(best, (distance, px, py, qx, qy))
+
+    dx, dy = sbx - sax, sby - say
+    squared = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Foot of the centre on the segment, and the arc point on the ray towards it
+        t = ((cx - sax) * dx + (cy - say) * dy) / squared
+        fx, fy = sax + t * dx, say + t * dy
+        to_foot = np.hypot(fx - cx, fy - cy)
+        qx, qy = cx + radius * (fx - cx) / to_foot, cy + radius * (fy - cy) / to_foot
+        valid = (t >= 0) & (t <= 1) & (to_foot > 1e-12) & _in_sweep(np.arctan2(fy - cy, fx - cx), start, sweep)
+        _keep_closest(best, (np.fabs(to_foot - radius), fx, fy, qx, qy), valid)
+
+        # Crossings of the segment and the circle that lie on the arc
+        b = 2 * ((sax - cx) * dx + (say - cy) * dy)
+        c = (sax - cx) ** 2 + (say - cy) ** 2 - radius * radius
+        root = np.sqrt(b * b - 4 * squared * c)
+        for sign in (-1.0, 1.0):
+            u = (-b + sign * root) / (2 * squared)
+            x, y = sax + u * dx, say + u * dy
+            valid = (u >= 0) & (u <= 1) & _in_sweep(np.arctan2(y - cy, x - cx), start, sweep)
+            _keep_closest(best, (np.zeros(len(sax)), x, y, x, y), valid)
+    return best
+
+
+def arc_arc(first, second):
+    # Both are (cx, cy, radius, start, sweep, ax, ay, bx, by). p on first, q on second
+    c1x, c1y, r1, start1, sweep1, a1x, a1y, b1x, b1y = first
+    c2x, c2y, r2, start2, sweep2, a2x, a2y, b2x, b2y = second
+    best = [np.full(len(c1x), np.inf)] + [np.zeros(len(c1x)) for _ in range(4)]
+    for px, py in ((a1x, a1y), (b1x, b1y)):
+        distance, qx, qy = point_arc(px, py, *second)
+        _keep_closest(best, (distance, px, py, qx, qy))
+    for qx, qy in ((a2x, a2y), (b2x, b2y)):
+        distance, px, py = point_arc(qx, qy, *first)
+        _keep_closest(best, (distance, px, py, qx, qy))
+
+    dx, dy = c2x - c1x, c2y - c1y
+    centre_distance = np.hypot(dx, dy)
+    apart = centre_distance > 1e-12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ux, uy = dx / centre_distance, dy / centre_distance
+        # Points on the line through both centres
+        for s1 in (-1.0, 1.0):
+            for s2 in (-1.0, 1.0):
+                px, py = c1x + s1 * r1 * ux, c1y + s1 * r1 * uy
+                qx, qy = c2x + s2 * r2 * ux, c2y + s2 * r2 * uy
+                valid = apart & _in_sweep(np.arctan2(s1 * uy, s1 * ux), start1, sweep1) & \
+                    _in_sweep(np.arctan2(s2 * uy, s2 * ux), start2, sweep2)
+                _keep_closest(best, (np.hypot(qx - px, qy - py), px, py, qx, qy), valid)
+
+        # Circle crossings on both arcs
+        along = (r1 * r1 - r2 * r2 + centre_distance * centre_distance) / (2 * centre_distance)
+        height = np.sqrt(r1 * r1 - along * along)
+        for sign in (-1.0, 1.0):
+            x = c1x + along * ux - sign * height * uy
+            y = c1y + along * uy + sign * height * ux
+            valid = apart & _in_sweep(np.arctan2(y - c1y, x - c1x), start1, sweep1) & \
+                _in_sweep(np.arctan2(y - c2y, x - c2x), start2, sweep2)
+            _keep_closest(best, (np.zeros(len(c1x)), x, y, x, y), valid)
+
+    # Concentric arcs with overlapping angles are |r1 - r2| apart
+    for angle, on_other in ((start1, _in_sweep(start1, start2, sweep2)), (start2, _in_sweep(start2, start1, sweep1))):
+        px, py = c1x + r1 * np.cos(angle), c1y + r1 * np.sin(angle)
+        qx, qy = c2x + r2 * np.cos(angle), c2y + r2 * np.sin(angle)
+        _keep_closest(best, (np.fabs(r1 - r2), px, py, qx, qy), ~apart & on_other)
+    return best
+
+
+def pair_distances(columns: dict, i, j):
+    """
+    Exact centre-line distance between primitives i and j, and the closest points
+
+    Args:
+        columns (dict): PrimitiveSet.columns()
+        i, j (np.ndarray): Primitive indices, paired element-wise
+
+    Returns:
+        tuple: (distance, px, py, qx, qy) arrays, p on primitive i and q on primitive j
+    """
+
+    kind = columns["kind"]
+    result = [np.empty(len(i)) for _ in range(5)]
+
+    def segment(rows):
+        return tuple(columns[name][rows] for name in ("ax", "ay", "bx", "by"))
+
+    def arc(rows):
+        return tuple(columns[name][rows] for name in ("cx", "cy", "radius", "start", "sweep", "ax", "ay", "bx", "by"))
+
+    for first_kind, second_kind in ((LINE, LINE), (LINE, ARC), (ARC, LINE), (ARC, ARC)):
+        rows = np.flatnonzero((kind[i] == first_kind) & (kind[j] == second_kind))
+        if not len(rows):
+            continue
+        a, b = i[rows], j[rows]
+        if first_kind == LINE and second_kind == LINE:
+            found = segment_segment(segment(a), segment(b))
+        elif first_kind == LINE:
+            found = segment_arc(segment(a), arc(b))
+        elif second_kind == LINE:
+            distance, qx, qy, px, py = segment_arc(segment(b), arc(a))
+            found = (distance, px, py, qx, qy)
+        else:
+            found = arc_arc(arc(a), arc(b))
+        for column, values in zip(result, found):
+            column[rows] = values
+    return tuple(result)
+
+
+_columns = None
+
+
+def _init_worker(columns):
+    global _columns
+    _columns = columns
+
+
+def _check_chunk(job):
+    # Worker: (i, j, clearance) -> violating rows as (i, j, clearance found, x, y)
+    i, j, clearance = job
+    distance, px, py, qx, qy = pair_distances(_columns, i, j)
+    gap = distance - (_columns["width"][i] + _columns["width"][j]) / 2
+    violating = gap < clearance - CLEARANCE_TOLERANCE
+    return i[violating], j[violating], gap[violating], ((px + qx) / 2)[violating], ((py + qy) / 2)[violating]
+
+
+def check_clearance(placements, tracks=None, clearance: float = DEFAULT_CLEARANCE, layer: str = DEFAULT_LAYER,
+                    workers: int = None, cell_size: float = None, report_path: str = None):
+    """
+    Check the copper clearance of placed footprints against each other and against board tracks
+
+    Args:
+        placements (list): Placement instances
+        tracks (dict, optional): Board tracks, as returned by boardscan.read_board
+        clearance (float, optional): Required copper edge to copper edge distance (mm)
+        layer (str, optional): Copper layer of the tracks to check against
+        workers (int, optional): Worker processes, defaults to the CPU count
+        cell_size (float, optional): Grid cell size (mm), see candidate_pairs
+        report_path (str, optional): Violations (CSV), sorted by clearance
+
+    Returns:
+        dict: Primitive and candidate pair counts, violations as (x, y, clearance found, first, second)
+              sorted by clearance, elapsed time per stage
+    """
+
+    timings = dict()
+    start_time = time.perf_counter()
+    primitives = build_primitives(placements, tracks, layer)
+    timings["build"] = time.perf_counter() - start_time
+
+    stage_time = time.perf_counter()
+    jobs = list()
+    for i, j in candidate_pairs(primitives, clearance, cell_size):
+        for start in range(0, len(i), CHUNK_PAIRS):
+            jobs.append((i[start:start + CHUNK_PAIRS], j[start:start + CHUNK_PAIRS], clearance))
+    candidates = sum(len(job[0]) for job in jobs)
+    timings["index"] = time.perf_counter() - stage_time
+
+    stage_time = time.perf_counter()
+    found = list()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(primitives.columns(),)) as executor:
+            found = list(executor.map(_check_chunk, jobs))
+    timings["distance"] = time.perf_counter() - stage_time
+
+    violations = list()
+    for i, j, gap, x, y in found:
+        for a, b, g, vx, vy in zip(i, j, gap, x, y):
+            violations.append((float(vx), float(vy), float(g), primitives.labels[primitives.label[a]],
+                               primitives.labels[primitives.label[b]]))
+    violations.sort(key=lambda violation: violation[2])
+
+    if report_path is not None:
+        with open(report_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows((round(x, 6), round(y, 6), round(g, 6), first, second) for x, y, g, first, second in violations)
+
+    timings["total"] = time.perf_counter() - start_time
+    return {
+        "primitives": len(primitives),
+        "candidates": candidates,
+        "violations": violations,
+        "timings": timings,
+    }
+
+
+def read_placements(path: str, library_dir: str = None):
+    """
+    Placements from a CSV file with columns footprint, x, y and optionally rotation, name and net_<pad number>
+
+    The footprint column is a .kicad_mod path or a footprint name, looked up in library_dir.
+    """
+
+    placements = list()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            footprint = row["footprint"]
+            if library_dir is not None and not os.path.isabs(footprint):
+                footprint = os.path.join(library_dir, footprint)
+            if not footprint.endswith(".kicad_mod"):
+                footprint += ".kicad_mod"
+            nets = {key[len("net_"):]: value for key, value in row.items() if key.startswith("net_") and value}
+            placements.append(Placement(footprint, float(row["x"]), float(row["y"]), float(row.get("rotation") or 0),
+                                        nets, row.get("name") or None))
+    return placements
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check copper clearance of placed footprints against each other and board tracks")
+    parser.add_argument("placements", help="Placements (CSV): footprint, x, y[, rotation, name, net_1, net_2, ...]")
+    parser.add_argument("--library", default=None, help="Library directory the footprint names refer to")
+    parser.add_argument("--board", default=None, help="Board (.kicad_pcb) whose tracks to check against")
+    parser.add_argument("--layer", default=DEFAULT_LAYER, help="Copper layer of the board tracks")
+    parser.add_argument("--clearance", type=float, default=DEFAULT_CLEARANCE, help="Required clearance (mm)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", default=None, help="Violations (CSV)")
+    args = parser.parse_args()
+
+    tracks = read_board(args.board) if args.board else None
+    summary = check_clearance(read_placements(args.placements, args.library), tracks, args.clearance, args.layer,
+                              workers=args.jobs, report_path=args.report)
+
+    for x, y, gap, first, second in summary["violations"][:20]:
+        print(f"({x:.4f}, {y:.4f}): {gap:.4f} mm between {first} and {second}")
+    if len(summary["violations"]) > 20:
+        print(f"... {len(summary['violations']) - 20} more")
+    timings = summary["timings"]
+    print(f"Checked {summary['primitives']} primitives, {summary['candidates']} candidate pairs in {timings['total']:.2f} s "
+          f"(build {timings['build']:.2f} s, index {timings['index']:.2f} s, distances {timings['distance']:.2f} s): "
+          f"{len(summary['violations'])} violations of {args.clearance} mm")
+    if args.report:
+        print(f"Report written to {args.report}")
+    exit(1 if summary["violations"] else 0)
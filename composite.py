@@ -0,0 +1,219 @@
+import math
+
+from primitives import Point
+from serpentine import Serpentine
+from strafe import DiffPairFootprint, Strafe
+
+# Curve types a composite path can chain, by name. Every curve type takes
+# (start, trace_width, trace_gap, **parameters), starts with the pair centred on
+# start heading along +y, and ends heading along +y again.
+SEGMENT_TYPES = {
+    "strafe": Strafe,
+    "serpentine": Serpentine,
+}
+
+
+# CompositePath chains curve segments into one footprint.
+# Parameters:
+# - start: Starting point of the pair centre (x: float, y: float)
+# - trace_width: Width of the trace, shared by all segments (mm: float)
+# - trace_gap: Gap between traces, shared by all segments (mm: float)
+# - segments: (kind, parameters) pairs, kind a key of SEGMENT_TYPES and parameters a dict
+#   of that curve's own parameters, e.g. ("strafe", {"offset_x": 2, "radius_scale": 0.2, "middle_tangent_angle": 1.2})
+# - name: Footprint name part identifying the path (str)
+#
+# Each segment is built once at the origin and placed at the end of the segment
+# before it. Changing a segment rebuilds only that segment, and moves the segments
+# after it and updates their cumulative lengths, which is plain arithmetic. The
+# joined primitive lists are assembled on first use after a change.
+
+class CompositePath(DiffPairFootprint):
+    def __init__(self, start: Point, trace_width: float, trace_gap: float, segments=(), name: str = ""):
+        self.start = start
+        self.trace_width = trace_width
+        self.trace_gap = trace_gap
+        self.name = name
+
+        half_center_width = (self.trace_width + self.trace_gap) / 2
+        self.minus_start_point = Point(self.start.x - half_center_width, self.start.y)
+        self.plus_start_point = Point(self.start.x + half_center_width, self.start.y)
+
+        self.segments = list()
+        self.curves = list()
+        self.origins = list()
+        self.minus_cumulative_lengths = list()
+        self.plus_cumulative_lengths = list()
+        self._placed = list()
+        self._joined = None
+
+        for kind, parameters in segments:
+            self.segments.append((kind, dict(parameters)))
+            self.curves.append(self._build_curve(kind, self.segments[-1][1]))
+            self._placed.append(None)
+        self._update_from(0)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def _build_curve(self, kind: str, parameters: dict):
+        if kind not in SEGMENT_TYPES:
+            raise ValueError(f"unknown segment type '{kind}', expected one of {', '.join(SEGMENT_TYPES)}")
+        return SEGMENT_TYPES[kind](Point(0, 0), self.trace_width, self.trace_gap, **parameters)
+
+    def _update_from(self, first: int):
+        # Re-place segments first.. and refresh cumulative lengths and end points
+        del self.origins[first:]
+        del self.minus_cumulative_lengths[first:]
+        del self.plus_cumulative_lengths[first:]
+
+        x, y = (self.start.x, self.start.y) if first == 0 else self._end_center(first - 1)
+        minus_length = self.minus_cumulative_lengths[-1] if first > 0 else 0.0
+        plus_length = self.plus_cumulative_lengths[-1] if first > 0 else 0.0
+        for i in range(first, len(self.curves)):
+            curve = self.curves[i]
+            self.origins.append((x, y))
+            minus_length += curve.minus_trace_length
+            plus_length += curve.plus_trace_length
+            self.minus_cumulative_lengths.append(minus_length)
+            self.plus_cumulative_lengths.append(plus_length)
+            self._placed[i] = None
+            x, y = self._end_center(i)
+
+        self.minus_trace_length = minus_length
+        self.plus_trace_length = plus_length
+        self._joined = None
+
+        half_center_width = (self.trace_width + self.trace_gap) / 2
+        self.minus_end_point = Point(x - half_center_width, y)
+        self.plus_end_point = Point(x + half_center_width, y)
+
+    def _end_center(self, i: int):
+        # Pair centre where segment i ends, in path coordinates
+        curve = self.curves[i]
+        origin_x, origin_y = self.origins[i]
+        return (origin_x + (curve.minus_end_point.x + curve.plus_end_point.x) / 2,
+                origin_y + (curve.minus_end_point.y + curve.plus_end_point.y) / 2)
+
+    def append(self, kind: str, **parameters):
+        self.insert(len(self.segments), kind, **parameters)
+
+    def insert(self, index: int, kind: str, **parameters):
+        curve = self._build_curve(kind, parameters)
+        self.segments.insert(index, (kind, parameters))
+        self.curves.insert(index, curve)
+        self._placed.insert(index, None)
+        self._update_from(min(index, len(self.segments) - 1))
+
+    def remove(self, index: int):
+        del self.segments[index]
+        del self.curves[index]
+        del self._placed[index]
+        self._update_from(min(index, len(self.segments)))
+
+    def update(self, index: int, **changes):
+        # Change some parameters of segment index, keeping the others
+        kind, parameters = self.segments[index]
+        parameters = {**parameters, **changes}
+        self.curves[index] = self._build_curve(kind, parameters)
+        self.segments[index] = (kind, parameters)
+        self._update_from(index)
+
+    def calculate_trace_length(self):
+        # Kept up to date by every change, see _update_from
+        pass
+
+    def get_segment_primitives(self, i: int):
+        # (minus, plus) primitives of segment i, placed in path coordinates
+        if self._placed[i] is None:
+            dx, dy = self.origins[i]
+            curve = self.curves[i]
+            self._placed[i] = ([primitive.translate(dx, dy) for primitive in curve.minus_primitives],
+                               [primitive.translate(dx, dy) for primitive in curve.plus_primitives])
+        return self._placed[i]
+
+    def _join(self):
+        if self._joined is None:
+            minus_primitives, plus_primitives = list(), list()
+            for i in range(len(self.segments)):
+                minus, plus = self.get_segment_primitives(i)
+                minus_primitives.extend(minus)
+                plus_primitives.extend(plus)
+            self._joined = (minus_primitives, plus_primitives)
+        return self._joined
+
+    @property
+    def minus_primitives(self):
+        return self._join()[0]
+
+    @property
+    def plus_primitives(self):
+        return self._join()[1]
+
+    def generate_footprint_name(self):
+        name = f"_{self.name}" if self.name else ""
+        offset = self.minus_end_point.x - self.minus_start_point.x
+        return f"dp_path{name}_w{self.trace_width}_g{self.trace_gap}_n{len(self.segments)}_offs{round(offset, 4)}mm"
+
+    def generate_footprint_description(self):
+        kinds = ", ".join(kind for kind, _ in self.segments)
+        return (f"differential pair path of {len(self.segments)} segments ({kinds}), trace width: {self.trace_width} mm "
+                f"trace gap {self.trace_gap} mm length {round(self.plus_trace_length, 4)} mm")
+
+
+def random_segments(n: int, seed: int = 0):
+    # Strafes of alternating direction, for benchmarks
+    import random
+    rng = random.Random(seed)
+    return [("strafe", {"offset_x": rng.uniform(0.5, 4.0) * (1 if i % 2 else -1),
+                        "radius_scale": rng.uniform(0.1, 0.5),
+                        "middle_tangent_angle": rng.uniform(0.6, 1.4)}) for i in range(n)]
+
+
+if __name__ == "__main__":
+
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="Time editing one segment of a composite path against a full rebuild")
+    parser.add_argument("--segments", type=int, default=100, help="Segments in the chain")
+    parser.add_argument("--edits", type=int, default=2000, help="Random single-segment edits to time")
+    args = parser.parse_args()
+
+    segments = random_segments(args.segments)
+    rng = random.Random(1)
+    edits = [(rng.randrange(args.segments), rng.uniform(0.5, 4.0)) for _ in range(args.edits)]
+
+    def edit_parameters(i, offset):
+        return ("strafe", {**segments[i][1], "offset_x": math.copysign(offset, segments[i][1]["offset_x"])})
+
+    # Full rebuild: a new path with the edited segment
+    start_time = time.perf_counter()
+    for i, offset in edits:
+        rebuilt = CompositePath(Point(0, 0), 0.2, 0.2, segments[:i] + [edit_parameters(i, offset)] + segments[i + 1:])
+        rebuilt.minus_primitives
+    rebuild = (time.perf_counter() - start_time) / len(edits)
+
+    path = CompositePath(Point(0, 0), 0.2, 0.2, segments)
+    start_time = time.perf_counter()
+    for i, offset in edits:
+        path.update(i, **edit_parameters(i, offset)[1])
+    incremental = (time.perf_counter() - start_time) / len(edits)
+
+    start_time = time.perf_counter()
+    for i, offset in edits:
+        path.update(i, **edit_parameters(i, offset)[1])
+        path.minus_primitives
+    incremental_primitives = (time.perf_counter() - start_time) / len(edits)
+
+    # Incremental and full rebuilds must agree
+    reference = CompositePath(Point(0, 0), 0.2, 0.2, path.segments)
+    deviation = max(math.fabs(path.plus_trace_length - reference.plus_trace_length),
+                    math.fabs(path.plus_end_point.x - reference.plus_end_point.x),
+                    math.fabs(path.plus_end_point.y - reference.plus_end_point.y))
+
+    print(f"{args.segments}-segment chain, {len(edits)} random edits")
+    print(f"Full rebuild:                      {rebuild * 1e6:9.1f} us/edit")
+    print(f"Incremental, lengths and ends:     {incremental * 1e6:9.1f} us/edit ({rebuild / incremental:.0f}x faster)")
+    print(f"Incremental, with primitive lists: {incremental_primitives * 1e6:9.1f} us/edit ({rebuild / incremental_primitives:.0f}x faster)")
+    print(f"Deviation from a full rebuild: {deviation:.3e} mm")
@@ -0,0 +1,383 @@
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+from batch import StrafeBatch
+from library import check_parameters, expand_grid, load_grid, variant_suffix
+from primitives import DEFAULT_CHORD_TOLERANCE
+from strafe import strafe_footprint_name
+from writer import DEFAULT_THREADS, FootprintWriter, ProgressReporter
+
+# Polyline export of strafe geometry for tools that cannot read KiCad arcs.
+#
+# Each trace becomes one open polyline: its first bend, then its second bend
+# walked backwards from the tangent line to the trace end, so the tangent line is
+# the chord between the two. Arcs are split into the fewest equal chords that stay
+# within the chord tolerance, the same count as primitives.arc_segment_count. The
+# vertices lie on the arc and the chords cut inside it by at most the tolerance.
+# Counts, angles and points of every arc in a batch are computed in one pass.
+#
+# Coordinates are footprint coordinates as in the .kicad_mod files, relative to the
+# centre of the pair's start, in mm:
+#   dxf: one file per footprint, R12 POLYLINE entities on layer F.Cu with the trace
+#        width as constant width, y up so the drawing looks as it does in KiCad
+#   svg: one file per footprint, y down
+#   npz: one NumPy archive for the whole library, see PolylineArchive
+# Footprints are tessellated and written a chunk at a time, so memory does not grow
+# with the size of the library. DXF and SVG files go through writer.FootprintWriter,
+# into a directory or a .zip/.tar archive.
+
+EXPORT_FORMATS = ("dxf", "svg", "npz")
+CHUNK_SIZE = 4096  # strafes tessellated at a time
+SVG_MARGIN = 0.2  # mm around the traces
+SVG_COLORS = ("#c83434", "#3464c8")  # minus, plus
+DXF_LAYER = "F.Cu"
+
+
+def arc_segment_counts(radius, sweep, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+    # primitives.arc_segment_count for arrays of arcs
+    radius = np.asarray(radius, dtype=float)
+    sweep = np.fabs(np.asarray(sweep, dtype=float))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        step = 2 * np.arccos(1 - chord_tolerance / radius)
+    step = np.where(radius <= chord_tolerance, math.pi / 2, step)
+    return np.maximum(1, np.ceil(sweep / step)).astype(np.int64)
+
+
+def tessellate_arcs(cx, cy, radius, start, sweep, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE, skip_first=None):
+    """
+    Chord points of many arcs at once
+
+    Args:
+        cx, cy, radius, start, sweep: One arc per element (mm, rad), sweep signed
+        chord_tolerance (float): Largest distance between an arc and its chords (mm)
+        skip_first (np.ndarray, optional): Arcs whose first point is left out, where it repeats the previous one
+
+    Returns:
+        tuple: x and y of all points, arc after arc, and offsets: arc k has points offsets[k]:offsets[k + 1]
+    """
+
+    counts = arc_segment_counts(radius, sweep, chord_tolerance)
+    skip = np.zeros(len(counts), dtype=np.int64) if skip_first is None else skip_first.astype(np.int64)
+    points = counts + 1 - skip
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(points, out=offsets[1:])
+
+    # Per-arc values first, so every point costs one gather of each
+    step = sweep / counts
+    first = start + skip * step
+    arc = np.repeat(np.arange(len(counts)), points)
+    angle = np.arange(offsets[-1], dtype=float)
+    angle -= offsets[arc]
+    angle *= step[arc]
+    angle += first[arc]
+    radius = radius[arc]
+    x = np.cos(angle)
+    x *= radius
+    x += cx[arc]
+    y = np.sin(angle, out=angle)
+    y *= radius
+    y += cy[arc]
+    return x, y, offsets
+
+
+class Polylines:
+    """Tessellated traces of a batch of strafes.
+
+    points (P, 2) are footprint coordinates (mm, y down as in KiCad). Polyline k is
+    points[offsets[k]:offsets[k + 1]] drawn widths[k] wide. Strafe i has polylines
+    2i (minus trace) and 2i + 1 (plus trace).
+    """
+
+    def __init__(self, points, offsets, widths):
+        self.points = points
+        self.offsets = offsets
+        self.widths = widths
+
+    def __len__(self):
+        return len(self.widths) // 2
+
+    def footprint(self, i: int):
+        # [(width, points), ...] of strafe i, minus trace first
+        return [(float(self.widths[k]), self.points[self.offsets[k]:self.offsets[k + 1]]) for k in (2 * i, 2 * i + 1)]
+
+
+def tessellate_batch(batch: StrafeBatch, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+    """
+    Tessellate both traces of every strafe in a batch
+
+    Args:
+        batch (StrafeBatch): Strafes to tessellate
+        chord_tolerance (float, optional): Largest distance between an arc and its chords (mm)
+
+    Returns:
+        Polylines: One polyline per trace, in footprint coordinates
+    """
+
+    # Per strafe: minus first bend, minus second bend reversed, then the same for plus
+    columns = {name: list() for name in ("cx", "cy", "radius", "start", "sweep", "skip")}
+    for trace in (batch.minus, batch.plus):
+        sweep = trace.arc_sweep_angle()
+        columns["cx"] += [trace.arc_center_x[:, 0], trace.arc_center_x[:, 1]]
+        columns["cy"] += [trace.arc_center_y[:, 0], trace.arc_center_y[:, 1]]
+        columns["radius"] += [trace.arc_radius[:, 0], trace.arc_radius[:, 1]]
+        columns["start"] += [trace.arc_start_angle[:, 0], trace.arc_end_angle[:, 1]]
+        columns["sweep"] += [sweep[:, 0], -sweep[:, 1]]
+        # Without a tangent line the second bend starts where the first one ends
+        columns["skip"] += [np.zeros(len(batch), dtype=bool), trace.line_length <= 0]
+    arcs = {name: np.stack(values, axis=1).ravel() for name, values in columns.items()}
+
+    x, y, offsets = tessellate_arcs(arcs["cx"], arcs["cy"], arcs["radius"], arcs["start"], arcs["sweep"],
+                                    chord_tolerance, arcs["skip"])
+    points = np.stack((x, -y), axis=1)
+    return Polylines(points, offsets[::2], np.repeat(batch.trace_width, 2))
+
+
+def dxf_document(polylines):
+    """R12 DXF text for [(width, points), ...] in footprint coordinates"""
+    parts = ["0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n9\n$INSUNITS\n70\n4\n0\nENDSEC\n0\nSECTION\n2\nENTITIES\n"]
+    for width, points in polylines:
+        parts.append(f"0\nPOLYLINE\n8\n{DXF_LAYER}\n66\n1\n10\n0.0\n20\n0.0\n30\n0.0\n40\n{width:.6f}\n41\n{width:.6f}\n70\n0\n")
+        flipped = np.stack((points[:, 0], -points[:, 1]), axis=1)
+        parts.append((f"0\nVERTEX\n8\n{DXF_LAYER}\n10\n%.6f\n20\n%.6f\n30\n0.0\n" * len(points)) % tuple(flipped.ravel()))
+        parts.append(f"0\nSEQEND\n8\n{DXF_LAYER}\n")
+    parts.append("0\nENDSEC\n0\nEOF\n")
+    return "".join(parts)
+
+
+def svg_document(polylines, title: str = ""):
+    """SVG text for [(width, points), ...] in footprint coordinates, the view fitted to the traces"""
+    margin = SVG_MARGIN + max(width for width, _ in polylines) / 2
+    x_min = min(points[:, 0].min() for _, points in polylines) - margin
+    y_min = min(points[:, 1].min() for _, points in polylines) - margin
+    width = max(points[:, 0].max() for _, points in polylines) + margin - x_min
+    height = max(points[:, 1].max() for _, points in polylines) + margin - y_min
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.6f}mm" height="{height:.6f}mm" '
+             f'viewBox="{x_min:.6f} {y_min:.6f} {width:.6f} {height:.6f}">\n']
+    if title:
+        parts.append(f"<title>{title}</title>\n")
+    for k, (trace_width, points) in enumerate(polylines):
+        parts.append(f'<polyline fill="none" stroke="{SVG_COLORS[k % len(SVG_COLORS)]}" stroke-width="{trace_width:.6f}" '
+                     f'stroke-linecap="round" stroke-linejoin="round" points="')
+        parts.append(("%.6f,%.6f " * len(points)) % tuple(points.ravel()))
+        parts.append('"/>\n')
+    parts.append("</svg>\n")
+    return "".join(parts)
+
+
+class PolylineArchive:
+    """Streams the polylines of many footprints into one .npz file.
+
+    The archive holds plain arrays, so np.load reads it back:
+    - points (P, 2): footprint coordinates (mm, y down), float32 by default; 1 nm
+      resolution up to 8 mm from the origin, within 2 nm up to 16 mm
+    - polyline_offsets (L + 1): polyline k is points[polyline_offsets[k]:polyline_offsets[k + 1]]
+    - widths (L): trace width of every polyline
+    - footprint_offsets (F + 1): footprint i has polylines footprint_offsets[i]:footprint_offsets[i + 1]
+    - names (F): footprint names
+    Points are spooled to a temporary file while footprints are added, and copied into
+    the archive on close. The archive is written under a temporary name and renamed
+    when complete.
+    """
+
+    def __init__(self, path: str, dtype=np.float32):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.spool = tempfile.TemporaryFile()
+        self.point_count = 0
+        self.polyline_offsets = [np.zeros(1, dtype=np.int64)]
+        self.widths = list()
+        self.footprint_offsets = [np.zeros(1, dtype=np.int64)]
+        self.polyline_count = 0
+        self.names = list()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.bytes_written = 0
+
+    def add_polylines(self, names, polylines: Polylines, rows=None):
+        """Add footprints rows of polylines (all by default), named names"""
+        rows = np.arange(len(polylines)) if rows is None else np.asarray(rows)
+        with self.lock:
+            for name, i in zip(names, rows):
+                start, stop = polylines.offsets[2 * i], polylines.offsets[2 * i + 2]
+                self.spool.write(polylines.points[start:stop].astype(self.dtype).tobytes())
+                self.polyline_offsets.append(polylines.offsets[2 * i + 1:2 * i + 3] - start + self.point_count)
+                self.widths.append(polylines.widths[2 * i:2 * i + 2])
+                self.point_count += int(stop - start)
+                self.polyline_count += 2
+                self.footprint_offsets.append(np.array([self.polyline_count]))
+                self.names.append(name)
+
+    def close(self, abort: bool = False):
+        if self.closed:
+            return
+        self.closed = True
+        if abort:
+            self.spool.close()
+            return
+
+        arrays = {
+            "polyline_offsets": np.concatenate(self.polyline_offsets),
+            "widths": np.concatenate(self.widths) if self.widths else np.zeros(0),
+            "footprint_offsets": np.concatenate(self.footprint_offsets),
+            "names": np.array(self.names, dtype=str),
+        }
+        temp_path = f"{self.path}.tmp"
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                with archive.open("points.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, {"descr": np.lib.format.dtype_to_descr(self.dtype),
+                                                                  "fortran_order": False, "shape": (self.point_count, 2)})
+                    self.spool.seek(0)
+                    shutil.copyfileobj(self.spool, member)
+                for name, values in arrays.items():
+                    with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array(member, values, allow_pickle=False)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        finally:
+            self.spool.close()
+        self.bytes_written = os.path.getsize(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self.close(abort=exc_type is not None)
+        return False
+
+
+def read_polylines(path: str):
+    """Yield (footprint name, [(width, points), ...]) from a PolylineArchive file"""
+    with np.load(path) as archive:
+        points, polyline_offsets, widths = archive["points"], archive["polyline_offsets"], archive["widths"]
+        footprint_offsets, names = archive["footprint_offsets"], archive["names"]
+    for i, name in enumerate(names):
+        yield str(name), [(float(widths[k]), points[polyline_offsets[k]:polyline_offsets[k + 1]])
+                          for k in range(footprint_offsets[i], footprint_offsets[i + 1])]
+
+
+def export_library(grid, target: str, export_format: str = "dxf", chord_tolerance: float = DEFAULT_CHORD_TOLERANCE,
+                   chunk_size: int = CHUNK_SIZE, writer_threads: int = DEFAULT_THREADS, progress: bool = False):
+    """
+    Tessellate every Strafe of a parameter grid and export it as polylines
+
+    Args:
+        grid (list): Grid entries, as returned by library.load_grid
+        target (str): Output directory or .zip/.tar archive for dxf and svg, .npz file for npz
+        export_format (str, optional): One of EXPORT_FORMATS
+        chord_tolerance (float, optional): Largest distance between an arc and its chords (mm)
+        chunk_size (int, optional): Strafes tessellated at a time
+        writer_threads (int, optional): Threads writing dxf and svg files, see writer.FootprintWriter
+        progress (bool, optional): Print a progress line every second while writing
+
+    Returns:
+        dict: Exported and skipped counts, skipped reasons, points written, bytes written, elapsed time and throughput
+    """
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format '{export_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    start_time = time.perf_counter()
+    combinations = expand_grid(grid)
+    skipped = list()
+    valid = list()
+    for combination in combinations:
+        try:
+            check_parameters(*combination)
+            valid.append(combination)
+        except ValueError as e:
+            skipped.append((combination, str(e)))
+
+    # Same names as the library build, variants get a suffix
+    variants = {(c[3], c[4]) for c in combinations}
+    progress_reporter = ProgressReporter(len(valid)) if progress else None
+    if export_format == "npz":
+        output = PolylineArchive(target)
+    else:
+        output = FootprintWriter(target, threads=writer_threads, progress=progress_reporter)
+
+    exported = 0
+    points = 0
+    with output:
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            polylines = tessellate_batch(StrafeBatch(*np.array(chunk).T), chord_tolerance)
+            finite = np.isfinite(polylines.points).all(axis=1)
+            rows = list()
+            for i, parameters in enumerate(chunk):
+                if not finite[polylines.offsets[2 * i]:polylines.offsets[2 * i + 2]].all():
+                    skipped.append((parameters, "geometry is not finite"))
+                else:
+                    rows.append(i)
+            names = [strafe_footprint_name(*chunk[i][:3], variant_suffix(*chunk[i][3:]) if len(variants) > 1 else "")
+                     for i in rows]
+            points += sum(int(polylines.offsets[2 * i + 2] - polylines.offsets[2 * i]) for i in rows)
+            exported += len(rows)
+
+            if export_format == "npz":
+                output.add_polylines(names, polylines, rows)
+                if progress_reporter is not None:
+                    progress_reporter.update(len(rows))
+                continue
+            for name, i in zip(names, rows):
+                footprint = polylines.footprint(i)
+                if export_format == "dxf":
+                    output.submit(f"{name}.dxf", dxf_document(footprint))
+                else:
+                    output.submit(f"{name}.svg", svg_document(footprint, name))
+
+    if export_format == "npz":
+        if progress_reporter is not None:
+            progress_reporter.finish()
+    else:
+        exported -= len(output.errors)
+        skipped += [(file_name, f"write failed: {error}") for file_name, error in output.errors]
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "exported": exported,
+        "skipped": skipped,
+        "points": points,
+        "bytes_written": output.bytes_written,
+        "elapsed": elapsed,
+        "throughput": exported / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the Strafe footprints of a parameter grid as DXF, SVG or NumPy polylines")
+    parser.add_argument("grid", help="Parameter grid file (.toml or .csv), as for library.py")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output directory or .zip/.tar archive for dxf and svg, .npz file for npz "
+                             "(default: strafe_<format> or strafe_polylines.npz)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="dxf", help="Output format")
+    parser.add_argument("--chord-tolerance", type=float, default=DEFAULT_CHORD_TOLERANCE,
+                        help="Largest distance between an arc and its chords (mm)")
+    parser.add_argument("--writer-threads", type=int, default=DEFAULT_THREADS, help="Threads writing dxf and svg files")
+    parser.add_argument("--quiet", action="store_true", help="No progress lines while writing")
+    args = parser.parse_args()
+
+    target = args.output or ("strafe_polylines.npz" if args.format == "npz" else f"strafe_{args.format}")
+    summary = export_library(load_grid(args.grid), target, args.format, args.chord_tolerance,
+                             writer_threads=args.writer_threads, progress=not args.quiet)
+
+    for parameters, error in summary["skipped"]:
+        print(f"Skipped {parameters}: {error}")
+    print(f"Exported {summary['exported']} footprints to {target}, {summary['points']} points, "
+          f"{summary['bytes_written'] / 1e6:.1f} MB in {summary['elapsed']:.2f} s ({summary['throughput']:.0f} footprints/s)")
@@ -0,0 +1,320 @@
+import csv
+import math
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+import numpy as np
+
+from batch import StrafeBatch
+
+# Closed-form impedance estimates for a strafe's differential pair.
+#
+# The straight pair uses the usual closed forms for a single trace, then a
+# coupling factor for the pair:
+#   microstrip: Hammerstad-Jensen Z0 with thickness correction,
+#               Zdiff = 2 Z0 (1 - 0.48 exp(-0.96 s / h))
+#   stripline:  Wheeler Z0 with thickness correction, planes b = 2h + t apart,
+#               Zdiff = 2 Z0 (1 - 0.347 exp(-2.9 s / b))
+# with s the gap. The odd-mode impedance is Zdiff / 2. The even mode follows from
+# Z0^2 = Zodd Zeven.
+#
+# Through a bend the traces are concentric arcs with inner radius r_i and outer
+# radius r_o. Each trace keeps its capacitance to the planes per unit of its own
+# length. The mutual capacitance between them spans the gap, at the pair's mean
+# radius R = (r_i + r_o) / 2, so per unit length of a trace it scales by R / r.
+# With C_even = 1 / (v Zeven) and C_odd = 1 / (v Zodd), the odd-mode impedance of
+# the trace at radius r is
+#   Zodd(r) = 1 / (1 / Zeven + (1 / Zodd - 1 / Zeven) R / r)
+# The inner trace drops below Zodd and the outer one rises above it, by about
+# c / 2R each. The local differential impedance Zodd(r_i) + Zodd(r_o) moves by
+# about (c / 2R)^2. Both are reported, and the worst is the footprint's deviation.
+#
+# Everything is elementwise, so whole parameter sweeps are evaluated at once.
+
+STACKUP_KINDS = ("microstrip", "stripline")
+DEFAULT_COPPER_THICKNESS = 0.035  # mm, 1 oz
+FREE_SPACE_IMPEDANCE = 376.730313668  # ohm
+RADIUS_SEARCH_RANGE = (1e-4, 1e4)  # mm, inner radius bracket for min_bend_radius
+RADIUS_SEARCH_STEPS = 64
+
+REPORT_COLUMNS = ("trace_width", "trace_gap", "offset", "radius_scale", "middle_tangent_angle",
+                  "differential", "odd", "inner_odd", "outer_odd", "bend_differential", "deviation")
+
+
+class Stackup:
+    """Dielectric and copper around the pair.
+
+    height is the dielectric height from the trace to the reference plane (mm). For
+    stripline the trace is centred between two planes, height away on each side.
+    """
+
+    def __init__(self, height: float, dielectric_constant: float, copper_thickness: float = DEFAULT_COPPER_THICKNESS,
+                 kind: str = "microstrip"):
+        if kind not in STACKUP_KINDS:
+            raise ValueError(f"unknown stackup kind '{kind}', expected one of {', '.join(STACKUP_KINDS)}")
+        if height <= 0:
+            raise ValueError(f"dielectric height must be positive, got {height}")
+        if dielectric_constant < 1:
+            raise ValueError(f"dielectric constant must be at least 1, got {dielectric_constant}")
+        if copper_thickness < 0:
+            raise ValueError(f"copper thickness must not be negative, got {copper_thickness}")
+        self.height = height
+        self.dielectric_constant = dielectric_constant
+        self.copper_thickness = copper_thickness
+        self.kind = kind
+
+    def __repr__(self):
+        return (f"Stackup({self.kind}, height={self.height}, er={self.dielectric_constant}, "
+                f"copper_thickness={self.copper_thickness})")
+
+
+def load_stackup(path: str):
+    """
+    Read a stackup from the [stackup] table of a TOML file
+
+    Keys are kind ("microstrip" or "stripline"), height (mm), er and copper_thickness (mm, default 0.035):
+        [stackup]
+        kind = "microstrip"
+        height = 0.1
+        er = 4.3
+    """
+
+    with open(path, "rb") as f:
+        table = tomllib.load(f).get("stackup")
+    if table is None:
+        raise ValueError(f"{path} has no [stackup] table")
+    er = table.get("er", table.get("dielectric_constant"))
+    missing = [name for name, value in (("height", table.get("height")), ("er", er)) if value is None]
+    if missing:
+        raise ValueError(f"{path}: stackup is missing {', '.join(repr(name) for name in missing)}")
+    return Stackup(float(table["height"]), float(er),
+                   float(table.get("copper_thickness", DEFAULT_COPPER_THICKNESS)), table.get("kind", "microstrip"))
+
+
+def _microstrip_air_impedance(u):
+    # Hammerstad-Jensen impedance of a zero-thickness microstrip in air, u = w / h
+    f = 6 + (2 * math.pi - 6) * np.exp(-(30.666 / u) ** 0.7528)
+    return FREE_SPACE_IMPEDANCE / (2 * math.pi) * np.log(f / u + np.sqrt(1 + 4 / (u * u)))
+
+
+def _microstrip_effective_permittivity(u, er):
+    a = 1 + np.log((u ** 4 + (u / 52) ** 2) / (u ** 4 + 0.432)) / 49 + np.log(1 + (u / 18.1) ** 3) / 18.7
+    b = 0.564 * ((er - 0.9) / (er + 3)) ** 0.053
+    return (er + 1) / 2 + (er - 1) / 2 * (1 + 10 / u) ** (-a * b)
+
+
+def single_ended_impedance(stackup: Stackup, trace_width):
+    """
+    Characteristic impedance of one trace
+
+    Args:
+        stackup (Stackup): Dielectric and copper
+        trace_width: Trace widths (mm), any array shape
+
+    Returns:
+        tuple: (impedance in ohm, effective permittivity) arrays
+    """
+
+    w = np.asarray(trace_width, dtype=float)
+    er = stackup.dielectric_constant
+    if stackup.kind == "microstrip":
+        u = w / stackup.height
+        t = stackup.copper_thickness / stackup.height
+        # Thick copper is wider to the field, less so inside the dielectric
+        if t > 0:
+            du1 = t / math.pi * np.log(1 + 4 * math.e / (t / np.tanh(np.sqrt(6.517 * u)) ** 2))
+        else:
+            du1 = np.zeros_like(u)
+        dur = 0.5 * (1 + 1 / math.cosh(math.sqrt(er - 1))) * du1
+        u1, ur = u + du1, u + dur
+        permittivity = _microstrip_effective_permittivity(ur, er)
+        impedance = _microstrip_air_impedance(ur) / np.sqrt(permittivity)
+        permittivity = permittivity * (_microstrip_air_impedance(u1) / _microstrip_air_impedance(ur)) ** 2
+        return impedance, permittivity
+
+    t = stackup.copper_thickness
+    b = 2 * stackup.height + t
+    x = t / b
+    width = w / (b - t)
+    if x > 0:
+        m = 2 / (1 + 2 / 3 * x / (1 - x))
+        width = width + x / (math.pi * (1 - x)) * (
+            1 - 0.5 * np.log((x / (2 - x)) ** 2 + (0.0796 * x / (w / b + 1.1 * x)) ** m))
+    k = 4 / (math.pi * width)
+    impedance = 30 / math.sqrt(er) * np.log(1 + k * (2 * k + np.sqrt((2 * k) ** 2 + 6.27)))
+    return impedance, np.full_like(impedance, er)
+
+
+def coupled_impedance(stackup: Stackup, trace_width, trace_gap):
+    """
+    Differential, odd-mode and even-mode impedance of a straight pair
+
+    Args:
+        stackup (Stackup): Dielectric and copper
+        trace_width, trace_gap: Pair geometry (mm), broadcast together
+
+    Returns:
+        tuple: (differential, odd, even) impedance arrays (ohm)
+    """
+
+    trace_width, trace_gap = np.broadcast_arrays(np.asarray(trace_width, dtype=float), np.asarray(trace_gap, dtype=float))
+    z0, _ = single_ended_impedance(stackup, trace_width)
+    if stackup.kind == "microstrip":
+        coupling = 0.48 * np.exp(-0.96 * trace_gap / stackup.height)
+    else:
+        coupling = 0.347 * np.exp(-2.9 * trace_gap / (2 * stackup.height + stackup.copper_thickness))
+    odd = z0 * (1 - coupling)
+    return 2 * odd, odd, z0 * z0 / odd
+
+
+def bend_impedance(stackup: Stackup, trace_width, trace_gap, inner_radius):
+    """
+    Impedance of a pair bent into concentric arcs
+
+    Args:
+        stackup (Stackup): Dielectric and copper
+        trace_width, trace_gap: Pair geometry (mm)
+        inner_radius: Centre-line radius of the inner trace (mm); the outer trace is width + gap further out.
+                      All three broadcast together
+
+    Returns:
+        tuple: (differential, inner trace odd-mode, outer trace odd-mode) impedance arrays (ohm)
+    """
+
+    trace_width, trace_gap, inner_radius = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (trace_width, trace_gap, inner_radius)))
+    _, odd, even = coupled_impedance(stackup, trace_width, trace_gap)
+    center_distance = trace_width + trace_gap
+    mean_radius = inner_radius + center_distance / 2
+    mutual = 1 / odd - 1 / even
+    inner = 1 / (1 / even + mutual * mean_radius / inner_radius)
+    outer = 1 / (1 / even + mutual * mean_radius / (inner_radius + center_distance))
+    return inner + outer, inner, outer
+
+
+def bend_deviation(stackup: Stackup, trace_width, trace_gap, inner_radius):
+    # Worst of the differential and per-trace odd-mode deviations from the straight pair (ohm)
+    differential, odd, _ = coupled_impedance(stackup, trace_width, trace_gap)
+    bend_differential, inner, outer = bend_impedance(stackup, trace_width, trace_gap, inner_radius)
+    return np.maximum(np.fabs(bend_differential - differential), np.maximum(np.fabs(inner - odd), np.fabs(outer - odd)))
+
+
+def min_bend_radius(stackup: Stackup, trace_width, trace_gap, max_deviation):
+    """
+    Smallest inner bend radius keeping the bend within max_deviation of the straight pair
+
+    The deviation falls monotonically with the radius, so this is a bisection on log radius,
+    elementwise over the broadcast inputs.
+
+    Returns:
+        np.ndarray: Inner radius (mm), RADIUS_SEARCH_RANGE[1] where even that deviates too much
+    """
+
+    trace_width, trace_gap, max_deviation = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in (trace_width, trace_gap, max_deviation)))
+    low = np.full(trace_width.shape, math.log(RADIUS_SEARCH_RANGE[0]))
+    high = np.full(trace_width.shape, math.log(RADIUS_SEARCH_RANGE[1]))
+    for _ in range(RADIUS_SEARCH_STEPS):
+        middle = (low + high) / 2
+        within = bend_deviation(stackup, trace_width, trace_gap, np.exp(middle)) <= max_deviation
+        high = np.where(within, middle, high)
+        low = np.where(within, low, middle)
+    return np.exp(high)
+
+
+class ImpedanceReport:
+    """Per-strafe impedance estimates for a StrafeBatch, one row per strafe.
+
+    differential and odd are the straight pair. Both bends of a strafe have the same
+    radii, so inner_odd, outer_odd and bend_differential hold for either bend.
+    deviation is the worst of |bend_differential - differential|, |inner_odd - odd|
+    and |outer_odd - odd|.
+    """
+
+    def __init__(self, batch: StrafeBatch, stackup: Stackup):
+        self.batch = batch
+        self.stackup = stackup
+        self.differential, self.odd, self.even = coupled_impedance(stackup, batch.trace_width, batch.trace_gap)
+        self.bend_differential, self.inner_odd, self.outer_odd = bend_impedance(
+            stackup, batch.trace_width, batch.trace_gap, batch.small_radius)
+        self.deviation = np.maximum(np.fabs(self.bend_differential - self.differential),
+                                    np.maximum(np.fabs(self.inner_odd - self.odd), np.fabs(self.outer_odd - self.odd)))
+
+    def worst(self):
+        return int(np.argmax(self.deviation)) if len(self.deviation) else None
+
+    def write_csv(self, path: str):
+        batch = self.batch
+        columns = (batch.trace_width, batch.trace_gap, batch.offset_x, batch.radius_scale, batch.middle_tangent_angle,
+                   self.differential, self.odd, self.inner_odd, self.outer_odd, self.bend_differential, self.deviation)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            for i in range(len(batch)):
+                writer.writerow([repr(float(column[i])) for column in columns])
+
+
+def strafe_impedance(batch: StrafeBatch, stackup: Stackup):
+    """
+    Estimate the impedance of every strafe in a batch
+
+    Args:
+        batch (StrafeBatch): Strafes to estimate
+        stackup (Stackup): Dielectric and copper
+
+    Returns:
+        ImpedanceReport: Straight and bend impedance and worst-case deviation per strafe
+    """
+
+    return ImpedanceReport(batch, stackup)
+
+
+if __name__ == "__main__":
+
+    import argparse
+    import time
+    from batch import random_parameters
+
+    parser = argparse.ArgumentParser(description="Closed-form differential impedance of a strafe's pair, straight and in its bends")
+    parser.add_argument("--stackup", default=None, help="TOML file with a [stackup] table, instead of the options below")
+    parser.add_argument("--kind", choices=STACKUP_KINDS, default="microstrip")
+    parser.add_argument("--height", type=float, default=0.1, help="Dielectric height, trace to plane (mm)")
+    parser.add_argument("--er", type=float, default=4.3, help="Dielectric constant")
+    parser.add_argument("--thickness", type=float, default=DEFAULT_COPPER_THICKNESS, help="Copper thickness (mm)")
+    parser.add_argument("--width", type=float, default=0.15, help="Trace width (mm)")
+    parser.add_argument("--gap", type=float, default=0.2, help="Trace gap (mm)")
+    parser.add_argument("--radius", type=float, nargs="*", default=[0.1, 0.2, 0.5, 1.0, 2.0],
+                        help="Inner bend radii to report (mm)")
+    parser.add_argument("--max-deviation", type=float, default=None, help="Also report the smallest inner radius within this (ohm)")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N random strafes")
+    args = parser.parse_args()
+
+    stackup = load_stackup(args.stackup) if args.stackup else Stackup(args.height, args.er, args.thickness, args.kind)
+
+    if args.benchmark:
+        batch = StrafeBatch(*random_parameters(args.benchmark))
+        start_time = time.perf_counter()
+        report = strafe_impedance(batch, stackup)
+        elapsed = time.perf_counter() - start_time
+        worst = report.worst()
+        print(f"Estimated {len(batch)} strafes in {elapsed:.3f} s ({len(batch) / elapsed:,.0f} strafes/s)")
+        print(f"Worst deviation {report.deviation[worst]:.3f} ohm at width {batch.trace_width[worst]:.3f}, "
+              f"gap {batch.trace_gap[worst]:.3f}, inner radius {batch.small_radius[worst]:.4f} mm")
+        exit(0)
+
+    differential, odd, even = coupled_impedance(stackup, args.width, args.gap)
+    z0, permittivity = single_ended_impedance(stackup, args.width)
+    print(f"{stackup}")
+    print(f"Single-ended {float(z0):.2f} ohm (effective er {float(permittivity):.3f}), differential {float(differential):.2f} ohm, "
+          f"odd {float(odd):.2f} ohm, even {float(even):.2f} ohm")
+    radii = np.array(args.radius)
+    bend, inner, outer = bend_impedance(stackup, args.width, args.gap, radii)
+    for radius, d, i, o in zip(radii, bend, inner, outer):
+        print(f"  inner radius {radius:6.3f} mm: differential {d:.2f} ohm ({d - differential:+.3f}), "
+              f"odd inner {i:.2f} ({i - odd:+.3f}), outer {o:.2f} ({o - odd:+.3f})")
+    if args.max_deviation is not None:
+        radius = float(min_bend_radius(stackup, args.width, args.gap, args.max_deviation)[0])
+        print(f"Smallest inner radius within {args.max_deviation} ohm: {radius:.4f} mm")
@@ -0,0 +1,419 @@
+import csv
+import functools
+import itertools
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+import numpy as np
+
+import profiling
+from batch import StrafeBatch
+from cache import BuildCache, cache_key
+from impedance import load_stackup, strafe_impedance
+from primitives import Point
+from render import RENDER_BACKENDS
+from strafe import Strafe
+from transform import rotate_footprints, rotated_variants
+from verify import VERIFY_MODES, verify_batch
+from writer import DEFAULT_THREADS, FootprintWriter, ProgressReporter, archive_mode
+
+# Parameter grid for a footprint library build.
+# Every grid entry maps parameter names to a value, an explicit list or a range,
+# and expands to the cartesian product of its values.
+#
+# TOML, one [grid] table or several [[grid]] tables:
+#   [grid]
+#   trace_width = [0.15, 0.2]
+#   trace_gap = 0.2
+#   offset = { start = -4.0, stop = 4.0, step = 0.5 }
+#   radius_scale = 0.2
+#   middle_tangent_angle = 1.5708
+#
+# CSV, one grid entry per row. Cells hold a value, a list "a;b;c" or a range "start:stop:step":
+#   trace_width,trace_gap,offset,radius_scale,middle_tangent_angle
+#   0.15;0.2,0.2,-4:4:0.5,0.2,1.5708
+
+GRID_PARAMETERS = ("trace_width", "trace_gap", "offset", "radius_scale", "middle_tangent_angle")
+GRID_ALIASES = {"offset_x": "offset", "radius_ratio": "radius_scale"}
+MAX_PENDING_PER_WORKER = 2  # chunks in flight per worker process, beyond that rendering waits for the writers
+
+
+def expand_range(start: float, stop: float, step: float):
+    # Inclusive range, rounded so that 0.1 steps do not drift into 0.30000000000000004
+    if step <= 0:
+        raise ValueError(f"range step must be positive, got {step}")
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + i * step, 9) for i in range(count)]
+
+
+def parse_grid_value(value):
+    if isinstance(value, dict):
+        return expand_range(float(value["start"]), float(value["stop"]), float(value["step"]))
+    if isinstance(value, (list, tuple)):
+        return [float(v) for v in value]
+    if isinstance(value, str):
+        value = value.strip()
+        if ":" in value:
+            return expand_range(*(float(v) for v in value.split(":")))
+        return [float(v) for v in value.split(";") if v.strip()]
+    return [float(value)]
+
+
+def parse_grid_entry(entry: dict):
+    values = dict()
+    for key, value in entry.items():
+        name = GRID_ALIASES.get(key.strip(), key.strip())
+        if name not in GRID_PARAMETERS:
+            raise ValueError(f"unknown grid parameter '{key}'")
+        values[name] = parse_grid_value(value)
+
+    missing = [name for name in GRID_PARAMETERS if name not in values]
+    if missing:
+        raise ValueError(f"grid entry is missing {', '.join(missing)}")
+    return values
+
+
+def load_grid(path: str):
+    # Returns a list of grid entries, each a dict of parameter name -> list of values
+    if path.endswith(".toml"):
+        with open(path, "rb") as f:
+            grid = tomllib.load(f).get("grid", [])
+        if isinstance(grid, dict):
+            grid = [grid]
+        return [parse_grid_entry(entry) for entry in grid]
+
+    with open(path, newline="", encoding="utf-8") as f:
+        return [parse_grid_entry(row) for row in csv.DictReader(f) if any(row.values())]
+
+
+def expand_grid(grid):
+    # Deduplicated parameter tuples in GRID_PARAMETERS order, in file order
+    combinations = dict()
+    for entry in grid:
+        for combination in itertools.product(*(entry[name] for name in GRID_PARAMETERS)):
+            combinations[combination] = None
+    return list(combinations)
+
+
+def variant_suffix(radius_scale: float, middle_tangent_angle: float):
+    return f"_rs{radius_scale}_a{middle_tangent_angle}"
+
+
+def check_parameters(trace_width: float, trace_gap: float, offset: float, radius_scale: float, middle_tangent_angle: float):
+    if trace_width <= 0:
+        raise ValueError("trace width must be positive")
+    if trace_gap <= 0:
+        raise ValueError("trace gap must be positive")
+    if offset == 0:
+        raise ValueError("offset must be non-zero")
+    if radius_scale <= 0:
+        raise ValueError("radius ratio must be positive")
+    if not 0 < middle_tangent_angle < math.pi:
+        raise ValueError("middle tangent angle must be between 0 and pi")
+
+
+def make_strafe(parameters, name_suffix: str):
+    check_parameters(*parameters)
+    strafe = Strafe(Point(0, 0), *parameters, name_suffix=name_suffix)
+    if not (math.isfinite(strafe.minus_trace_length) and math.isfinite(strafe.plus_trace_length)):
+        raise ValueError("trace length is not finite")
+    return strafe
+
+
+def parse_rotations(value: str):
+    # "0,90,180" -> (0.0, 90.0, 180.0), each angle once and in [0, 360)
+    rotations = list()
+    for item in value.split(","):
+        rotation = float(item) % 360.0
+        if rotation not in rotations:
+            rotations.append(rotation)
+    return tuple(rotations)
+
+
+def build_footprint(job):
+    # Worker: generate one footprint. Returns (footprint name or None, error message or None)
+    parameters, output_dir, name_suffix, backend, deterministic_uuids, quantize, indent, rotation = job
+    try:
+        strafe = make_strafe(parameters, name_suffix)
+        if rotation:
+            strafe = rotated_variants(strafe, (rotation,))[0]
+        footprint_name = strafe.generate_footprint_name()
+        strafe.generate_footprint_file(os.path.join(output_dir, f"{footprint_name}.kicad_mod"), verbose=False, backend=backend,
+                                       deterministic_uuids=deterministic_uuids, quantize=quantize, indent=indent)
+        return footprint_name, None
+    except (ValueError, ArithmeticError) as e:
+        return None, str(e)
+
+
+def render_chunk(jobs):
+    # Worker: render footprints for the writer threads. Returns (parameters, rotation, footprint name, content, error)
+    # per job. Consecutive jobs of the same footprint in other rotations share one geometry computation, and the
+    # rotated variants of all footprints in the chunk are transformed together
+    groups = list()
+    for (parameters, name_suffix), group in itertools.groupby(jobs, key=lambda job: (job[0], job[2])):
+        group = list(group)
+        try:
+            groups.append((group, make_strafe(parameters, name_suffix), None))
+        except (ValueError, ArithmeticError) as e:
+            groups.append((group, None, str(e)))
+
+    by_rotations = dict()
+    for group, strafe, _ in groups:
+        rotations = tuple(job[7] for job in group)
+        if strafe is not None and any(rotations):
+            by_rotations.setdefault(rotations, list()).append(strafe)
+    variants = dict()
+    for rotations, strafes in by_rotations.items():
+        for strafe, footprints in zip(strafes, rotate_footprints(strafes, rotations)):
+            variants[id(strafe)] = footprints
+
+    results = list()
+    for group, strafe, error in groups:
+        footprints = variants.get(id(strafe), [strafe] * len(group))
+        for job, footprint in zip(group, footprints):
+            parameters, _, _, backend, deterministic_uuids, quantize, indent, rotation = job
+            if error is not None:
+                results.append((parameters, rotation, None, None, error))
+                continue
+            try:
+                results.append((parameters, rotation, footprint.generate_footprint_name(),
+                                footprint.render_footprint(backend, deterministic_uuids, quantize, indent), None))
+            except (ValueError, ArithmeticError) as e:
+                results.append((parameters, rotation, None, None, str(e)))
+    return results
+
+
+def build_library(grid, output_dir: str, workers: int = None, chunksize: int = 64, backend: str = "template",
+                  deterministic_uuids: bool = False, use_cache: bool = True, verify: str = "warn",
+                  report_path: str = None, profile: bool = False, quantize: bool = False, indent: bool = True,
+                  archive: str = None, writer_threads: int = DEFAULT_THREADS, progress: bool = False,
+                  stackup=None, impedance_report_path: str = None, rotations=(0.0,)):
+    """
+    Generate every Strafe footprint of a parameter grid into one .pretty directory
+
+    Args:
+        grid (list): Grid entries, as returned by load_grid
+        output_dir (str): Library directory, created if needed. Not used with archive
+        workers (int, optional): Process pool size. If None, uses the number of CPUs
+        chunksize (int, optional): Footprints handed to a worker at a time
+        backend (str, optional): Render backend, see render.RENDER_BACKENDS
+        deterministic_uuids (bool, optional): Derive UUIDs from footprint names, so unchanged inputs give identical files
+        use_cache (bool, optional): Only render footprints whose inputs changed since the last build into output_dir
+        verify (str, optional): Gap and skew verification, see verify.VERIFY_MODES. "warn" reports violations,
+                                "fail" also skips the violating footprints
+        report_path (str, optional): Where to write the verification report (CSV)
+        profile (bool, optional): Record stage timings in the workers and merge them into this process,
+                                  see profiling.summary
+        quantize (bool, optional): Write numbers snapped to KiCad's 1 nm grid as shortest decimals
+        indent (bool, optional): Indent footprint files with tabs
+        archive (str, optional): Write all footprints into one .zip or .tar archive at this path instead of
+                                 output_dir, in a directory named after the archive (strafe.pretty.zip ->
+                                 strafe.pretty/). Archives are always built in full, without the build cache
+        writer_threads (int, optional): Threads writing footprint files, see writer.FootprintWriter
+        progress (bool, optional): Print a progress line every second while writing
+        stackup (impedance.Stackup, optional): Estimate the impedance of every footprint for this stackup
+        impedance_report_path (str, optional): Where to write the impedance report (CSV), with stackup
+        rotations (tuple, optional): Write every footprint in each of these rotations (degrees, counter-clockwise
+                                     about its start), named with a _rot<degrees> suffix except at 0. The rotated
+                                     variants are transformed from one geometry computation, see transform.py
+
+    Returns:
+        dict: Build summary with generated, skipped and cached counts, skipped reasons, violations, bytes written,
+              throughput and, with stackup, the impedance.ImpedanceReport
+    """
+
+    start_time = time.perf_counter()
+    combinations = expand_grid(grid)
+    if archive is not None:
+        if archive_mode(archive) is None:
+            raise ValueError(f"unknown archive type '{archive}', expected .zip, .tar, .tar.gz, .tgz or .tar.xz")
+        use_cache = False
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+
+    skipped = list()
+    valid = list()
+    for combination in combinations:
+        try:
+            check_parameters(*combination)
+            valid.append(combination)
+        except ValueError as e:
+            skipped.append((combination, str(e)))
+
+    violations = list()
+    if verify != "off" and valid:
+        report = verify_batch(StrafeBatch(*np.array(valid).T))
+        if report_path is not None:
+            report.write_csv(report_path)
+        violations = [valid[i] for i in report.violations()]
+        if verify == "fail":
+            rejected = set(violations)
+            skipped += [(c, "failed gap/skew verification") for c in violations]
+            valid = [c for c in valid if c not in rejected]
+
+    impedance = None
+    if stackup is not None and valid:
+        impedance = strafe_impedance(StrafeBatch(*np.array(valid).T), stackup)
+        if impedance_report_path is not None:
+            impedance.write_csv(impedance_report_path)
+
+    # Variants differing only in radius ratio or tangent angle would share a name
+    variants = {(c[3], c[4]) for c in combinations}
+    jobs = [(c, output_dir, variant_suffix(c[3], c[4]) if len(variants) > 1 else "", backend, deterministic_uuids,
+             quantize, indent, rotation)
+            for c in valid for rotation in rotations]
+
+    cache = BuildCache(output_dir) if use_cache else None
+    keys = dict()
+    if cache is not None:
+        pending = list()
+        for job in jobs:
+            parameters, _, name_suffix, backend, deterministic_uuids, quantize, indent, rotation = job
+            # Unrotated footprints keep the keys of builds without rotations
+            extra = {"rotation": rotation} if rotation else {}
+            key = cache_key(parameters=parameters, name_suffix=name_suffix, backend=backend,
+                            deterministic_uuids=deterministic_uuids, quantize=quantize, indent=indent, **extra)
+            if not cache.is_current(key):
+                keys[parameters, rotation] = key
+                pending.append(job)
+        jobs = pending
+
+    # Profiled workers return the spans of every job with its result
+    task, initializer = render_chunk, None
+    if profile:
+        task, initializer = functools.partial(profiling.run_traced, render_chunk), profiling.enable
+
+    # Workers render, writer threads write. At most MAX_PENDING_PER_WORKER chunks are in flight
+    # per worker, and the writer queue is bounded, so slow storage holds back rendering
+    workers = workers or os.cpu_count()
+    target = archive if archive is not None else output_dir
+    progress_reporter = ProgressReporter(len(jobs)) if progress else None
+    written = list()
+
+    def collect(future):
+        results = future.result()
+        if profile:
+            results, spans = results
+            profiling.merge(spans)
+        for parameters, rotation, footprint_name, content, error in results:
+            if error is None:
+                writer.submit(f"{footprint_name}.kicad_mod", content)
+                written.append((parameters, rotation, footprint_name))
+            else:
+                skipped.append((parameters, f"{error} (rotated {rotation:g})" if rotation else error))
+
+    with FootprintWriter(target, threads=writer_threads, progress=progress_reporter) as writer, \
+            ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        pending = set()
+        for start in range(0, len(jobs), chunksize):
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            pending.add(executor.submit(task, jobs[start:start + chunksize]))
+        for future in pending:
+            collect(future)
+
+    failed = {file_name for file_name, _ in writer.errors}
+    generated = 0
+    for parameters, rotation, footprint_name in written:
+        if f"{footprint_name}.kicad_mod" in failed:
+            continue
+        generated += 1
+        if cache is not None:
+            cache.record(keys[parameters, rotation], f"{footprint_name}.kicad_mod")
+    skipped += [(file_name, f"write failed: {error}") for file_name, error in writer.errors]
+
+    if cache is not None:
+        cache.save()
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "generated": generated,
+        "skipped": skipped,
+        "violations": violations,
+        "cache_hits": cache.hits if cache is not None else 0,
+        "cache_misses": cache.misses if cache is not None else 0,
+        "bytes_written": writer.bytes_written,
+        "impedance": impedance,
+        "elapsed": elapsed,
+        "throughput": generated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a .pretty library of Strafe footprints from a parameter grid")
+    parser.add_argument("grid", help="Parameter grid file (.toml or .csv)")
+    parser.add_argument("-o", "--output", default="strafe.pretty", help="Output .pretty directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, default="template", help="Footprint render backend")
+    parser.add_argument("--deterministic-uuids", action="store_true", help="Derive UUIDs from footprint names")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Snap coordinates, widths and die_length to KiCad's 1 nm grid, written as shortest decimals")
+    parser.add_argument("--no-indent", action="store_true", help="Write footprint files without indentation")
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate every footprint, ignoring the build cache")
+    parser.add_argument("--archive", default=None,
+                        help="Write the library into one .zip or .tar(.gz/.xz) archive instead of the output directory, "
+                             "e.g. strafe.pretty.zip")
+    parser.add_argument("--writer-threads", type=int, default=DEFAULT_THREADS, help="Threads writing footprint files")
+    parser.add_argument("--quiet", action="store_true", help="No progress lines while writing")
+    parser.add_argument("--verify", choices=VERIFY_MODES, default="warn",
+                        help="Check constant gap and zero skew: warn on violations, or fail and skip them")
+    parser.add_argument("--verify-report", default=None,
+                        help="Verification report (CSV), default: strafe_verification.csv in the output directory")
+    parser.add_argument("--stackup", default=None,
+                        help="TOML file with a [stackup] table: estimate differential impedance and its deviation in the bends")
+    parser.add_argument("--impedance-report", default=None,
+                        help="Impedance report (CSV), default: strafe_impedance.csv next to the verification report")
+    parser.add_argument("--rotations", type=parse_rotations, default=(0.0,), metavar="DEGREES",
+                        help="Comma-separated rotations to write every footprint in, e.g. 0,45,90,135,180,225,270,315")
+    parser.add_argument("--profile", default=None, metavar="PROFILE_JSON",
+                        help="Write per-stage timings of all workers as JSON, and a Chrome trace next to it")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
+
+    report_dir = args.output if args.archive is None else os.path.dirname(args.archive) or "."
+    report_path = args.verify_report or os.path.join(report_dir, "strafe_verification.csv")
+    impedance_report_path = args.impedance_report or os.path.join(report_dir, "strafe_impedance.csv")
+    summary = build_library(load_grid(args.grid), args.output, workers=args.jobs, backend=args.backend,
+                            deterministic_uuids=args.deterministic_uuids, use_cache=not args.no_cache,
+                            verify=args.verify, report_path=report_path, profile=bool(args.profile),
+                            quantize=args.quantize, indent=not args.no_indent, archive=args.archive,
+                            writer_threads=args.writer_threads, progress=not args.quiet,
+                            stackup=load_stackup(args.stackup) if args.stackup else None,
+                            impedance_report_path=impedance_report_path, rotations=args.rotations)
+
+    for parameters, error in summary["skipped"]:
+        print(f"Skipped {parameters}: {error}")
+    print(f"Generated {summary['generated']} footprints into {args.archive or args.output}, "
+          f"skipped {len(summary['skipped'])} in {summary['elapsed']:.2f} s ({summary['throughput']:.0f} footprints/s, "
+          f"{summary['bytes_written'] / 1e6:.1f} MB written)")
+    if not args.no_cache and args.archive is None:
+        print(f"Build cache: {summary['cache_hits']} hits, {summary['cache_misses']} misses")
+    if args.verify == "warn":
+        for parameters in summary["violations"]:
+            print(f"Gap/skew violation: {parameters}")
+    if args.profile:
+        profiling.print_summary()
+        print("Wrote profile to {} and {}".format(*profiling.write_profile(args.profile)))
+    impedance = summary["impedance"]
+    if impedance is not None:
+        worst = impedance.worst()
+        print(f"Impedance: differential {impedance.differential.min():.1f}-{impedance.differential.max():.1f} ohm, "
+              f"worst bend deviation {impedance.deviation[worst]:.2f} ohm (inner radius "
+              f"{impedance.batch.small_radius[worst]:.4f} mm), report written to {impedance_report_path}")
+    if args.verify != "off":
+        print(f"Verification: {len(summary['violations'])} violations, report written to {report_path}")
+        if args.verify == "fail" and summary["violations"]:
+            exit(1)
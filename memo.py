@@ -0,0 +1,280 @@
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from library import check_parameters
+from primitives import Point
+from render import NM_PER_MM, to_nm
+from strafe import GENERATOR_VERSION, Strafe
+
+# Memoized Strafe geometry and footprint parameters, for callers that ask for the
+# same few hundred parameter sets again and again.
+#
+# Keys are the parameters quantized to the output grid: widths, gaps, offsets and
+# start coordinates to KiCad's 1 nm, the radius ratio and tangent angle to 1e-9
+# (dimensionless, radians), well below a nanometre of geometry. Entries are built
+# from the quantized values, not from the first caller's floats, so every input that
+# maps to a key gets the same footprint, name included: offset 0.30000000000000004
+# gives offs0.3mm.
+#
+# An in-memory LRU holds up to maxsize entries, Strafes and parameter dicts alike, and
+# every strafe() or footprint_parameters() call counts once in stats(). A parameter
+# dict is built from the memoized Strafe when that is in memory, and from a Strafe
+# that is not kept otherwise, so it takes a single slot. Behind the LRU, an optional
+# SQLite file holds every entry computed by any process that opened it, so
+# concurrent scripts and later runs share the work. Rows are tagged with
+# GENERATOR_VERSION and rows of other versions are deleted when the file is opened.
+# Values are pickled, so only open stores you wrote yourself. A store that cannot be
+# read or written is counted in store_errors and bypassed: the entry is computed as
+# if there were no store.
+#
+# Entries are shared between callers and must not be modified.
+
+MEMO_CACHE_SIZE = 1024
+QUANTA_PER_UNIT = 1_000_000_000  # radius ratio and tangent angle steps per unit
+STORE_TIMEOUT = 30.0  # s to wait for another process holding the store's write lock
+STORE_ERRORS = (sqlite3.Error, pickle.PickleError, EOFError)  # a store that is not a memo store, or a damaged one
+
+
+def quantize_key(trace_width: float, trace_gap: float, offset: float, radius_scale: float, middle_tangent_angle: float,
+                 start_x: float = 0.0, start_y: float = 0.0):
+    # Integer grid coordinates of a parameter set: nanometres for lengths, 1e-9 steps otherwise
+    return (to_nm(trace_width), to_nm(trace_gap), to_nm(offset), int(round(radius_scale * QUANTA_PER_UNIT)),
+            int(round(middle_tangent_angle * QUANTA_PER_UNIT)), to_nm(start_x), to_nm(start_y))
+
+
+def key_parameters(key):
+    # The parameters a key stands for, as the floats nearest to their decimal values. A start at 0 stays the
+    # integer 0 of Point(0, 0), as in library builds: a float 0.0 would be written as -0.0 once y is flipped
+    trace_width, trace_gap, offset, radius_scale, middle_tangent_angle, start_x, start_y = key
+    return (trace_width / NM_PER_MM, trace_gap / NM_PER_MM, offset / NM_PER_MM, radius_scale / QUANTA_PER_UNIT,
+            middle_tangent_angle / QUANTA_PER_UNIT, start_x / NM_PER_MM if start_x else 0, start_y / NM_PER_MM if start_y else 0)
+
+
+class GeometryStore:
+    """Memo entries in a SQLite file, shared by every process and thread that opens it.
+
+    The file is written in WAL mode, so readers never wait for a writer. A process
+    started by fork opens its own connection on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+
+    def connect(self):
+        # Called with the lock held
+        if self.connection is None or self.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=STORE_TIMEOUT, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS entries "
+                               "(key TEXT PRIMARY KEY, generator_version TEXT NOT NULL, value BLOB NOT NULL)")
+            connection.execute("DELETE FROM entries WHERE generator_version != ?", (GENERATOR_VERSION,))
+            self.connection, self.pid = connection, os.getpid()
+        return self.connection
+
+    @staticmethod
+    def encode_key(key):
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, key):
+        # The stored value, or None
+        with self.lock:
+            row = self.connect().execute("SELECT value FROM entries WHERE key = ? AND generator_version = ?",
+                                         (self.encode_key(key), GENERATOR_VERSION)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.connect().execute("INSERT OR REPLACE INTO entries (key, generator_version, value) VALUES (?, ?, ?)",
+                                   (self.encode_key(key), GENERATOR_VERSION, data))
+
+    def __len__(self):
+        with self.lock:
+            return self.connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def size_bytes(self):
+        with self.lock:
+            self.connect()
+            return sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix))
+
+    def clear(self):
+        with self.lock:
+            self.connect().execute("DELETE FROM entries")
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None and self.pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+
+
+class GeometryMemo:
+    """Strafes and their footprint parameters by quantized parameters, in a bounded LRU.
+
+    Safe to call from several threads. Two threads missing the same key at once both
+    compute it, and the second result is dropped.
+    """
+
+    def __init__(self, maxsize: int = MEMO_CACHE_SIZE, store_path: str = None):
+        """
+        Args:
+            maxsize (int, optional): Entries kept in memory, Strafes and parameter dicts together
+            store_path (str, optional): SQLite file shared with other processes, created if needed
+        """
+
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = GeometryStore(store_path) if store_path is not None else None
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    def lookup(self, key, compute):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self.store_call(self.store.get, key) if self.store is not None else None
+        stored = value is not None
+        if not stored:
+            value = compute()
+            if self.store is not None:
+                self.store_call(self.store.put, key, value)
+
+        with self.lock:
+            if stored:
+                self.store_hits += 1
+            else:
+                self.misses += 1
+            value = self.entries.setdefault(key, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def store_call(self, method, *args):
+        # A store method's result, or None when the store fails
+        try:
+            return method(*args)
+        except STORE_ERRORS:
+            with self.lock:
+                self.store_errors += 1
+            return None
+
+    def strafe(self, trace_width: float, trace_gap: float, offset: float, radius_scale: float,
+               middle_tangent_angle: float, start: Point = None, name_suffix: str = ""):
+        """
+        The Strafe of these parameters, built once per key
+
+        Args:
+            start (Point, optional): Start point, the origin by default
+            name_suffix (str, optional): Appended to the footprint name
+
+        Returns:
+            Strafe: Shared between callers, do not modify
+
+        Raises:
+            ValueError: For parameters library.check_parameters rejects, or trace lengths that are not finite
+        """
+
+        start = start or Point(0, 0)
+        key = ("strafe", name_suffix) + quantize_key(trace_width, trace_gap, offset, radius_scale, middle_tangent_angle,
+                                                     start.x, start.y)
+        return self.lookup(key, lambda: build_strafe(key[2:], name_suffix))
+
+    def footprint_parameters(self, trace_width: float, trace_gap: float, offset: float, radius_scale: float,
+                             middle_tangent_angle: float, start: Point = None, name_suffix: str = ""):
+        """
+        Strafe.generate_footprint_parameters of these parameters, with deterministic UUIDs
+
+        Random UUIDs differ on every call and cannot be memoized; use strafe(...).generate_footprint_parameters()
+        for those, which still shares the geometry.
+
+        Returns:
+            dict: Shared between callers, do not modify. render.render_footprint and quantize_parameters leave it as is
+        """
+
+        start = start or Point(0, 0)
+        key = ("parameters", name_suffix) + quantize_key(trace_width, trace_gap, offset, radius_scale,
+                                                         middle_tangent_angle, start.x, start.y)
+        return self.lookup(key, lambda: self.geometry_for(key).generate_footprint_parameters(deterministic_uuids=True))
+
+    def geometry_for(self, key):
+        # The Strafe a parameters entry is built from: the memoized one if it is in memory, else a new one that is
+        # not memoized, so the entry takes one slot of maxsize and the request counts once in the stats
+        strafe_key = ("strafe",) + key[1:]
+        with self.lock:
+            strafe = self.entries.get(strafe_key)
+            if strafe is not None:
+                self.entries.move_to_end(strafe_key)
+                return strafe
+        return build_strafe(key[2:], key[1])
+
+    def stats(self):
+        # Hits in memory, hits in the store, computed entries and the share of requests not computed
+        with self.lock:
+            lookups = self.hits + self.store_hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+                "store_errors": self.store_errors,
+                "generator_version": GENERATOR_VERSION,
+            }
+        if self.store is not None:
+            stats["store_size"] = self.store_call(len, self.store)
+            stats["store_bytes"] = self.store_call(self.store.size_bytes)
+        return stats
+
+    def clear(self, store: bool = False):
+        # Forget the entries in memory, and in the store if store
+        with self.lock:
+            self.entries.clear()
+        if store and self.store is not None:
+            self.store.clear()
+
+
+def build_strafe(key, name_suffix: str):
+    trace_width, trace_gap, offset, radius_scale, middle_tangent_angle, start_x, start_y = key_parameters(key)
+    check_parameters(trace_width, trace_gap, offset, radius_scale, middle_tangent_angle)
+    strafe = Strafe(Point(start_x, start_y), trace_width, trace_gap, offset, radius_scale, middle_tangent_angle,
+                    name_suffix=name_suffix)
+    if not (math.isfinite(strafe.minus_trace_length) and math.isfinite(strafe.plus_trace_length)):
+        raise ValueError("trace length is not finite")
+    return strafe
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear a shared geometry memo store")
+    parser.add_argument("store", help="SQLite file of a GeometryMemo store")
+    parser.add_argument("--clear", action="store_true", help="Delete every entry")
+    args = parser.parse_args()
+
+    store = GeometryStore(args.store)
+    if args.clear:
+        store.clear()
+    print(f"{args.store}: {len(store)} entries for generator version {GENERATOR_VERSION}, "
+          f"{store.size_bytes() / 1e6:.1f} MB")
+    store.close()
@@ -0,0 +1,201 @@
+import functools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from library import check_parameters, expand_grid, load_grid, variant_suffix
+from primitives import Point, DEFAULT_CHORD_TOLERANCE
+from strafe import Strafe
+
+# Headless preview rendering for whole libraries.
+#
+# Every footprint is drawn on the Agg backend as a single LineCollection with one
+# polyline per segment, arcs tessellated to a chord-error tolerance instead of a
+# fixed point count. Each worker process keeps one figure per thumbnail size and
+# only swaps the collection, so no window or pyplot state is ever created.
+
+THUMBNAIL_FORMATS = ("png", "svg")
+DEFAULT_THUMBNAIL_SIZE = 256  # px
+THUMBNAIL_DPI = 100
+TRACE_COLORS = ("blue", "red")  # minus, plus, as in Strafe.visualize
+MARGIN = 0.05  # fraction of the footprint extent
+
+
+def trace_polylines(primitives, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+    # One (k, 2) polyline per primitive. Primitives are not stored in path order
+    # (the second bend runs from the trace end back to the tangent line), and round
+    # caps make separate polylines meet without seams.
+    return [np.array(primitive.tessellate(chord_tolerance)) for primitive in primitives]
+
+
+@functools.lru_cache(maxsize=None)
+def get_thumbnail_figure(size: int):
+    # Created once per worker process and size, reused for every thumbnail
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(size / THUMBNAIL_DPI, size / THUMBNAIL_DPI), dpi=THUMBNAIL_DPI, facecolor="white")
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    collection = LineCollection([], capstyle="round", joinstyle="round")
+    ax.add_collection(collection)
+    return fig, ax, collection
+
+
+def render_thumbnail(strafe: Strafe, path: str, size: int = DEFAULT_THUMBNAIL_SIZE,
+                     chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+    """
+    Draw one strafe headlessly into a square PNG or SVG thumbnail
+
+    Args:
+        strafe (Strafe): Footprint to draw
+        path (str): Output file, the format follows the extension (.png or .svg)
+        size (int, optional): Thumbnail width and height in pixels
+        chord_tolerance (float, optional): Maximum deviation of the drawn arcs from the true ones (mm)
+    """
+
+    fig, ax, collection = get_thumbnail_figure(size)
+    minus = trace_polylines(strafe.minus_primitives, chord_tolerance)
+    plus = trace_polylines(strafe.plus_primitives, chord_tolerance)
+    polylines = minus + plus
+
+    # Square view around both traces, so that mm convert to pixels the same way in x and y
+    points = np.concatenate(polylines)
+    low, high = points.min(axis=0), points.max(axis=0)
+    center = (low + high) / 2
+    extent = max(high[0] - low[0], high[1] - low[1]) + strafe.trace_width
+    extent *= 1 + 2 * MARGIN
+    ax.set_xlim(center[0] - extent / 2, center[0] + extent / 2)
+    ax.set_ylim(center[1] - extent / 2, center[1] + extent / 2)
+
+    # True trace width: mm -> px -> pt
+    collection.set_segments(polylines)
+    collection.set_color([TRACE_COLORS[0]] * len(minus) + [TRACE_COLORS[1]] * len(plus))
+    collection.set_linewidth(strafe.trace_width * size / extent * 72 / THUMBNAIL_DPI)
+    fig.savefig(path, dpi=THUMBNAIL_DPI, facecolor="white")
+
+
+def thumbnail_job(job):
+    # Worker: render one thumbnail. Returns (thumbnail path or None, error message or None)
+    parameters, output_dir, name_suffix, image_format, size, chord_tolerance = job
+    try:
+        check_parameters(*parameters)
+        strafe = Strafe(Point(0, 0), *parameters, name_suffix=name_suffix)
+        path = os.path.join(output_dir, f"{strafe.generate_footprint_name()}.{image_format}")
+        render_thumbnail(strafe, path, size, chord_tolerance)
+        return path, None
+    except (ValueError, ArithmeticError) as e:
+        return None, str(e)
+
+
+def render_thumbnails(grid, output_dir: str, image_format: str = "png", size: int = DEFAULT_THUMBNAIL_SIZE,
+                      chord_tolerance: float = DEFAULT_CHORD_TOLERANCE, workers: int = None, chunksize: int = 16):
+    """
+    Render a thumbnail for every footprint of a parameter grid, in parallel
+
+    Args:
+        grid (list): Grid entries, as returned by library.load_grid
+        output_dir (str): Thumbnail directory, created if needed
+        image_format (str, optional): "png" or "svg"
+        size (int, optional): Thumbnail width and height in pixels
+        chord_tolerance (float, optional): Arc tessellation tolerance (mm)
+        workers (int, optional): Worker processes, defaults to the CPU count
+        chunksize (int, optional): Thumbnails handed to a worker at a time
+
+    Returns:
+        dict: Thumbnail paths in grid order, skipped parameters with reasons, elapsed time and throughput
+    """
+
+    if image_format not in THUMBNAIL_FORMATS:
+        raise ValueError(f"unknown thumbnail format '{image_format}', expected one of {', '.join(THUMBNAIL_FORMATS)}")
+
+    combinations = expand_grid(grid)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Same names as the footprints of library.build_library
+    variants = {(c[3], c[4]) for c in combinations}
+    jobs = [(c, output_dir, variant_suffix(c[3], c[4]) if len(variants) > 1 else "", image_format, size, chord_tolerance)
+            for c in combinations]
+
+    start_time = time.perf_counter()
+    paths = list()
+    skipped = list()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (parameters, *_), (path, error) in zip(jobs, executor.map(thumbnail_job, jobs, chunksize=chunksize)):
+            if error is None:
+                paths.append(path)
+            else:
+                skipped.append((parameters, error))
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "paths": paths,
+        "skipped": skipped,
+        "elapsed": elapsed,
+        "throughput": len(paths) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def contact_sheet(paths, output_path: str, columns: int = None):
+    """
+    Tile PNG thumbnails of equal size into one contact sheet image
+
+    Args:
+        paths (list): PNG thumbnails, placed row by row
+        output_path (str): Contact sheet PNG
+        columns (int, optional): Thumbnails per row, defaults to a roughly square sheet
+    """
+
+    import matplotlib.image
+
+    if not paths:
+        raise ValueError("no thumbnails to assemble")
+    columns = columns or math.ceil(math.sqrt(len(paths)))
+    rows = math.ceil(len(paths) / columns)
+
+    sheet = None
+    for i, path in enumerate(paths):
+        if not path.endswith(".png"):
+            raise ValueError("contact sheets are assembled from PNG thumbnails")
+        tile = matplotlib.image.imread(path)
+        height, width = tile.shape[:2]
+        if sheet is None:
+            sheet = np.ones((rows * height, columns * width, tile.shape[2]), dtype=tile.dtype)
+        row, column = divmod(i, columns)
+        sheet[row * height:(row + 1) * height, column * width:(column + 1) * width] = tile
+    matplotlib.image.imsave(output_path, sheet)
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render headless thumbnails of a Strafe footprint library")
+    parser.add_argument("grid", help="Parameter grid file (.toml or .csv), as for library.py")
+    parser.add_argument("-o", "--output", default="strafe_previews", help="Thumbnail directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", choices=THUMBNAIL_FORMATS, default="png", help="Thumbnail format")
+    parser.add_argument("--size", type=int, default=DEFAULT_THUMBNAIL_SIZE, help="Thumbnail size in pixels")
+    parser.add_argument("--chord-tolerance", type=float, default=DEFAULT_CHORD_TOLERANCE,
+                        help="Maximum arc tessellation error (mm)")
+    parser.add_argument("--sheet", default=None, help="Also assemble a contact sheet PNG of all thumbnails")
+    parser.add_argument("--columns", type=int, default=None, help="Contact sheet thumbnails per row")
+    args = parser.parse_args()
+    if args.sheet and args.format != "png":
+        parser.error("contact sheets are assembled from PNG thumbnails")
+
+    summary = render_thumbnails(load_grid(args.grid), args.output, args.format, args.size, args.chord_tolerance,
+                                workers=args.jobs)
+    for parameters, error in summary["skipped"]:
+        print(f"Skipped {parameters}: {error}")
+    print(f"Rendered {len(summary['paths'])} thumbnails into {args.output} in {summary['elapsed']:.2f} s "
+          f"({summary['throughput']:.0f} footprints/s)")
+
+    if args.sheet:
+        contact_sheet(summary["paths"], args.sheet, args.columns)
+        print(f"Saved contact sheet to {args.sheet}")
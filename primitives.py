@@ -1,13 +1,34 @@
 import math
-from viz import VIZ_WIDTH_SCALE
+from array import array
+
+# Line widths are exaggerated in previews so that thin traces stay visible
+VIZ_WIDTH_SCALE = 10
+
+# Default maximum distance (mm) between an arc and the chords approximating it
+DEFAULT_CHORD_TOLERANCE = 0.001
+
+
+def arc_segment_count(radius: float, sweep_angle: float, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+    # Fewest chords keeping the arc within chord_tolerance: a chord spanning θ deviates r (1 - cos(θ/2))
+    if radius <= chord_tolerance:
+        return max(1, math.ceil(math.fabs(sweep_angle) / (math.pi / 2)))
+    step = 2 * math.acos(1 - chord_tolerance / radius)
+    return max(1, math.ceil(math.fabs(sweep_angle) / step))
 
 class Point:
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
 
+    def copy(self):
+        return Point(self.x, self.y)
+
 
 class Line:
+    __slots__ = ("start", "end", "width", "length")
+
     def __init__(self, start: Point, end: Point, width: float):
         self.start = start
         self.end = end
@@ -39,6 +60,14 @@ class Line:
             y_intersect = slope * (x - self.start.x) + self.start.y
             return Line(Point(self.start.x, self.start.y), Point(x, y_intersect), self.width)
 
+    def translate(self, dx: float, dy: float):
+        # Copy of the line moved by (dx, dy)
+        return Line(Point(self.start.x + dx, self.start.y + dy), Point(self.end.x + dx, self.end.y + dy), self.width)
+
+    def tessellate(self, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+        # Polyline points [(x, y), ...] of the line
+        return [(self.start.x, self.start.y), (self.end.x, self.end.y)]
+
     def draw(self, viz, color='blue', label="", width=0.1):
         viz.add_line(self.start, self.end, color=color, width=width*VIZ_WIDTH_SCALE, label=label)
     
@@ -56,9 +85,9 @@ class Line:
         return {
             "type": "gr_line",
             "start_x": self.start.x - offset_to.x,
-            "start_y": -self.start.y - offset_to.y,
+            "start_y": -(self.start.y - offset_to.y),
             "end_x": self.end.x - offset_to.x,
-            "end_y": -self.end.y - offset_to.y,
+            "end_y": -(self.end.y - offset_to.y),
             "width": self.width
         }
 
@@ -67,6 +96,8 @@ class Line:
 
 
 class Arc:
+    __slots__ = ("center", "radius", "start_angle", "end_angle", "width")
+
     def __init__(self, center: Point, radius: float, start_angle: float, end_angle: float, width: float):
         self.center = center
         self.radius = radius
@@ -105,14 +136,36 @@ class Arc:
         tangent_angle = self.start_angle - math.pi / 2
         return math.degrees(tangent_angle)
 
+    def get_sweep_angle(self):
+        # Swept angle of the arc as drawn through its start, mid and end points,
+        # normalized to [-π, π]. Positive is counterclockwise.
+        angle_diff = self.end_angle - self.start_angle
+        while angle_diff > math.pi:
+            angle_diff -= 2 * math.pi
+        while angle_diff < -math.pi:
+            angle_diff += 2 * math.pi
+        return angle_diff
+
     def get_line_length(self):
         # Get the length of the arc in millimeters, used for precise trace length calculation
-        # Formula: L = r * θ, e.g. 180 degree arc with r = 0.5: L = 0.5* π = 1.5708
-        return self.radius * (self.end_angle - self.start_angle)
+        # Formula: L = r * |θ|, e.g. 180 degree arc with r = 0.5: L = 0.5* π = 1.5708
+        # θ is the swept angle as drawn, so clockwise arcs and angles past a full turn count correctly
+        return self.radius * math.fabs(self.get_sweep_angle())
 
     def calculate_length(self):
         return self.get_line_length()
 
+    def translate(self, dx: float, dy: float):
+        # Copy of the arc moved by (dx, dy)
+        return Arc(Point(self.center.x + dx, self.center.y + dy), self.radius, self.start_angle, self.end_angle, self.width)
+
+    def tessellate(self, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE):
+        # Polyline points [(x, y), ...] along the arc as drawn, within chord_tolerance of it
+        sweep = self.get_sweep_angle()
+        count = arc_segment_count(self.radius, sweep, chord_tolerance)
+        return [(self.center.x + self.radius * math.cos(self.start_angle + sweep * i / count),
+                 self.center.y + self.radius * math.sin(self.start_angle + sweep * i / count)) for i in range(count + 1)]
+
     def draw(self, viz, color='blue', label=None, width=0.1):
         viz.add_arc(self.center, self.radius, self.start_angle, self.end_angle, 
                    color=color, width=width*VIZ_WIDTH_SCALE, label=label)
@@ -142,13 +195,7 @@ class Arc:
         
         # Calculate the actual arc midpoint considering arc direction
         # Determine if arc is clockwise or counterclockwise
-        angle_diff = self.end_angle - self.start_angle
-        
-        # Normalize angle difference to [-π, π]
-        while angle_diff > math.pi:
-            angle_diff -= 2 * math.pi
-        while angle_diff < -math.pi:
-            angle_diff += 2 * math.pi
+        angle_diff = self.get_sweep_angle()
         
         # Calculate midpoint angle - use the actual arc path direction
         if angle_diff >= 0:  # counterclockwise arc
@@ -165,10 +212,73 @@ class Arc:
         return {
             "type": "gr_arc",
             "start_x": start_point.x - offset_to.x,
-            "start_y": -start_point.y - offset_to.y,
+            "start_y": -(start_point.y - offset_to.y),
             "mid_x": mid_point.x - offset_to.x,
-            "mid_y": -mid_point.y - offset_to.y,
+            "mid_y": -(mid_point.y - offset_to.y),
             "end_x": end_point.x - offset_to.x,
-            "end_y": -end_point.y - offset_to.y,
+            "end_y": -(end_point.y - offset_to.y),
             "width": self.width
         }
+
+
+
+class PrimitiveBuffer:
+    """A whole trace's segments packed into one typed array of doubles.
+
+    Every segment takes RECORD_SIZE slots:
+    - arc:  ARC_RECORD, center x, center y, radius, start angle, end angle, width
+    - line: LINE_RECORD, start x, start y, end x, end y, width, unused
+    Indexing returns a new Arc or Line built from the record.
+    """
+
+    __slots__ = ("data",)
+
+    RECORD_SIZE = 7
+    ARC_RECORD = 0.0
+    LINE_RECORD = 1.0
+
+    def __init__(self, primitives=()):
+        self.data = array("d")
+        for primitive in primitives:
+            self.append(primitive)
+
+    def append(self, primitive):
+        if isinstance(primitive, Arc):
+            self.data.extend((self.ARC_RECORD, primitive.center.x, primitive.center.y, primitive.radius,
+                              primitive.start_angle, primitive.end_angle, primitive.width))
+        else:
+            self.data.extend((self.LINE_RECORD, primitive.start.x, primitive.start.y,
+                              primitive.end.x, primitive.end.y, primitive.width, 0.0))
+
+    def __len__(self):
+        return len(self.data) // self.RECORD_SIZE
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("primitive index out of range")
+        return self.record_primitive(self.data[index * self.RECORD_SIZE:(index + 1) * self.RECORD_SIZE])
+
+    @classmethod
+    def record_primitive(cls, record):
+        # The Arc or Line of one record, from any sequence of RECORD_SIZE numbers
+        kind, a, b, c, d, e, f = record
+        if kind == cls.ARC_RECORD:
+            return Arc(Point(a, b), c, d, e, f)
+        return Line(Point(a, b), Point(c, d), e)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def calculate_length(self):
+        # Same per-segment lengths as Arc.calculate_length and Line.calculate_length, without building objects
+        total = 0.0
+        data = self.data
+        for i in range(0, len(data), self.RECORD_SIZE):
+            if data[i] == self.ARC_RECORD:
+                total += data[i + 3] * math.fabs(math.remainder(data[i + 5] - data[i + 4], 2 * math.pi))
+            else:
+                total += math.hypot(data[i + 3] - data[i + 1], data[i + 4] - data[i + 2])
+        return total
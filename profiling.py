@@ -0,0 +1,205 @@
+import functools
+import os
+import threading
+import time
+
+# Timing spans for the generation stages.
+#
+# Methods are wrapped with @traced(stage) and other code blocks with
+# `with span(stage):`. While profiling is disabled, which is the default, a span
+# is a flag check and nothing else. While enabled, every span is recorded with its
+# process and thread, aggregated per stage and kept for a Chrome trace.
+#
+# Worker processes enable profiling in their pool initializer, run their jobs
+# through run_traced, and hand back the spans recorded for each job with its
+# result; the parent merges them, so one profile covers the whole build.
+
+MAX_TRACE_EVENTS = 1_000_000  # spans kept for the trace, beyond that only aggregated
+
+_enabled = False
+_pid = None
+_events = list()  # (stage, start ns, duration ns, pid, thread id)
+_stages = dict()  # stage -> [count, total ns, min ns, max ns]
+_dropped = 0
+_lock = threading.Lock()
+_started = None
+
+
+def enable():
+    """Start recording spans in this process, discarding any recorded before"""
+    global _enabled, _pid, _started
+    reset()
+    _pid = os.getpid()
+    _started = time.perf_counter_ns()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    global _events, _stages, _dropped
+    with _lock:
+        _events = list()
+        _stages = dict()
+        _dropped = 0
+
+
+def _add(event):
+    global _dropped
+    stage, _, duration = event[:3]
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            _stages[stage] = [1, duration, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            if duration < stats[2]:
+                stats[2] = duration
+            if duration > stats[3]:
+                stats[3] = duration
+        if len(_events) < MAX_TRACE_EVENTS:
+            _events.append(event)
+        else:
+            _dropped += 1
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        _add((self.stage, self.start, time.perf_counter_ns() - self.start, _pid, threading.get_ident()))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    # Context manager timing a block as one span of stage
+    return _Span(stage) if _enabled else _NO_SPAN
+
+
+def traced(stage: str):
+    # Decorator timing every call of a function as one span of stage
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _add((stage, start, time.perf_counter_ns() - start, _pid, threading.get_ident()))
+        return wrapper
+    return decorate
+
+
+def drain():
+    # Spans recorded in this process since the last drain, cleared afterwards
+    global _events, _stages
+    with _lock:
+        events, _events = _events, list()
+        _stages = dict()
+    return events
+
+
+def merge(events):
+    # Add spans recorded by another process
+    for event in events:
+        _add(tuple(event))
+
+
+def run_traced(function, argument):
+    """Worker side of a profiled pool: run one job, return (result, spans it recorded)"""
+    return function(argument), drain()
+
+
+def summary():
+    """
+    Aggregated timings per stage
+
+    Returns:
+        dict: "stages" maps each stage to count, total, mean, min and max (seconds and microseconds),
+              plus the wall time since enable, the processes seen and spans left out of the trace
+    """
+
+    with _lock:
+        stages = {stage: {"count": count,
+                          "total_s": total / 1e9,
+                          "mean_us": total / count / 1e3,
+                          "min_us": low / 1e3,
+                          "max_us": high / 1e3}
+                  for stage, (count, total, low, high) in sorted(_stages.items(), key=lambda item: -item[1][1])}
+        processes = len({event[3] for event in _events})
+        dropped = _dropped
+    wall = (time.perf_counter_ns() - _started) / 1e9 if _started is not None else 0.0
+    return {"stages": stages, "wall_s": wall, "processes": processes, "trace_events_dropped": dropped}
+
+
+def chrome_trace():
+    # Recorded spans as Chrome trace-event JSON (chrome://tracing, Perfetto): complete events in microseconds
+    with _lock:
+        origin = min((event[1] for event in _events), default=0)
+        events = [{"name": stage, "cat": "strafe", "ph": "X", "ts": (start - origin) / 1e3, "dur": duration / 1e3,
+                   "pid": pid, "tid": tid}
+                  for stage, start, duration, pid, tid in _events]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def trace_path(profile_path: str):
+    # profile.json -> profile.trace.json
+    root, extension = os.path.splitext(profile_path)
+    return f"{root}.trace{extension or '.json'}"
+
+
+def write_profile(profile_path: str):
+    """
+    Write the per-stage summary to profile_path and the Chrome trace next to it
+
+    Args:
+        profile_path (str): Summary JSON file; the trace goes to the same name with .trace before the extension
+
+    Returns:
+        tuple: (summary path, trace path)
+    """
+
+    import json
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=2)
+    with open(trace_path(profile_path), "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    return profile_path, trace_path(profile_path)
+
+
+def print_summary():
+    result = summary()
+    print(f"{'stage':32} {'count':>8} {'total s':>9} {'mean us':>9} {'max us':>9}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:32} {stats['count']:8} {stats['total_s']:9.3f} {stats['mean_us']:9.1f} {stats['max_us']:9.1f}")
+    print(f"wall time {result['wall_s']:.3f} s over {result['processes']} process(es)")
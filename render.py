@@ -0,0 +1,431 @@
+import functools
+import io
+import math
+import re
+
+from profiling import traced
+
+# Embedded Jinja template for Strafe footprint
+STRAFE_FOOTPRINT_TEMPLATE = """(footprint "{{ footprint_name }}"
+	(version {{ version | default("20241229") }})
+	(generator "{{ generator | default("pcbnew") }}")
+	(generator_version "{{ generator_version | default("9.0") }}")
+	(layer "{{ layer | default("F.Cu") }}")
+	(descr "{{ description }}")
+	(property "Reference" "{{ reference | default("REF**") }}"
+		(at {{ ref_pos_x | default(0.1) }} {{ ref_pos_y | default(1.6) }} {{ ref_rotation | default(0) }})
+		(unlocked yes)
+		(layer "{{ ref_layer | default("F.SilkS") }}")
+		(uuid "{{ ref_uuid }}")
+		(effects
+			(font
+				(size {{ ref_font_size | default(1) }} {{ ref_font_size | default(1) }})
+				(thickness {{ ref_font_thickness | default(0.1) }})
+			)
+		)
+	)
+	(property "Value" "{{ value | default("Untitled") }}"
+		(at {{ val_pos_x | default(0) }} {{ val_pos_y | default(1) }} {{ val_rotation | default(0) }})
+		(unlocked yes)
+		(layer "{{ val_layer | default("F.Fab") }}")
+		(uuid "{{ val_uuid }}")
+		(effects
+			(font
+				(size {{ val_font_size | default(1) }} {{ val_font_size | default(1) }})
+				(thickness {{ val_font_thickness | default(0.15) }})
+			)
+		)
+	)
+	(property "Datasheet" "{{ datasheet | default("") }}"
+		(at 0 0 0)
+		(unlocked yes)
+		(layer "F.Fab")
+		(hide yes)
+		(uuid "{{ datasheet_uuid }}")
+		(effects
+			(font
+				(size 1 1)
+				(thickness 0.15)
+			)
+		)
+	)
+	(property "Description" "{{ footprint_name }}"
+		(at 0 0 0)
+		(unlocked yes)
+		(layer "F.Fab")
+		(hide yes)
+		(uuid "{{ description_uuid }}")
+		(effects
+			(font
+				(size 1 1)
+				(thickness 0.15)
+			)
+		)
+	)
+	(attr {{ attributes | default("exclude_from_pos_files exclude_from_bom") }})
+{%- for line in fp_lines %}
+	(fp_line
+		(start {{ line.start_x }} {{ line.start_y }})
+		(end {{ line.end_x }} {{ line.end_y }})
+		(stroke
+			(width {{ line.width }})
+			(type {{ line.type | default("default") }})
+		)
+		(layer "{{ line.layer }}")
+		(uuid "{{ line.uuid }}")
+	)
+{%- endfor %}
+{%- for text in fp_texts %}
+	(fp_text {{ text.text_type }} "{{ text.content }}"
+		(at {{ text.pos_x }} {{ text.pos_y }} {{ text.rotation | default(0) }})
+		(unlocked yes)
+		(layer "{{ text.layer }}")
+		(uuid "{{ text.uuid }}")
+		(effects
+			(font
+				(size {{ text.font_size | default(1) }} {{ text.font_size | default(1) }})
+				(thickness {{ text.font_thickness | default(0.15) }})
+			)
+		)
+	)
+{%- endfor %}
+{%- for pad in pads %}
+	(pad "{{ pad.number }}" smd {{ pad.shape }}
+		(at {{ pad.pos_x }} {{ pad.pos_y }})
+		(size {{ pad.size_x }} {{ pad.size_y }})
+		(layers {{ pad.layers }})
+		{%- if pad.shape == "custom" %}
+		{%- if pad.die_length %}
+		(die_length {{ pad.die_length }})
+		{%- endif %}
+		(options
+			(clearance {{ pad.clearance | default("outline") }})
+			(anchor {{ pad.anchor | default("circle") }})
+		)
+		(primitives
+		{%- for primitive in pad.primitives %}
+			{%- if primitive.type == "gr_arc" %}
+			(gr_arc
+				(start {{ primitive.start_x }} {{ primitive.start_y }})
+				(mid {{ primitive.mid_x }} {{ primitive.mid_y }})
+				(end {{ primitive.end_x }} {{ primitive.end_y }})
+				(width {{ primitive.width }})
+			)
+			{%- elif primitive.type == "gr_line" %}
+			(gr_line
+				(start {{ primitive.start_x }} {{ primitive.start_y }})
+				(end {{ primitive.end_x }} {{ primitive.end_y }})
+				(width {{ primitive.width }})
+			)
+			{%- endif %}
+		{%- endfor %}
+		)
+		{%- endif %}
+		(uuid "{{ pad.uuid }}")
+	)
+{%- endfor %}
+	(embedded_fonts no)
+)"""
+
+RENDER_BACKENDS = ("template", "sexpr")
+
+# KiCad stores coordinates as integer nanometres
+NM_PER_MM = 1_000_000
+INDENT_PATTERN = re.compile(r"\n\t+")
+
+
+@functools.lru_cache(maxsize=None)
+@traced("compile_template")
+def get_template(template_string: str = STRAFE_FOOTPRINT_TEMPLATE):
+    # Compiling the template costs far more than rendering it, so do it once per process.
+    # Jinja is only imported when the template backend is used.
+    from jinja2 import Template
+    return Template(template_string)
+
+
+def render_template(parameters: dict):
+    return get_template().render(**parameters)
+
+
+def _value(item: dict, key: str, default=""):
+    # Same lookup as the template: a missing key renders as its default filter value
+    return item[key] if key in item else default
+
+
+def write_sexpr(parameters: dict, out):
+    """
+    Write the footprint S-expression straight to a file-like object, without Jinja.
+    Produces exactly the same text as rendering STRAFE_FOOTPRINT_TEMPLATE.
+
+    Args:
+        parameters (dict): Footprint parameters, as from Strafe.generate_footprint_parameters
+        out: Anything with a write(str) method, e.g. an open text file or io.StringIO
+    """
+
+    p = parameters
+    write = out.write
+    footprint_name = _value(p, "footprint_name")
+    ref_font_size = _value(p, "ref_font_size", 1)
+    val_font_size = _value(p, "val_font_size", 1)
+
+    write(f'(footprint "{footprint_name}"\n'
+          f'\t(version {_value(p, "version", "20241229")})\n'
+          f'\t(generator "{_value(p, "generator", "pcbnew")}")\n'
+          f'\t(generator_version "{_value(p, "generator_version", "9.0")}")\n'
+          f'\t(layer "{_value(p, "layer", "F.Cu")}")\n'
+          f'\t(descr "{_value(p, "description")}")\n'
+          f'\t(property "Reference" "{_value(p, "reference", "REF**")}"\n'
+          f'\t\t(at {_value(p, "ref_pos_x", 0.1)} {_value(p, "ref_pos_y", 1.6)} {_value(p, "ref_rotation", 0)})\n'
+          f'\t\t(unlocked yes)\n'
+          f'\t\t(layer "{_value(p, "ref_layer", "F.SilkS")}")\n'
+          f'\t\t(uuid "{_value(p, "ref_uuid")}")\n'
+          f'\t\t(effects\n'
+          f'\t\t\t(font\n'
+          f'\t\t\t\t(size {ref_font_size} {ref_font_size})\n'
+          f'\t\t\t\t(thickness {_value(p, "ref_font_thickness", 0.1)})\n'
+          f'\t\t\t)\n'
+          f'\t\t)\n'
+          f'\t)\n'
+          f'\t(property "Value" "{_value(p, "value", "Untitled")}"\n'
+          f'\t\t(at {_value(p, "val_pos_x", 0)} {_value(p, "val_pos_y", 1)} {_value(p, "val_rotation", 0)})\n'
+          f'\t\t(unlocked yes)\n'
+          f'\t\t(layer "{_value(p, "val_layer", "F.Fab")}")\n'
+          f'\t\t(uuid "{_value(p, "val_uuid")}")\n'
+          f'\t\t(effects\n'
+          f'\t\t\t(font\n'
+          f'\t\t\t\t(size {val_font_size} {val_font_size})\n'
+          f'\t\t\t\t(thickness {_value(p, "val_font_thickness", 0.15)})\n'
+          f'\t\t\t)\n'
+          f'\t\t)\n'
+          f'\t)\n'
+          f'\t(property "Datasheet" "{_value(p, "datasheet", "")}"\n'
+          f'\t\t(at 0 0 0)\n'
+          f'\t\t(unlocked yes)\n'
+          f'\t\t(layer "F.Fab")\n'
+          f'\t\t(hide yes)\n'
+          f'\t\t(uuid "{_value(p, "datasheet_uuid")}")\n'
+          f'\t\t(effects\n'
+          f'\t\t\t(font\n'
+          f'\t\t\t\t(size 1 1)\n'
+          f'\t\t\t\t(thickness 0.15)\n'
+          f'\t\t\t)\n'
+          f'\t\t)\n'
+          f'\t)\n'
+          f'\t(property "Description" "{footprint_name}"\n'
+          f'\t\t(at 0 0 0)\n'
+          f'\t\t(unlocked yes)\n'
+          f'\t\t(layer "F.Fab")\n'
+          f'\t\t(hide yes)\n'
+          f'\t\t(uuid "{_value(p, "description_uuid")}")\n'
+          f'\t\t(effects\n'
+          f'\t\t\t(font\n'
+          f'\t\t\t\t(size 1 1)\n'
+          f'\t\t\t\t(thickness 0.15)\n'
+          f'\t\t\t)\n'
+          f'\t\t)\n'
+          f'\t)\n'
+          f'\t(attr {_value(p, "attributes", "exclude_from_pos_files exclude_from_bom")})')
+
+    for line in _value(p, "fp_lines", ()):
+        write(f'\n\t(fp_line\n'
+              f'\t\t(start {_value(line, "start_x")} {_value(line, "start_y")})\n'
+              f'\t\t(end {_value(line, "end_x")} {_value(line, "end_y")})\n'
+              f'\t\t(stroke\n'
+              f'\t\t\t(width {_value(line, "width")})\n'
+              f'\t\t\t(type {_value(line, "type", "default")})\n'
+              f'\t\t)\n'
+              f'\t\t(layer "{_value(line, "layer")}")\n'
+              f'\t\t(uuid "{_value(line, "uuid")}")\n'
+              f'\t)')
+
+    for text in _value(p, "fp_texts", ()):
+        font_size = _value(text, "font_size", 1)
+        write(f'\n\t(fp_text {_value(text, "text_type")} "{_value(text, "content")}"\n'
+              f'\t\t(at {_value(text, "pos_x")} {_value(text, "pos_y")} {_value(text, "rotation", 0)})\n'
+              f'\t\t(unlocked yes)\n'
+              f'\t\t(layer "{_value(text, "layer")}")\n'
+              f'\t\t(uuid "{_value(text, "uuid")}")\n'
+              f'\t\t(effects\n'
+              f'\t\t\t(font\n'
+              f'\t\t\t\t(size {font_size} {font_size})\n'
+              f'\t\t\t\t(thickness {_value(text, "font_thickness", 0.15)})\n'
+              f'\t\t\t)\n'
+              f'\t\t)\n'
+              f'\t)')
+
+    for pad in _value(p, "pads", ()):
+        write(f'\n\t(pad "{_value(pad, "number")}" smd {_value(pad, "shape")}\n'
+              f'\t\t(at {_value(pad, "pos_x")} {_value(pad, "pos_y")})\n'
+              f'\t\t(size {_value(pad, "size_x")} {_value(pad, "size_y")})\n'
+              f'\t\t(layers {_value(pad, "layers")})')
+        if pad.get("shape") == "custom":
+            if pad.get("die_length"):
+                write(f'\n\t\t(die_length {pad["die_length"]})')
+            write(f'\n\t\t(options\n'
+                  f'\t\t\t(clearance {_value(pad, "clearance", "outline")})\n'
+                  f'\t\t\t(anchor {_value(pad, "anchor", "circle")})\n'
+                  f'\t\t)\n'
+                  f'\t\t(primitives')
+            for primitive in _value(pad, "primitives", ()):
+                if primitive.get("type") == "gr_arc":
+                    write(f'\n\t\t\t(gr_arc\n'
+                          f'\t\t\t\t(start {_value(primitive, "start_x")} {_value(primitive, "start_y")})\n'
+                          f'\t\t\t\t(mid {_value(primitive, "mid_x")} {_value(primitive, "mid_y")})\n'
+                          f'\t\t\t\t(end {_value(primitive, "end_x")} {_value(primitive, "end_y")})\n'
+                          f'\t\t\t\t(width {_value(primitive, "width")})\n'
+                          f'\t\t\t)')
+                elif primitive.get("type") == "gr_line":
+                    write(f'\n\t\t\t(gr_line\n'
+                          f'\t\t\t\t(start {_value(primitive, "start_x")} {_value(primitive, "start_y")})\n'
+                          f'\t\t\t\t(end {_value(primitive, "end_x")} {_value(primitive, "end_y")})\n'
+                          f'\t\t\t\t(width {_value(primitive, "width")})\n'
+                          f'\t\t\t)')
+            write('\n\t\t)')
+        write(f'\n\t\t(uuid "{_value(pad, "uuid")}")\n'
+              f'\t)')
+
+    write('\n\t(embedded_fonts no)\n'
+          ')')
+
+
+def to_nm(value: float):
+    # Nearest point of KiCad's internal 1 nm grid, as integer nanometres
+    return int(round(value * NM_PER_MM))
+
+
+def format_nm(nm: int):
+    # Shortest decimal in mm that is exactly nm nanometres: 300000 -> "0.3", -1 -> "-0.000001"
+    whole, fraction = divmod(abs(nm), NM_PER_MM)
+    text = str(whole) if fraction == 0 else f"{whole}.{fraction:06d}".rstrip("0")
+    return f"-{text}" if nm < 0 else text
+
+
+def primitive_length_nm(primitive: dict):
+    # Length of a quantized gr_line or gr_arc, computed from its snapped points
+    start = (primitive["start_x"], primitive["start_y"])
+    end = (primitive["end_x"], primitive["end_y"])
+    if primitive["type"] != "gr_arc":
+        return math.dist(start, end)
+
+    # Arc through start, mid and end: radius from the triangle, sweep as the sum of
+    # the angles the two chords subtend, which holds for any sweep below a full turn
+    mid = (primitive["mid_x"], primitive["mid_y"])
+    a, b, c = math.dist(start, mid), math.dist(mid, end), math.dist(start, end)
+    area = math.fabs((mid[0] - start[0]) * (end[1] - start[1]) - (end[0] - start[0]) * (mid[1] - start[1])) / 2
+    if area == 0:
+        return a + b
+    radius = a * b * c / (4 * area)
+    return 2 * radius * (math.asin(min(1.0, a / (2 * radius))) + math.asin(min(1.0, b / (2 * radius))))
+
+
+def _quantized(value):
+    if isinstance(value, float) or (isinstance(value, int) and not isinstance(value, bool)):
+        return to_nm(value)
+    if isinstance(value, dict):
+        return {key: _quantized(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_quantized(item) for item in value]
+    return value
+
+
+def _formatted(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return format_nm(value)
+    if isinstance(value, dict):
+        return {key: _formatted(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_formatted(item) for item in value]
+    return value
+
+
+def quantize_parameters(parameters: dict):
+    """
+    Copy of footprint parameters with every number snapped to KiCad's 1 nm grid and written as
+    its shortest exact decimal, e.g. 0.30000000000000004 -> "0.3" and -1.2246467991473532e-16 -> "0".
+    The die_length of each custom pad is recomputed from its snapped primitives, so the
+    length KiCad reports matches the geometry in the file.
+
+    Args:
+        parameters (dict): Footprint parameters, as from DiffPairFootprint.generate_footprint_parameters
+
+    Returns:
+        dict: Parameters to render, numbers replaced by decimal strings
+    """
+
+    quantized = _quantized(parameters)
+    for pad in quantized.get("pads", ()):
+        if pad.get("die_length") and pad.get("primitives"):
+            pad["die_length"] = to_nm(sum(primitive_length_nm(primitive) for primitive in pad["primitives"]) / NM_PER_MM)
+    return _formatted(quantized)
+
+
+def render_sexpr(parameters: dict):
+    buffer = io.StringIO()
+    write_sexpr(parameters, buffer)
+    return buffer.getvalue()
+
+
+def render_footprint(parameters: dict, backend: str = "template", indent: bool = True):
+    # Render footprint parameters to .kicad_mod text with the chosen backend,
+    # without the leading tabs of every line unless indent
+    if backend == "template":
+        text = render_template(parameters)
+    elif backend == "sexpr":
+        text = render_sexpr(parameters)
+    else:
+        raise ValueError(f"unknown render backend '{backend}', expected one of {', '.join(RENDER_BACKENDS)}")
+    return text if indent else INDENT_PATTERN.sub("\n", text)
+
+
+if __name__ == "__main__":
+
+    import os
+    import sys
+    import time
+    from primitives import Point
+    from strafe import Strafe
+
+    # Usage: render.py - checks every backend byte for byte against footprint files written
+    # by the original jinja2 generator (golden/, UUIDs zeroed), and times them.
+    #
+    # The goldens are left strafes: right strafes of that generator carry the negative
+    # die_length since fixed in Strafe, and would no longer match. extended_fields is a
+    # left strafe with the optional template fields set, rendered by the original template.
+
+    GOLDEN_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+    GOLDEN_SAMPLES = [(0.2, 0.15, -4.0, 0.1, 0.3), (0.1, 0.1, -0.5, 0.5, 1.2), (0.2, 0.1, -4.0, 1.5, 2.5),
+                      (0.1, 0.15, -0.5, 1.5, 0.3)]
+    ZERO_UUID = '(uuid "00000000-0000-0000-0000-000000000000")'
+    uuid_pattern = re.compile(r'\(uuid "[0-9a-f-]{36}"\)')
+
+    def read_golden(name: str):
+        with open(os.path.join(GOLDEN_DIRECTORY, name + ".kicad_mod")) as file:
+            return file.read()
+
+    goldens = list()
+    for parameters in GOLDEN_SAMPLES:
+        footprint_parameters = Strafe(Point(0, 0), *parameters).generate_footprint_parameters()
+        goldens.append((footprint_parameters, read_golden(footprint_parameters["footprint_name"] +
+                                                          f"_rs{parameters[3]}_a{parameters[4]}")))
+
+    extended = dict(goldens[0][0], version=20240108, datasheet="none", ref_layer="F.Fab")
+    extended["fp_lines"] = [{"start_x": 0, "start_y": -1.5, "end_x": 0.5, "end_y": 2, "width": 0.1, "layer": "F.Fab", "uuid": "0"}]
+    extended["fp_texts"] = [dict(extended["fp_texts"][0], font_size=0.8)]
+    extended["pads"] = [dict(pad, die_length=0) for pad in extended["pads"]]
+    goldens.append((extended, read_golden("extended_fields")))
+
+    failures = 0
+    for backend in RENDER_BACKENDS:
+        for parameters, golden in goldens:
+            if uuid_pattern.sub(ZERO_UUID, render_footprint(parameters, backend)) != golden:
+                failures += 1
+                print(f"{backend}: output differs from golden for {parameters['footprint_name']}")
+
+        samples = [parameters for parameters, _ in goldens]
+        start_time = time.perf_counter()
+        for parameters in samples * 100:
+            render_footprint(parameters, backend)
+        elapsed = time.perf_counter() - start_time
+        print(f"{backend}: {len(samples) * 100 / elapsed:,.0f} footprints/s")
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,394 @@
+import csv
+import math
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from library import expand_grid, load_grid
+from primitives import Point
+from sexpr import OPEN, child, iter_nodes, tokenize
+from strafe import Strafe
+from transform import rotated_variants
+
+# Round-trip validation of Strafe footprints already in a library.
+#
+# Every .kicad_mod file is streamed through the S-expression reader, keeping only
+# its name and pads. The Strafe parameters come from the footprint name
+# (dp_strafe_<direction>_w<width>_g<gap>_offs<offset>mm, plus _rs<ratio>_a<angle>
+# for library variants, then _rot<degrees> and _mirrored for rotated or mirrored
+# variants, which are regenerated through transform.rotated_variants). If the name does not carry the radius ratio and tangent
+# angle, they are looked up in the library's parameter grid when one is given, or
+# else recovered from the first bend of the minus trace. The footprint is then
+# regenerated and compared pad by pad and primitive by primitive: positions,
+# sizes, die_length and every gr_arc/gr_line coordinate must agree within tolerance.
+#
+# Files are checked in chunks by a process pool with a bounded number of chunks in
+# flight, results are streamed to the report as they arrive, so memory stays flat
+# however large the library.
+
+DEFAULT_TOLERANCE = 1e-4  # mm
+MAX_PENDING_PER_WORKER = 2  # chunks in flight per worker process
+MAX_LISTED = 20  # mismatches and errors kept in the summary, the report has all of them
+
+FOOTPRINT_NAME_PATTERN = re.compile(r"dp_strafe_(?P<direction>left|right)_w(?P<trace_width>[^_]+)_g(?P<trace_gap>[^_]+)"
+                                    r"_offs(?P<offset>[^_]+)mm(?P<variant>_rs(?P<radius_scale>[^_]+)_a(?P<middle_tangent_angle>[^_]+))?"
+                                    r"(?:_rot(?P<rotation>[^_]+))?(?P<mirrored>_mirrored)?")
+NAME_NUMBERS = ("trace_width", "trace_gap", "offset", "radius_scale", "middle_tangent_angle", "rotation")
+CHECK_STATUSES = ("match", "mismatch", "skipped", "error")
+REPORT_COLUMNS = ("file", "footprint_name", "status", "parameters_from", "max_deviation", "differences")
+
+PAD_FIELDS = ("pos_x", "pos_y", "size_x", "size_y")
+PRIMITIVE_FIELDS = {
+    "gr_arc": ("start_x", "start_y", "mid_x", "mid_y", "end_x", "end_y", "width"),
+    "gr_line": ("start_x", "start_y", "end_x", "end_y", "width"),
+}
+
+
+def pad_from_node(node):
+    # Pad node -> dict with the keys of Strafe.generate_footprint_parameters pads
+    _, number, _, shape, *_ = node
+    at = child(node, "at")
+    size = child(node, "size")
+    pad = {
+        "number": str(number),
+        "shape": shape,
+        "pos_x": float(at[1]),
+        "pos_y": float(at[2]),
+        "size_x": float(size[1]),
+        "size_y": float(size[2]),
+    }
+    die_length = child(node, "die_length")
+    if die_length is not None:
+        pad["die_length"] = float(die_length[1])
+
+    primitives = child(node, "primitives")
+    if primitives is not None:
+        pad["primitives"] = list()
+        for primitive in primitives[1:]:
+            if not isinstance(primitive, list) or primitive[0] not in PRIMITIVE_FIELDS:
+                continue
+            values = {"type": primitive[0]}
+            for point in ("start", "mid", "end"):
+                item = child(primitive, point)
+                if item is not None:
+                    values[f"{point}_x"], values[f"{point}_y"] = float(item[1]), float(item[2])
+            width = child(primitive, "width") or child(child(primitive, "stroke", []), "width")
+            if width is not None:
+                values["width"] = float(width[1])
+            pad["primitives"].append(values)
+    return pad
+
+
+def read_footprint(path: str):
+    """
+    Stream a .kicad_mod file and pull out its name and pads
+
+    Args:
+        path (str): Footprint file
+
+    Returns:
+        dict: "footprint_name" and "pads", the pads in file order as dicts of floats
+    """
+
+    with open(path, encoding="utf-8") as f:
+        tokens = tokenize(f)
+        if next(tokens, None) is not OPEN or next(tokens, None) != "footprint":
+            raise ValueError("not a footprint file")
+        footprint_name = next(tokens)
+        pads = [pad_from_node(node) for node in iter_nodes(tokens, {"pad"}, depth=1)]
+    return {"footprint_name": str(footprint_name), "pads": pads}
+
+
+def parse_footprint_name(footprint_name: str):
+    # Strafe parameters named in a footprint name, None if it is not a Strafe name.
+    # The radius ratio and tangent angle are None unless the name carries them. The
+    # rotation (degrees, 0 if not named) and mirrored come from the transform suffix,
+    # which name_suffix leaves out: rotated_variants adds it back
+    match = FOOTPRINT_NAME_PATTERN.fullmatch(footprint_name)
+    if match is None:
+        return None
+    try:
+        parameters = {name: float(match[name]) if match[name] is not None else None for name in NAME_NUMBERS}
+    except ValueError:
+        return None
+    if match["direction"] == "left":
+        parameters["offset"] = -parameters["offset"]
+    parameters["rotation"] = parameters["rotation"] or 0.0
+    parameters["mirrored"] = match["mirrored"] is not None
+    parameters["name_suffix"] = match["variant"] or ""
+    return parameters
+
+
+def grid_lookup(grid):
+    # (width, gap, offset) -> [(radius ratio, tangent angle), ...] of a parameter grid
+    lookup = dict()
+    for trace_width, trace_gap, offset, radius_scale, middle_tangent_angle in expand_grid(grid):
+        key = (round(trace_width, 9), round(trace_gap, 9), round(offset, 9))
+        lookup.setdefault(key, list()).append((radius_scale, middle_tangent_angle))
+    return lookup
+
+
+def circle_through(ax: float, ay: float, bx: float, by: float, cx: float, cy: float):
+    # Centre and radius of the circle through three points
+    d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if d == 0:
+        raise ValueError("arc points are collinear")
+    a2, b2, c2 = ax * ax + ay * ay, bx * bx + by * by, cx * cx + cy * cy
+    center_x = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    center_y = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return center_x, center_y, math.hypot(ax - center_x, ay - center_y)
+
+
+def infer_bend(pads, trace_width: float, trace_gap: float, offset: float):
+    # Radius ratio and tangent angle from the first bend of the minus trace. Its
+    # radius is the small one for a strafe to the left and the big one to the right,
+    # and it turns through the tangent angle.
+    custom = [pad for pad in pads if pad["shape"] == "custom" and pad.get("primitives")]
+    if not custom or custom[0]["primitives"][0]["type"] != "gr_arc":
+        raise ValueError("no trace bend to recover the radius ratio and tangent angle from")
+    arc = custom[0]["primitives"][0]
+    center_x, center_y, radius = circle_through(arc["start_x"], arc["start_y"], arc["mid_x"], arc["mid_y"],
+                                                arc["end_x"], arc["end_y"])
+    small_radius = radius - (trace_width + trace_gap) if offset > 0 else radius
+    start_angle = math.atan2(arc["start_y"] - center_y, arc["start_x"] - center_x)
+    end_angle = math.atan2(arc["end_y"] - center_y, arc["end_x"] - center_x)
+    return small_radius / math.fabs(offset), math.fabs(math.remainder(end_angle - start_angle, 2 * math.pi))
+
+
+def diff_pads(pads, expected_pads, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    Compare parsed pads against generated ones
+
+    Args:
+        pads (list): Pads as read by read_footprint
+        expected_pads (list): Pads of Strafe.generate_footprint_parameters
+        tolerance (float, optional): Largest accepted coordinate or length difference (mm)
+
+    Returns:
+        tuple: (differences as readable strings, largest deviation found in mm)
+    """
+
+    differences = list()
+    deviation = 0.0
+
+    def compare(label, value, expected):
+        nonlocal deviation
+        error = math.fabs(value - expected)
+        deviation = max(deviation, error)
+        if not error <= tolerance:
+            differences.append(f"{label}: {value:.6f} != {expected:.6f}")
+
+    if len(pads) != len(expected_pads):
+        differences.append(f"{len(pads)} pads != {len(expected_pads)}")
+    for i, (pad, expected) in enumerate(zip(pads, expected_pads)):
+        label = f"pad {i} ({expected['number']} {expected['shape']})"
+        if (pad["number"], pad["shape"]) != (expected["number"], expected["shape"]):
+            differences.append(f"{label}: is pad {pad['number']} {pad['shape']}")
+            continue
+        for field in PAD_FIELDS:
+            compare(f"{label} {field}", pad[field], expected[field])
+        if expected.get("die_length"):
+            if "die_length" in pad:
+                compare(f"{label} die_length", pad["die_length"], expected["die_length"])
+            else:
+                differences.append(f"{label}: die_length missing")
+
+        primitives, expected_primitives = pad.get("primitives", []), expected.get("primitives", [])
+        if len(primitives) != len(expected_primitives):
+            differences.append(f"{label}: {len(primitives)} primitives != {len(expected_primitives)}")
+        for j, (primitive, expected_primitive) in enumerate(zip(primitives, expected_primitives)):
+            kind = expected_primitive["type"]
+            if primitive["type"] != kind:
+                differences.append(f"{label} primitive {j}: {primitive['type']} != {kind}")
+                continue
+            for field in PRIMITIVE_FIELDS[kind]:
+                if field not in primitive:
+                    differences.append(f"{label} primitive {j} ({kind}): {field} missing")
+                else:
+                    compare(f"{label} primitive {j} ({kind}) {field}", primitive[field], expected_primitive[field])
+
+    return differences, deviation
+
+
+def check_footprint(path: str, tolerance: float = DEFAULT_TOLERANCE, lookup: dict = None):
+    """
+    Check one footprint file against a regenerated Strafe
+
+    Args:
+        path (str): Footprint file
+        tolerance (float, optional): Largest accepted difference (mm)
+        lookup (dict, optional): Grid lookup from grid_lookup, for names without radius ratio and tangent angle
+
+    Returns:
+        tuple: (file, footprint name, status, parameters source, largest deviation, differences), status one of CHECK_STATUSES
+    """
+
+    footprint_name = ""
+    try:
+        footprint = read_footprint(path)
+        footprint_name = footprint["footprint_name"]
+        named = parse_footprint_name(footprint_name)
+        if named is None:
+            return path, footprint_name, "skipped", "", 0.0, ["not a Strafe footprint"]
+
+        trace_width, trace_gap, offset = named["trace_width"], named["trace_gap"], named["offset"]
+        source = "name"
+        radius_scale, middle_tangent_angle = named["radius_scale"], named["middle_tangent_angle"]
+        if radius_scale is None:
+            variants = lookup.get((round(trace_width, 9), round(trace_gap, 9), round(offset, 9)), ()) if lookup else ()
+            if len(variants) == 1:
+                source = "grid"
+                radius_scale, middle_tangent_angle = variants[0]
+            else:
+                source = "geometry"
+                radius_scale, middle_tangent_angle = infer_bend(footprint["pads"], trace_width, trace_gap, offset)
+
+        # The start pads sit half a centre spacing either side of the start point, in any rotation, y mirrored
+        start = Point(0, 0)
+        custom = [pad for pad in footprint["pads"] if pad["shape"] == "custom"]
+        if len(custom) == 2:
+            start = Point((custom[0]["pos_x"] + custom[1]["pos_x"]) / 2, -(custom[0]["pos_y"] + custom[1]["pos_y"]) / 2)
+        elif custom:
+            start = Point(custom[0]["pos_x"] + (trace_width + trace_gap) / 2, -custom[0]["pos_y"])
+
+        strafe = Strafe(start, trace_width, trace_gap, offset, radius_scale, middle_tangent_angle,
+                        name_suffix=named["name_suffix"])
+        if named["rotation"] or named["mirrored"]:
+            strafe = rotated_variants(strafe, (named["rotation"],), named["mirrored"])[0]
+        expected = strafe.generate_footprint_parameters(deterministic_uuids=True)
+        differences, deviation = diff_pads(footprint["pads"], expected["pads"], tolerance)
+        return path, footprint_name, "mismatch" if differences else "match", source, deviation, differences
+    except (ValueError, ArithmeticError, IndexError, TypeError, StopIteration, UnicodeDecodeError) as e:
+        return path, footprint_name, "error", "", 0.0, [f"{type(e).__name__}: {e}"]
+
+
+_worker_lookup = None
+
+
+def _init_worker(lookup):
+    # The grid lookup is sent once per worker process rather than with every chunk
+    global _worker_lookup
+    _worker_lookup = lookup
+
+
+def _check_chunk(job):
+    paths, tolerance = job
+    return [check_footprint(path, tolerance, _worker_lookup) for path in paths]
+
+
+def iter_footprint_files(library_dir: str):
+    # .kicad_mod files of a library directory, listed lazily
+    with os.scandir(library_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".kicad_mod") and entry.is_file():
+                yield entry.path
+
+
+def iter_chunks(iterable, size: int):
+    chunk = list()
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+
+def scan_library(library_dir: str, grid=None, tolerance: float = DEFAULT_TOLERANCE, workers: int = None,
+                 chunksize: int = 64, report_path: str = None):
+    """
+    Check every footprint of a .pretty directory against regenerated output, in parallel
+
+    Args:
+        library_dir (str): Library directory
+        grid (list, optional): Grid entries from library.load_grid, to find radius ratio and tangent angle
+                               of footprints whose names do not carry them
+        tolerance (float, optional): Largest accepted difference (mm)
+        workers (int, optional): Worker processes, defaults to the CPU count
+        chunksize (int, optional): Files handed to a worker at a time
+        report_path (str, optional): Per-file report (CSV), written as results arrive
+
+    Returns:
+        dict: Counts per status, the first MAX_LISTED mismatches and errors, largest deviation, elapsed time and throughput
+    """
+
+    workers = workers or os.cpu_count()
+    lookup = grid_lookup(grid) if grid else None
+    counts = dict.fromkeys(CHECK_STATUSES, 0)
+    listed = list()
+    max_deviation = 0.0
+
+    report_file = open(report_path, "w", newline="", encoding="utf-8") if report_path else None
+    writer = csv.writer(report_file) if report_file else None
+    if writer:
+        writer.writerow(REPORT_COLUMNS)
+
+    def collect(results):
+        nonlocal max_deviation
+        for path, footprint_name, status, source, deviation, differences in results:
+            counts[status] += 1
+            if status in ("match", "mismatch"):
+                max_deviation = max(max_deviation, deviation)
+            if status in ("mismatch", "error") and len(listed) < MAX_LISTED:
+                listed.append((path, status, differences))
+            if writer:
+                writer.writerow((path, footprint_name, status, source, f"{deviation:.3e}", "; ".join(differences)))
+
+    start_time = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lookup,)) as executor:
+            pending = set()
+            for chunk in iter_chunks(iter_footprint_files(library_dir), chunksize):
+                if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future.result())
+                pending.add(executor.submit(_check_chunk, (chunk, tolerance)))
+            for future in pending:
+                collect(future.result())
+    finally:
+        if report_file:
+            report_file.close()
+    elapsed = time.perf_counter() - start_time
+
+    checked = sum(counts.values())
+    return {
+        "counts": counts,
+        "listed": listed,
+        "max_deviation": max_deviation,
+        "elapsed": elapsed,
+        "throughput": checked / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check the Strafe footprints of a library against regenerated output")
+    parser.add_argument("library", help="Footprint library (.pretty directory)")
+    parser.add_argument("--grid", default=None,
+                        help="Parameter grid the library was built from, for names without radius ratio and tangent angle")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Largest accepted difference (mm)")
+    parser.add_argument("--report", default=None, help="Per-file report (CSV)")
+    args = parser.parse_args()
+
+    summary = scan_library(args.library, load_grid(args.grid) if args.grid else None, args.tolerance,
+                           workers=args.jobs, report_path=args.report)
+
+    for path, status, differences in summary["listed"]:
+        print(f"{status}: {path}")
+        for difference in differences[:5]:
+            print(f"    {difference}")
+        if len(differences) > 5:
+            print(f"    ... {len(differences) - 5} more")
+    counts = summary["counts"]
+    print(f"Checked {sum(counts.values())} files in {summary['elapsed']:.2f} s ({summary['throughput']:.0f} files/s): "
+          + ", ".join(f"{counts[status]} {status}" for status in CHECK_STATUSES)
+          + f", largest deviation {summary['max_deviation']:.3e} mm")
+    if args.report:
+        print(f"Report written to {args.report}")
+    exit(1 if counts["mismatch"] or counts["error"] else 0)
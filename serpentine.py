@@ -0,0 +1,185 @@
+import math
+
+from primitives import Point, Line, Arc
+from profiling import traced
+from strafe import DiffPairFootprint
+
+# Serpentine (meander) for length matching a differential pair.
+#
+# The pair runs along +y and bulges to one side in identical bumps. Every bump is
+# made of bends of centre-line radius R = radius + (trace_width + trace_gap) / 2,
+# with straight legs of length L tilted by the bend angle a from the direction of travel:
+#   turn a, leg, turn -a, turn -a, leg, turn a      (turns to the side of the bumps first)
+# Both traces share the bend centres, so the gap stays constant. Each trace turns
+# as far left as right, and every leg has the same length on both traces, so the
+# pair stays skew free and leaves in line with where it entered.
+#
+# With A the amplitude (sideways excursion of the centre line) and h half the pitch:
+#   A = 2R (1 - cos a) + L sin a
+#   h = 2R sin a + L cos a
+# which inverts with u = A - 2R to
+#   L = sqrt(u² + h² - 4R²)
+#   a = π/2 - atan2(h, u) + atan2(2R, L)
+# A bump is 4 R a + 2 L long, and adds that minus the pitch to the trace length.
+
+# Slack on the bend angle limit of π/2, where the legs run straight across
+ANGLE_TOLERANCE = 1e-12
+
+
+def bump_shape(amplitude: float, pitch: float, center_radius: float):
+    # Bend angle and leg length of one bump, see above
+    u = math.fabs(amplitude) - 2 * center_radius
+    h = pitch / 2
+    squared = u * u + h * h - 4 * center_radius * center_radius
+    if squared < 0:
+        raise ValueError("pitch and amplitude are too small for the bend radius")
+    line_length = math.sqrt(squared)
+    bend_angle = math.pi / 2 - math.atan2(h, u) + math.atan2(2 * center_radius, line_length)
+    if not 0 < bend_angle <= math.pi / 2 + ANGLE_TOLERANCE:
+        raise ValueError("pitch is too short for the amplitude and bend radius, the legs would run backwards")
+    return min(bend_angle, math.pi / 2), line_length
+
+
+# Serpentine class for generating a curved diffpair length-matching meander.
+# Parameters:
+# - start: Starting point of the trace (x: float, y: float)
+# - trace_width: Width of the trace (mm: float)
+# - trace_gap: Gap between traces (mm: float)
+# - amplitude: Sideways excursion of the pair centre line, positive bumps to the right (mm: float)
+# - pitch: Length of one bump along the direction of travel (mm: float)
+# - bumps: Number of bumps (int)
+# - radius: Bend radius of the inner trace (mm: float)
+# - name_suffix: Appended to the footprint name, to tell apart variants (str)
+
+class Serpentine(DiffPairFootprint):
+    def __init__(self, start: Point, trace_width: float, trace_gap: float, amplitude: float, pitch: float, bumps: int, radius: float, name_suffix: str = ""):
+        if amplitude == 0:
+            raise ValueError("amplitude must be non-zero")
+        if pitch <= 0:
+            raise ValueError("pitch must be positive")
+        if bumps < 1:
+            raise ValueError("a serpentine needs at least one bump")
+        if radius <= 0:
+            raise ValueError("bend radius must be positive")
+
+        self.start = start
+        self.trace_width = trace_width
+        self.trace_gap = trace_gap
+        self.amplitude = amplitude
+        self.pitch = pitch
+        self.bumps = int(bumps)
+        self.radius = radius
+        self.name_suffix = name_suffix
+
+        self.minus_primitives = list()
+        self.plus_primitives = list()
+
+        self.side_dir = self.amplitude >= 0
+
+        self.plus_trace_length = 0.0
+        self.minus_trace_length = 0.0
+
+        self.calculate_trace()
+        self.calculate_trace_length()
+
+    @traced("calculate_trace")
+    def calculate_trace(self):
+        half_center_width = (self.trace_width + self.trace_gap) / 2
+        center_radius = self.radius + half_center_width
+        self.bend_angle, self.line_length = bump_shape(self.amplitude, self.pitch, center_radius)
+
+        self.minus_start_point = Point(self.start.x - half_center_width, self.start.y)
+        self.plus_start_point = Point(self.start.x + half_center_width, self.start.y)
+
+        # Walk the centre line. heading is measured from +y, positive to the right (clockwise);
+        # a turn is positive to the right. None is a leg.
+        side = 1.0 if self.side_dir else -1.0
+        turns = (side * self.bend_angle, None, -side * self.bend_angle, -side * self.bend_angle, None, side * self.bend_angle)
+        x, y, heading = self.start.x, self.start.y, 0.0
+
+        for _ in range(self.bumps):
+            for turn in turns:
+                # Unit normal to the right of the direction of travel, the plus trace side
+                normal_x, normal_y = math.cos(heading), -math.sin(heading)
+
+                if turn is None:
+                    dx, dy = self.line_length * math.sin(heading), self.line_length * math.cos(heading)
+                    for primitives, offset in ((self.minus_primitives, -half_center_width), (self.plus_primitives, half_center_width)):
+                        start = Point(x + offset * normal_x, y + offset * normal_y)
+                        primitives.append(Line(start, Point(start.x + dx, start.y + dy), self.trace_width))
+                    x, y = x + dx, y + dy
+                    continue
+
+                # The bend centre lies on the side the pair turns to, whose trace gets the small radius
+                direction = 1.0 if turn > 0 else -1.0
+                center_x, center_y = x + direction * center_radius * normal_x, y + direction * center_radius * normal_y
+                start_angle = math.atan2(y - center_y, x - center_x)
+                end_angle = start_angle - turn
+
+                self.minus_primitives.append(Arc(Point(center_x, center_y), center_radius + direction * half_center_width,
+                                                 start_angle, end_angle, self.trace_width))
+                self.plus_primitives.append(Arc(Point(center_x, center_y), center_radius - direction * half_center_width,
+                                                start_angle, end_angle, self.trace_width))
+
+                x, y = center_x + center_radius * math.cos(end_angle), center_y + center_radius * math.sin(end_angle)
+                heading += turn
+
+        normal_x, normal_y = math.cos(heading), -math.sin(heading)
+        self.minus_end_point = Point(x - half_center_width * normal_x, y - half_center_width * normal_y)
+        self.plus_end_point = Point(x + half_center_width * normal_x, y + half_center_width * normal_y)
+
+    def get_extra_length(self):
+        # Trace length added over running the pair straight
+        return self.plus_trace_length - self.bumps * self.pitch
+
+    def get_general_direction(self):
+        direction = "left"
+        if self.side_dir:
+            direction = "right"
+
+        return direction
+
+    def generate_footprint_name(self):
+        return (f"dp_serpentine_{self.get_general_direction()}_w{self.trace_width}_g{self.trace_gap}"
+                f"_amp{round(math.fabs(self.amplitude), 4)}mm_p{round(self.pitch, 4)}mm_n{self.bumps}{self.name_suffix}")
+
+    def generate_footprint_description(self):
+        return (f"differential pair serpentine to the {self.get_general_direction()}, trace width: {self.trace_width} mm "
+                f"trace gap {self.trace_gap} mm amplitude {round(math.fabs(self.amplitude), 4)} mm pitch {round(self.pitch, 4)} mm "
+                f"{self.bumps} bumps, extra length {round(self.get_extra_length(), 4)} mm")
+
+
+if __name__ == "__main__":
+
+    import sys
+    # Get command line arguments.
+    # Coordinate X, Coordinate Y, trace width, trace gap, amplitude, pitch, bumps, radius --preview --generate --backend <template|sexpr> --deterministic-uuids
+    if len(sys.argv) < 9:
+        print("Usage: serpentine.py <coord_x> <coord_y> <trace_width> <trace_gap> <amplitude> <pitch> <bumps> <radius> --preview --generate --backend <template|sexpr> --deterministic-uuids")
+        sys.exit(1)
+
+    coord_x = float(sys.argv[1])
+    coord_y = float(sys.argv[2])
+    trace_width = float(sys.argv[3])
+    trace_gap = float(sys.argv[4])
+    amplitude = float(sys.argv[5])
+    pitch = float(sys.argv[6])
+    bumps = int(sys.argv[7])
+    radius = float(sys.argv[8])
+    preview = "--preview" in sys.argv
+    generate = "--generate" in sys.argv
+    deterministic_uuids = "--deterministic-uuids" in sys.argv
+    backend = "template"
+    if "--backend" in sys.argv:
+        backend = sys.argv[sys.argv.index("--backend") + 1]
+
+    serpentine = Serpentine(Point(coord_x, coord_y), trace_width, trace_gap, amplitude, pitch, bumps, radius)
+    print(f"Extra length: {serpentine.get_extra_length():.6f} mm, skew: {serpentine.plus_trace_length - serpentine.minus_trace_length:.3e} mm")
+
+    if generate:
+        serpentine.generate_footprint_file(backend=backend, deterministic_uuids=deterministic_uuids)
+
+    if preview:
+        serpentine.visualize()
+
+    exit(0)
@@ -0,0 +1,278 @@
+import math
+import time
+
+import numpy as np
+
+from serpentine import ANGLE_TOLERANCE
+
+# Target-length solver for serpentines: picks amplitude, pitch and bump count so that
+# the pair gains a requested extra length, using the closed-form bump geometry of
+# serpentine.py vectorized over queries and bump counts.
+#
+# The solver keeps the pitch at least 4R (R the centre-line bend radius), where the
+# legs run straight across; any positive amplitude is then feasible. With either the
+# amplitude or the pitch fixed, the other one and the extra length follow from the
+# bend angle in closed form, and the extra length grows with the angle, so the angle
+# is found by Newton's method, safeguarded by bisection. The result is checked against bump_extra_length.
+#
+# The bend radius is the larger of min_radius and the radius that keeps the legs of
+# a bump min_spacing apart (2 radius - trace_width >= min_spacing).
+
+SERPENTINE_OBJECTIVES = ("span", "amplitude")
+
+MAX_BUMPS = 64
+NEWTON_STEPS = 12
+DEFAULT_TOLERANCE = 1e-4  # mm
+CHUNK_SIZE = 2048
+
+
+def bump_geometry(amplitude, pitch, center_radius):
+    # Vectorized serpentine.bump_shape: bend angle, leg length and feasibility
+    u = np.fabs(amplitude) - 2 * center_radius
+    h = pitch / 2
+    squared = u * u + h * h - 4 * center_radius * center_radius
+    line_length = np.sqrt(np.maximum(squared, 0.0))
+    bend_angle = math.pi / 2 - np.arctan2(h, u) + np.arctan2(2 * center_radius, line_length)
+    feasible = (squared >= 0) & (bend_angle > 0) & (bend_angle <= math.pi / 2 + ANGLE_TOLERANCE)
+    return np.minimum(bend_angle, math.pi / 2), line_length, feasible
+
+
+def bump_extra_length(amplitude, pitch, center_radius):
+    # Trace length one bump adds over its pitch, NaN where the bump is not feasible
+    bend_angle, line_length, feasible = bump_geometry(amplitude, pitch, center_radius)
+    return np.where(feasible, 4 * center_radius * bend_angle + 2 * line_length - pitch, np.nan)
+
+
+class SerpentineSolution:
+    """Solver results, one row per query. Rows that are not feasible hold NaN (bumps 0)."""
+
+    def __init__(self, n: int):
+        self.feasible = np.zeros(n, dtype=bool)
+        self.amplitude = np.full(n, np.nan)
+        self.pitch = np.full(n, np.nan)
+        self.bumps = np.zeros(n, dtype=int)
+        self.bends = np.zeros(n, dtype=int)
+        self.radius = np.full(n, np.nan)
+        self.span = np.full(n, np.nan)
+        self.extra_length = np.full(n, np.nan)
+
+
+def _find_root(function, low, high):
+    # Vectorized safeguarded Newton for the root of an increasing function on [low, high].
+    # function(x) returns (value, derivative); steps leaving the bracket fall back to bisection.
+    # Starting from the top of the bracket, Newton steps on the convex extra length curves
+    # approach the root from above without overshooting.
+    x = high
+    for _ in range(NEWTON_STEPS):
+        value, derivative = function(x)
+        above = value > 0
+        high = np.where(above, x, high)
+        low = np.where(above, low, x)
+        step = x - value / derivative
+        x = np.where((step >= low) & (step <= high), step, (low + high) / 2)
+    return x
+
+
+def _extra_at_amplitude(angle, amplitude, center_radius):
+    # Extra length of a bump with the given amplitude and bend angle, its derivative
+    # by the angle, and the pitch
+    sin, cos = np.sin(angle), np.cos(angle)
+    reach = amplitude - 2 * center_radius
+    line_length = (reach + 2 * center_radius * cos) / sin
+    line_derivative = -(2 * center_radius + reach * cos) / (sin * sin)
+    extra = 4 * center_radius * angle + 2 * line_length * (1 - cos) - 4 * center_radius * sin
+    derivative = 4 * center_radius * (1 - cos) + 2 * line_derivative * (1 - cos) + 2 * line_length * sin
+    return extra, derivative, 2 * (2 * center_radius * sin + line_length * cos)
+
+
+def _extra_at_pitch(angle, pitch, center_radius):
+    # Extra length of a bump with the given pitch and bend angle, its derivative
+    # by the angle, and the amplitude
+    sin, cos = np.sin(angle), np.cos(angle)
+    line_length = (pitch / 2 - 2 * center_radius * sin) / cos
+    line_derivative = (pitch / 2 * sin - 2 * center_radius) / (cos * cos)
+    extra = 4 * center_radius * angle + 2 * line_length - pitch
+    derivative = 4 * center_radius + 2 * line_derivative
+    return extra, derivative, 2 * center_radius * (1 - cos) + line_length * sin
+
+
+def _solve_chunk(extra_length, max_amplitude, max_span, center_radius, objective, max_bumps):
+    # Every query (rows) against every bump count (columns). Both objectives search the
+    # bend angle, along which the extra length of a bump grows monotonically.
+    bumps = np.arange(1, max(1, min(max_bumps, int(np.max(max_span / (4 * center_radius))))) + 1)
+    per_bump = extra_length[:, None] / bumps[None, :]
+    radius = center_radius[:, None]
+    max_pitch = max_span[:, None] / bumps[None, :]
+    amplitude_limit = max_amplitude[:, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if objective == "span":
+            # Full amplitude, steepest bend angle that keeps the pitch at 4R or more
+            upper = np.broadcast_to(math.pi / 2 - 2 * np.arctan(np.maximum(2 * radius - amplitude_limit, 0) / (2 * radius)),
+                                    per_bump.shape)
+            feasible = _extra_at_amplitude(upper, amplitude_limit, radius)[0] >= per_bump
+
+            def function(a):
+                extra, derivative, _ = _extra_at_amplitude(a, amplitude_limit, radius)
+                return extra - per_bump, derivative
+
+            angle = _find_root(function, np.zeros_like(per_bump), upper)
+            pitch = _extra_at_amplitude(angle, amplitude_limit, radius)[2]
+            amplitude = np.broadcast_to(amplitude_limit, per_bump.shape)
+            feasible &= pitch <= max_pitch * (1 + 1e-12)
+            cost = bumps[None, :] * pitch
+        else:
+            # Full span, shallowest bend angle that reaches the extra length. The amplitude
+            # grows with the angle, so the angle at full amplitude bounds the search.
+            upper, _, feasible = bump_geometry(amplitude_limit, max_pitch, radius)
+            feasible &= (max_pitch >= 4 * radius) & (_extra_at_pitch(upper, max_pitch, radius)[0] >= per_bump)
+
+            def function(a):
+                extra, derivative, _ = _extra_at_pitch(a, max_pitch, radius)
+                return extra - per_bump, derivative
+
+            angle = _find_root(function, np.zeros_like(per_bump), np.where(feasible, upper, math.pi / 4))
+            amplitude = _extra_at_pitch(angle, max_pitch, radius)[2]
+            pitch = np.broadcast_to(max_pitch, per_bump.shape)
+            cost = amplitude.copy()
+
+    cost[~feasible] = np.inf
+    best = np.argmin(cost, axis=1)
+    rows = np.arange(len(extra_length))
+    return feasible[rows, best], amplitude[rows, best], pitch[rows, best], bumps[best]
+
+
+def solve_serpentine(trace_width, trace_gap, extra_length, max_amplitude, max_span, min_radius=0.0, min_spacing=None,
+                     objective: str = "span", max_bumps: int = MAX_BUMPS, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    Find serpentine amplitude, pitch and bump count for arrays of length-matching queries
+
+    Args:
+        trace_width, trace_gap: Pair geometry per query (mm), broadcast together with the rest
+        extra_length: Trace length to add (mm)
+        max_amplitude: Largest sideways excursion of the pair centre line (mm)
+        max_span: Longest serpentine along the direction of travel (mm)
+        min_radius: Minimum bend radius of the inner trace (mm)
+        min_spacing: Minimum distance between neighbouring legs of the pair (mm), twice the trace gap by default
+        objective (str): "span" for the shortest serpentine at full amplitude,
+                         "amplitude" for the smallest amplitude over the full span
+        max_bumps (int): Largest bump count tried
+        tolerance (float): Allowed deviation from the requested extra length (mm)
+
+    Returns:
+        SerpentineSolution: Chosen amplitude, pitch, bump and bend counts, bend radius and achieved extra length
+    """
+
+    if objective not in SERPENTINE_OBJECTIVES:
+        raise ValueError(f"unknown objective '{objective}', expected one of {', '.join(SERPENTINE_OBJECTIVES)}")
+
+    if min_spacing is None:
+        min_spacing = 2 * np.asarray(trace_gap, dtype=float)
+    trace_width, trace_gap, extra_length, max_amplitude, max_span, min_radius, min_spacing = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in
+          (trace_width, trace_gap, extra_length, max_amplitude, max_span, min_radius, min_spacing)))
+
+    radius = np.maximum(min_radius, (trace_width + min_spacing) / 2)
+    center_radius = radius + (trace_width + trace_gap) / 2
+    n = len(extra_length)
+    solution = SerpentineSolution(n)
+    for start in range(0, n, CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        found, amplitude, pitch, count = _solve_chunk(extra_length[chunk], max_amplitude[chunk], max_span[chunk],
+                                                      center_radius[chunk], objective, max_bumps)
+
+        achieved = count * bump_extra_length(amplitude, pitch, center_radius[chunk])
+        with np.errstate(invalid='ignore'):
+            found &= np.fabs(achieved - extra_length[chunk]) <= tolerance
+
+        solution.feasible[chunk] = found
+        solution.amplitude[chunk] = np.where(found, amplitude, np.nan)
+        solution.pitch[chunk] = np.where(found, pitch, np.nan)
+        solution.bumps[chunk] = np.where(found, count, 0)
+        solution.bends[chunk] = np.where(found, 2 * count + 1, 0)
+        solution.radius[chunk] = np.where(found, radius[chunk], np.nan)
+        solution.span[chunk] = np.where(found, count * pitch, np.nan)
+        solution.extra_length[chunk] = np.where(found, achieved, np.nan)
+
+    return solution
+
+
+def trial_search(trace_width: float, trace_gap: float, extra_length: float, max_amplitude: float, max_span: float,
+                 radius: float, steps: int = 20):
+    # What the solver replaces: construct Serpentine objects over a grid and keep the closest one
+    from primitives import Point
+    from serpentine import Serpentine
+
+    best = None
+    for bumps in range(1, 9):
+        for amplitude in np.linspace(max_amplitude / steps, max_amplitude, steps):
+            for pitch in np.linspace(max_span / bumps / steps, max_span / bumps, steps):
+                try:
+                    serpentine = Serpentine(Point(0, 0), trace_width, trace_gap, float(amplitude), float(pitch), bumps, radius)
+                except ValueError:
+                    continue
+                error = math.fabs(serpentine.get_extra_length() - extra_length)
+                if best is None or error < best[0]:
+                    best = (error, amplitude, pitch, bumps)
+    return best
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit serpentine amplitude, pitch and bump count to a target extra length")
+    parser.add_argument("--width", type=float, default=0.2, help="Trace width (mm)")
+    parser.add_argument("--gap", type=float, default=0.2, help="Trace gap (mm)")
+    parser.add_argument("--extra", type=float, default=5.0, help="Extra trace length to add (mm)")
+    parser.add_argument("--max-amplitude", type=float, default=2.0, help="Maximum sideways excursion (mm)")
+    parser.add_argument("--max-span", type=float, default=10.0, help="Maximum length along the direction of travel (mm)")
+    parser.add_argument("--min-radius", type=float, default=0.0, help="Minimum inner bend radius (mm)")
+    parser.add_argument("--min-spacing", type=float, default=None, help="Minimum spacing between legs (mm), default 2x gap")
+    parser.add_argument("--objective", choices=SERPENTINE_OBJECTIVES, default="span")
+    parser.add_argument("--left", action="store_true", help="Bump to the left instead of the right")
+    parser.add_argument("--generate", action="store_true", help="Generate the footprint for the solution")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N random queries against trial construction")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        n = args.benchmark
+        queries = (rng.uniform(0.1, 0.3, n), rng.uniform(0.1, 0.3, n), rng.uniform(0.2, 20, n),
+                   rng.uniform(1, 4, n), rng.uniform(5, 30, n))
+
+        start_time = time.perf_counter()
+        solution = solve_serpentine(*queries, objective=args.objective)
+        elapsed = time.perf_counter() - start_time
+        print(f"Solver: {n} queries in {elapsed:.3f} s ({elapsed / n * 1e6:.1f} us/query), {solution.feasible.sum()} feasible")
+
+        trials = min(n, 5)
+        start_time = time.perf_counter()
+        for i in range(trials):
+            trial_search(*(float(column[i]) for column in queries), radius=float(queries[0][i] + 2 * queries[1][i]) / 2)
+        trial_elapsed = (time.perf_counter() - start_time) / trials
+        print(f"Trial construction (8x20x20 grid): {trial_elapsed * 1e6:.0f} us/query, solver is {trial_elapsed / (elapsed / n):.0f}x faster")
+        exit(0)
+
+    solution = solve_serpentine(args.width, args.gap, args.extra, args.max_amplitude, args.max_span, args.min_radius,
+                                args.min_spacing, args.objective)
+    if not solution.feasible[0]:
+        print("No feasible serpentine for these constraints")
+        exit(1)
+
+    from primitives import Point
+    from serpentine import Serpentine
+
+    amplitude = -solution.amplitude[0] if args.left else solution.amplitude[0]
+    serpentine = Serpentine(Point(0, 0), args.width, args.gap, float(amplitude), float(solution.pitch[0]),
+                            int(solution.bumps[0]), float(solution.radius[0]))
+
+    print(f"amplitude: {solution.amplitude[0]:.6f} mm")
+    print(f"pitch: {solution.pitch[0]:.6f} mm")
+    print(f"bumps: {solution.bumps[0]} ({solution.bends[0]} bends)")
+    print(f"inner bend radius: {solution.radius[0]:.4f} mm")
+    print(f"span: {solution.span[0]:.4f} mm")
+    print(f"extra length: {solution.extra_length[0]:.6f} mm (Serpentine: {serpentine.get_extra_length():.6f} mm)")
+
+    if args.generate:
+        serpentine.generate_footprint_file()
@@ -0,0 +1,354 @@
+import functools
+import json
+import os
+import pickle
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from memo import GeometryMemo
+from primitives import Point
+from render import RENDER_BACKENDS, render_footprint
+from strafe import Strafe
+
+# Long-running footprint generator, so that callers pay interpreter startup,
+# imports and template compilation once instead of per footprint.
+#
+# The protocol is JSON Lines: one request object per line, one response per line.
+#   {"id": 1, "trace_width": 0.2, "trace_gap": 0.2, "offset": 4, "radius_scale": 0.2,
+#    "middle_tangent_angle": 1.5708, "backend": "sexpr", "output_path": "out.kicad_mod"}
+#   -> {"id": 1, "ok": true, "footprint_name": "...", "content": "...", "path": "out.kicad_mod", ...}
+# Optional request fields: start_x, start_y, name_suffix, backend, deterministic_uuids,
+# output_path (write the footprint there) and content (false to leave the text out of the
+# response). {"op": "ping"} and {"op": "stats"} are answered too. Failed requests get
+# {"id": ..., "ok": false, "error": "..."}.
+#
+# Geometry comes from a memo.GeometryMemo, so parameters are quantized to the 1 nm grid
+# and repeated requests share one Strafe, also across servers with --geometry-store.
+#
+# Requests are handled concurrently, so responses can come back out of order and are
+# matched to requests by id.
+
+STRAFE_PARAMETERS = ("trace_width", "trace_gap", "offset", "radius_scale", "middle_tangent_angle")
+GEOMETRY_CACHE_SIZE = 4096
+DEFAULT_WORKERS = 8
+DEFAULT_SOCKET_PATH = "/tmp/strafe_server.sock"
+
+
+@functools.lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def render_deterministic(strafe: Strafe, backend: str):
+    # With deterministic UUIDs the same strafe always renders to the same text
+    return render_footprint(strafe.generate_footprint_parameters(deterministic_uuids=True), backend)
+
+
+class GeneratorService:
+    """Answers decoded requests and keeps counters. Safe to call from several threads."""
+
+    def __init__(self, geometry_store: str = None):
+        # Strafes are never modified after construction, so repeated requests share one
+        self.geometry = GeometryMemo(GEOMETRY_CACHE_SIZE, geometry_store)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def warm_up(self):
+        # Compile the template and load every backend before the first request arrives
+        strafe = Strafe(Point(0, 0), 0.2, 0.2, 1.0, 0.2, 1.0)
+        for backend in RENDER_BACKENDS:
+            render_footprint(strafe.generate_footprint_parameters(), backend)
+
+    def handle_line(self, line: str):
+        # One encoded request line to one encoded response line
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            with self.lock:
+                self.requests += 1
+                self.errors += 1
+            return encode_line({"id": None, "ok": False, "error": f"invalid JSON: {e}"})
+        return encode_line(self.handle(request))
+
+    def handle(self, request):
+        start_time = time.perf_counter()
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            op = request.get("op", "generate")
+            if op == "generate":
+                response.update(self.generate(request))
+            elif op == "ping":
+                pass
+            elif op == "stats":
+                response.update(self.stats())
+            else:
+                raise ValueError(f"unknown op '{op}'")
+            response["ok"] = True
+        except (KeyError, TypeError, ValueError, ArithmeticError, OSError, sqlite3.Error, pickle.PickleError) as e:
+            response["ok"] = False
+            response["error"] = f"missing parameter {e}" if isinstance(e, KeyError) else str(e)
+        except Exception as e:
+            # Every request gets its response: an exception escaping here would be lost in a
+            # worker thread and leave the client waiting on this id
+            response["ok"] = False
+            response["error"] = f"internal error: {type(e).__name__}: {e}"
+
+        with self.lock:
+            self.requests += 1
+            self.errors += not response["ok"]
+        response["elapsed_us"] = round((time.perf_counter() - start_time) * 1e6, 1)
+        return response
+
+    def generate(self, request):
+        backend = request.get("backend", "template")
+        if backend not in RENDER_BACKENDS:
+            raise ValueError(f"unknown backend '{backend}', expected one of {', '.join(RENDER_BACKENDS)}")
+
+        strafe = self.geometry.strafe(*(float(request[name]) for name in STRAFE_PARAMETERS),
+                                      start=Point(float(request.get("start_x", 0.0)), float(request.get("start_y", 0.0))),
+                                      name_suffix=str(request.get("name_suffix", "")))
+
+        if request.get("deterministic_uuids", False):
+            content = render_deterministic(strafe, backend)
+        else:
+            content = render_footprint(strafe.generate_footprint_parameters(), backend)
+
+        result = {
+            "footprint_name": strafe.generate_footprint_name(),
+            "minus_trace_length": strafe.minus_trace_length,
+            "plus_trace_length": strafe.plus_trace_length,
+        }
+        output_path = request.get("output_path")
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            result["path"] = output_path
+        if request.get("content", True):
+            result["content"] = content
+        return result
+
+    def stats(self):
+        rendered = render_deterministic.cache_info()
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "uptime": time.time() - self.started,
+                "geometry_cache": self.geometry.stats(),
+                "render_cache": {"hits": rendered.hits, "misses": rendered.misses, "size": rendered.currsize},
+            }
+
+
+def encode_line(response):
+    # One compact JSON object per line
+    return json.dumps(response, separators=(",", ":")) + "\n"
+
+
+def serve_stdio(service: GeneratorService, workers: int = DEFAULT_WORKERS, stdin=None, stdout=None):
+    # Requests from stdin until EOF, handled by a thread pool; responses written whole, one per line
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    write_lock = threading.Lock()
+
+    def answer(line):
+        response = service.handle_line(line)
+        with write_lock:
+            stdout.write(response)
+            stdout.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for line in stdin:
+            if line.strip():
+                executor.submit(answer, line)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    # One thread per connection; requests on a connection are answered in order
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write(self.server.service.handle_line(line.decode("utf-8")).encode("utf-8"))
+            self.wfile.flush()
+
+
+class GeneratorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: GeneratorService):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, RequestHandler)
+        self.service = service
+
+
+def serve_socket(service: GeneratorService, path: str = DEFAULT_SOCKET_PATH):
+    with GeneratorServer(path, service) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def wait_for_server(path: str, timeout: float = 10.0):
+    # Returns once the server at path accepts connections
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+            return
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"no server listening on {path}")
+            time.sleep(0.01)
+
+
+def load_test(path: str, requests: int = 2000, concurrency: int = 8, backend: str = "sexpr", distinct: int = 200):
+    """
+    Send generate requests to a running socket server and measure latency
+
+    Args:
+        path (str): Server socket
+        requests (int): Total requests, spread over the connections
+        concurrency (int): Simultaneous client connections
+        backend (str): Render backend to request
+        distinct (int): Distinct parameter sets cycled through, so the geometry cache sees repeats
+
+    Returns:
+        dict: Answered requests, errors (failed or unanswered requests), connection error messages,
+            p50/p99/max latency in ms (None when no request was answered), and throughput
+    """
+
+    import socket
+
+    latencies = list()
+    errors = list()
+    connection_errors = list()
+    lock = threading.Lock()
+
+    def client(index):
+        local = list()
+        failed = 0
+        connection_error = None
+        assigned = range(index, requests, concurrency)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+                reader = sock.makefile("rb")
+                for i in assigned:
+                    request = {"id": i, "trace_width": 0.2, "trace_gap": 0.2, "offset": 0.5 + (i % distinct) * 0.05,
+                               "radius_scale": 0.2, "middle_tangent_angle": 1.2, "backend": backend}
+                    start_time = time.perf_counter()
+                    sock.sendall(encode_line(request).encode("utf-8"))
+                    line = reader.readline()
+                    if not line:
+                        raise ConnectionError("server closed the connection")
+                    response = json.loads(line)
+                    local.append(time.perf_counter() - start_time)
+                    failed += not response["ok"]
+        except OSError as e:
+            # The requests this connection did not get answered count as errors
+            connection_error = f"connection {index}: {e}"
+            failed += len(assigned) - len(local)
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+            if connection_error is not None:
+                connection_errors.append(connection_error)
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "connection_errors": connection_errors,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3 if latencies else None,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3 if latencies else None,
+        "max_ms": latencies[-1] * 1e3 if latencies else None,
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+if __name__ == "__main__":
+
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="Long-running Strafe footprint generator (JSON Lines)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Answer requests on stdin/stdout or a Unix socket")
+    serve_parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of stdin/stdout")
+    serve_parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="Request threads for stdio")
+    serve_parser.add_argument("--geometry-store", default=None, metavar="SQLITE",
+                              help="Share computed geometry with other processes through this SQLite file")
+
+    load_parser = commands.add_parser("loadtest", help="Measure request latency against a socket server")
+    load_parser.add_argument("--socket", default=None, help="Server socket (default: start a server for the test)")
+    load_parser.add_argument("-n", "--requests", type=int, default=2000)
+    load_parser.add_argument("-c", "--concurrency", type=int, default=8)
+    load_parser.add_argument("--backend", choices=RENDER_BACKENDS, default="sexpr")
+    load_parser.add_argument("--cli-baseline", type=int, default=0, metavar="N",
+                             help="Also time N separate 'python strafe.py --generate' runs for comparison")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        service = GeneratorService(args.geometry_store)
+        service.warm_up()
+        if args.socket:
+            serve_socket(service, args.socket)
+        else:
+            serve_stdio(service, args.workers)
+        exit(0)
+
+    server = None
+    path = args.socket
+    if path is None:
+        path = DEFAULT_SOCKET_PATH
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--socket", path])
+        wait_for_server(path)
+    try:
+        result = load_test(path, args.requests, args.concurrency, args.backend)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    for message in result["connection_errors"]:
+        print(f"Failed {message}")
+    if result["requests"]:
+        print(f"{result['requests']} requests over {args.concurrency} connections, {result['errors']} errors: "
+              f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, max {result['max_ms']:.2f} ms, "
+              f"{result['throughput']:,.0f} requests/s")
+    else:
+        print(f"No request answered over {args.concurrency} connections to {path}, {result['errors']} errors")
+        exit(1)
+
+    if args.cli_baseline:
+        import tempfile
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "strafe.py")
+        with tempfile.TemporaryDirectory() as directory:
+            start_time = time.perf_counter()
+            for _ in range(args.cli_baseline):
+                subprocess.run([sys.executable, script, "0", "0", "0.2", "0.2", "4", "0.2", "1.2", "--generate"],
+                               cwd=directory, check=True, stdout=subprocess.DEVNULL)
+            per_call = (time.perf_counter() - start_time) / args.cli_baseline
+        print(f"python strafe.py per footprint: {per_call * 1e3:.1f} ms")
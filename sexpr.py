@@ -0,0 +1,162 @@
+import io
+import itertools
+import re
+
+# Streaming reader for KiCad S-expression files (.kicad_mod, .kicad_pcb).
+#
+# The tokenizer reads fixed-size chunks, so memory does not grow with the file.
+# The parser builds nested lists only for the nodes asked for (pads, segments, ...)
+# and skips everything else token by token. Atoms stay strings; quoted strings
+# are unescaped and wrapped in QuotedString so they can be told apart from atoms.
+
+CHUNK_SIZE = 1 << 16  # characters
+
+# Parenthesis tokens, compared by identity so that a quoted "(" is never taken for one
+OPEN = "("
+CLOSE = ")"
+
+# "(", ")", a quoted string (possibly cut off at the chunk end) or a bare atom
+TOKEN_PATTERN = re.compile(r'[()]|"(?:[^"\\]|\\.)*"?|[^\s()"]+', re.DOTALL)
+ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+
+
+class QuotedString(str):
+    """A token that was a quoted string in the file"""
+    __slots__ = ()
+
+
+def _unescape(match):
+    character = match.group(1)
+    return "\n" if character == "n" else character
+
+
+def unquote(token: str):
+    body = token[1:-1]
+    return QuotedString(ESCAPE_PATTERN.sub(_unescape, body) if "\\" in body else body)
+
+
+def is_complete_string(token: str):
+    # A quoted token ends with an unescaped quote
+    if len(token) < 2 or token[-1] != '"':
+        return False
+    backslashes = len(token) - 1 - len(token[:-1].rstrip("\\"))
+    return backslashes % 2 == 0
+
+
+def tokenize(f, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield the tokens of an S-expression text stream: OPEN, CLOSE, atoms and QuotedString values
+
+    Args:
+        f: Text file-like object with a read(size) method
+        chunk_size (int, optional): Characters read at a time
+    """
+
+    buffer = ""
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+
+        # Fast path: everything up to the last line break holds only whole tokens,
+        # unless a quoted string spans it, which a line break inside quotes would show
+        cut = buffer.rfind("\n") + 1 if chunk else len(buffer)
+        if cut:
+            tokens = TOKEN_PATTERN.findall(buffer, 0, cut)
+            if not tokens or tokens[-1][0] != '"' or is_complete_string(tokens[-1]):
+                buffer = buffer[cut:]
+                yield from [OPEN if token == "(" else CLOSE if token == ")" else
+                            unquote(token) if token[0] == '"' else token for token in tokens]
+                if not chunk:
+                    return
+                continue
+
+        position = 0
+        for match in TOKEN_PATTERN.finditer(buffer):
+            token = match.group()
+            # A token touching the end of the buffer may continue in the next chunk
+            if chunk and match.end() == len(buffer):
+                break
+            if token == "(":
+                token = OPEN
+            elif token == ")":
+                token = CLOSE
+            elif token[0] == '"':
+                if not is_complete_string(token):
+                    if chunk:
+                        break
+                    raise ValueError("unterminated string at end of file")
+                token = unquote(token)
+            yield token
+            position = match.end()
+        buffer = buffer[position:]
+        if not chunk:
+            if buffer.strip():
+                raise ValueError(f"unexpected trailing text '{buffer.strip()[:20]}'")
+            return
+
+
+def iter_nodes(tokens, heads, depth: int = 0):
+    """
+    Yield every node whose head atom is in heads, as nested lists of tokens, in file order.
+    Nodes nested in a yielded node are part of it, not yielded separately.
+
+    Args:
+        tokens: Token iterator, as from tokenize
+        heads (set): Head atoms of the nodes to build, e.g. {"pad"}
+        depth (int, optional): Expressions already opened by tokens read before, e.g. 1 after "(footprint"
+    """
+
+    stack = None  # open lists of the node being built
+    opened = False  # the previous token was "(" outside a built node
+    for token in tokens:
+        if stack is not None:
+            if token is OPEN:
+                stack.append([])
+            elif token is CLOSE:
+                node = stack.pop()
+                if stack:
+                    stack[-1].append(node)
+                else:
+                    stack = None
+                    depth -= 1
+                    yield node
+            else:
+                stack[-1].append(token)
+            continue
+
+        if opened:
+            opened = False
+            if token in heads and not isinstance(token, QuotedString):
+                stack = [[token]]
+                continue
+        if token is OPEN:
+            opened = True
+            depth += 1
+        elif token is CLOSE:
+            depth -= 1
+            if depth < 0:
+                raise ValueError("unbalanced ')'")
+
+    if stack is not None or depth != 0:
+        raise ValueError("unexpected end of file inside an expression")
+
+
+def child(node, head: str, default=None):
+    # First child node of node with the given head
+    for item in node:
+        if isinstance(item, list) and item and item[0] == head:
+            return item
+    return default
+
+
+def children(node, head: str):
+    return [item for item in node if isinstance(item, list) and item and item[0] == head]
+
+
+def parse(text: str):
+    """Parse a whole S-expression string into nested lists, for small inputs and checks"""
+    tokens = tokenize(io.StringIO(text))
+    if next(tokens, None) is not OPEN:
+        raise ValueError("expected '('")
+    head = next(tokens)
+    return next(iter_nodes(itertools.chain([OPEN, head], tokens), {head}))
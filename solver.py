@@ -0,0 +1,242 @@
+import math
+import time
+
+import numpy as np
+
+from batch import StrafeBatch
+from impedance import load_stackup, min_bend_radius
+
+# Inverse solver: picks radius_scale and middle_tangent_angle for layout constraints.
+#
+# For a strafe with inner bend radius s, centre-to-centre trace distance c and
+# offset o, both bends sweep the middle tangent angle a, and with R = 2s + c:
+#   footprint length along the direction of travel = R tan(a/2) + |o| cot(a)
+#   trace length                                   = R (a - tan(a/2)) + |o| / sin(a)
+#   middle tangent line length                     = (|o| - R (1 - cos a)) / sin(a)
+# The line length must not be negative, otherwise the bends overlap. Past a = pi/2
+# the middle tangent runs backwards, so the solver searches a in (0, pi/2].
+#
+# Both lengths grow with s on (0, pi/2], so the shortest solutions use the smallest
+# allowed radius, while the largest radius is limited by the length budget.
+
+SOLVER_OBJECTIVES = ("length", "span", "radius")
+
+ANGLE_STEPS = 512
+REFINE_STEPS = 64
+CHUNK_SIZE = 2048
+
+
+def footprint_span(radius_sum, offset, angle):
+    return radius_sum * np.tan(angle / 2) + np.fabs(offset) / np.tan(angle)
+
+
+def trace_path_length(radius_sum, offset, angle):
+    return radius_sum * (angle - np.tan(angle / 2)) + np.fabs(offset) / np.sin(angle)
+
+
+def max_radius_sum(offset, max_length, angle):
+    # Largest R = 2s + c that keeps the footprint within max_length and the middle line non-negative
+    offset = np.fabs(offset)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        by_length = (max_length - offset / np.tan(angle)) / np.tan(angle / 2)
+        by_line = offset / (1 - np.cos(angle))
+    return np.minimum(by_length, by_line)
+
+
+class StrafeSolution:
+    """Solver results, one row per constraint set.
+
+    Rows that are not feasible hold NaN. radius_scale_max is the feasible region:
+    for every angle in angles, the largest radius_scale meeting the constraints,
+    the smallest being radius_scale_min. It is only filled in when requested.
+    """
+
+    def __init__(self, n: int):
+        self.feasible = np.zeros(n, dtype=bool)
+        self.radius_scale = np.full(n, np.nan)
+        self.middle_tangent_angle = np.full(n, np.nan)
+        self.min_radius = np.full(n, np.nan)
+        self.footprint_length = np.full(n, np.nan)
+        self.trace_length = np.full(n, np.nan)
+
+        self.angles = None
+        self.radius_scale_min = None
+        self.radius_scale_max = None
+
+
+def _objective(objective: str, radius_sum, offset, angle, feasible):
+    # Value to minimize on the angle grid, +inf where infeasible
+    if objective == "length":
+        value = trace_path_length(radius_sum, offset, angle)
+    elif objective == "span":
+        value = footprint_span(radius_sum, offset, angle)
+    else:
+        value = -radius_sum
+    return np.where(feasible, value, np.inf)
+
+
+def _solve_chunk(center_distance, offset, max_length, min_radius, objective, angles):
+    # Radius sum per set and angle: the largest allowed one for "radius", else the smallest
+    limit = max_radius_sum(offset[:, None], max_length[:, None], angles[None, :])
+    smallest = (2 * min_radius + center_distance)[:, None]
+    feasible = limit >= smallest
+    radius_sum = limit if objective == "radius" else np.broadcast_to(smallest, limit.shape)
+
+    best = np.argmin(_objective(objective, radius_sum, offset[:, None], angles[None, :], feasible), axis=1)
+    rows = np.arange(len(offset))
+    found = feasible[rows, best]
+
+    # Refine around the best grid angle on a finer local grid
+    step = angles[1] - angles[0] if len(angles) > 1 else 0.0
+    local = angles[best][:, None] + np.linspace(-step, step, REFINE_STEPS)[None, :]
+    local = np.clip(local, angles[0], angles[-1])
+    local_limit = max_radius_sum(offset[:, None], max_length[:, None], local)
+    local_feasible = local_limit >= smallest
+    local_radius_sum = local_limit if objective == "radius" else np.broadcast_to(smallest, local.shape)
+    refined = np.argmin(_objective(objective, local_radius_sum, offset[:, None], local, local_feasible), axis=1)
+    refined_found = local_feasible[rows, refined]
+
+    angle = np.where(refined_found, local[rows, refined], angles[best])
+    radius_sum = np.where(refined_found, local_radius_sum[rows, refined], radius_sum[rows, best])
+    return found | refined_found, angle, radius_sum, limit
+
+
+def solve_strafe(trace_width, trace_gap, offset, max_length, min_radius, objective: str = "length", region: bool = False,
+                 stackup=None, max_impedance_deviation=None):
+    """
+    Find radius_scale and middle_tangent_angle for arrays of layout constraints
+
+    Args:
+        trace_width, trace_gap, offset: Strafe parameters per constraint set (mm), broadcast together
+        max_length: Maximum footprint length along the direction of travel (mm)
+        min_radius: Minimum bend radius of the inner trace (mm)
+        objective (str): "length" for the shortest traces, "span" for the shortest footprint,
+                         "radius" for the largest bend radius
+        region (bool): Also return the feasible radius_scale range for every angle on the search grid
+        stackup (impedance.Stackup, optional): Dielectric and copper, used with max_impedance_deviation
+        max_impedance_deviation (optional): Largest impedance deviation allowed in the bends (ohm), see
+                                            impedance.bend_deviation. Raises min_radius where needed
+
+    Returns:
+        StrafeSolution: Chosen parameters and resulting lengths, checked against StrafeBatch
+    """
+
+    if objective not in SOLVER_OBJECTIVES:
+        raise ValueError(f"unknown objective '{objective}', expected one of {', '.join(SOLVER_OBJECTIVES)}")
+
+    trace_width, trace_gap, offset, max_length, min_radius = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in (trace_width, trace_gap, offset, max_length, min_radius)))
+    if stackup is not None and max_impedance_deviation is not None:
+        min_radius = np.maximum(min_radius, min_bend_radius(stackup, trace_width, trace_gap, max_impedance_deviation))
+    center_distance = trace_width + trace_gap
+    angles = np.linspace(math.pi / 2 / ANGLE_STEPS, math.pi / 2, ANGLE_STEPS)
+
+    n = len(offset)
+    solution = StrafeSolution(n)
+    if region:
+        solution.angles = angles
+        solution.radius_scale_min = min_radius / np.fabs(offset)
+        solution.radius_scale_max = np.full((n, ANGLE_STEPS), np.nan)
+
+    for start in range(0, n, CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        found, angle, radius_sum, limit = _solve_chunk(center_distance[chunk], offset[chunk], max_length[chunk],
+                                                       min_radius[chunk], objective, angles)
+        inner_radius = (radius_sum - center_distance[chunk]) / 2
+
+        solution.feasible[chunk] = found
+        solution.middle_tangent_angle[chunk] = np.where(found, angle, np.nan)
+        solution.min_radius[chunk] = np.where(found, inner_radius, np.nan)
+        solution.radius_scale[chunk] = np.where(found, inner_radius / np.fabs(offset[chunk]), np.nan)
+        if region:
+            limit_scale = (limit - center_distance[chunk, None]) / 2 / np.fabs(offset[chunk, None])
+            solution.radius_scale_max[chunk] = np.where(limit_scale >= solution.radius_scale_min[chunk, None], limit_scale, np.nan)
+
+    # Measure the chosen strafes with the batch geometry engine
+    rows = np.flatnonzero(solution.feasible)
+    if len(rows):
+        batch = StrafeBatch(trace_width[rows], trace_gap[rows], offset[rows],
+                            solution.radius_scale[rows], solution.middle_tangent_angle[rows])
+        solution.footprint_length[rows] = np.maximum(batch.minus.end_y, batch.plus.end_y) - batch.start_y
+        solution.trace_length[rows] = batch.plus_trace_length
+
+    return solution
+
+
+def trial_search(trace_width: float, trace_gap: float, offset: float, max_length: float, min_radius: float, steps: int = 20):
+    # What the solver replaces: construct Strafe objects over a grid and keep the shortest fitting one
+    from primitives import Point
+    from strafe import Strafe
+
+    best = None
+    for radius_scale in np.linspace(min_radius / math.fabs(offset), 2.0, steps):
+        for angle in np.linspace(0.05, math.pi / 2, steps):
+            strafe = Strafe(Point(0, 0), trace_width, trace_gap, offset, float(radius_scale), float(angle))
+            span = max(strafe.minus_end_point.y, strafe.plus_end_point.y)
+            line = strafe.plus_primitives[2]
+            if span <= max_length and line.end.y >= line.start.y:
+                length = strafe.plus_trace_length
+                if best is None or length < best[0]:
+                    best = (length, radius_scale, angle)
+    return best
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit radius_scale and middle_tangent_angle to layout constraints")
+    parser.add_argument("--width", type=float, default=0.2, help="Trace width (mm)")
+    parser.add_argument("--gap", type=float, default=0.2, help="Trace gap (mm)")
+    parser.add_argument("--offset", type=float, default=4.0, help="Required offset, positive is to the right (mm)")
+    parser.add_argument("--max-length", type=float, default=6.0, help="Maximum footprint length along the direction of travel (mm)")
+    parser.add_argument("--min-radius", type=float, default=0.3, help="Minimum inner bend radius (mm)")
+    parser.add_argument("--objective", choices=SOLVER_OBJECTIVES, default="length")
+    parser.add_argument("--stackup", default=None, help="TOML file with a [stackup] table, for --max-impedance-deviation")
+    parser.add_argument("--max-impedance-deviation", type=float, default=None,
+                        help="Largest impedance deviation in the bends (ohm), raises the minimum radius")
+    parser.add_argument("--generate", action="store_true", help="Generate the footprint for the solution")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N random constraint sets against trial construction")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        rng = np.random.default_rng(0)
+        n = args.benchmark
+        offsets = rng.uniform(0.5, 8, n) * rng.choice((-1.0, 1.0), n)
+        constraints = (rng.uniform(0.1, 0.3, n), rng.uniform(0.1, 0.3, n), offsets,
+                       np.fabs(offsets) * rng.uniform(0.8, 3, n), rng.uniform(0.05, 0.5, n))
+
+        start_time = time.perf_counter()
+        solution = solve_strafe(*constraints, objective=args.objective)
+        elapsed = time.perf_counter() - start_time
+        print(f"Solver: {n} constraint sets in {elapsed:.3f} s ({elapsed / n * 1e6:.1f} us/set), "
+              f"{solution.feasible.sum()} feasible")
+
+        trials = min(n, 20)
+        start_time = time.perf_counter()
+        for i in range(trials):
+            trial_search(*(float(column[i]) for column in constraints))
+        trial_elapsed = (time.perf_counter() - start_time) / trials
+        print(f"Trial construction (20x20 grid): {trial_elapsed * 1e6:.0f} us/set, solver is {trial_elapsed / (elapsed / n):.0f}x faster")
+        exit(0)
+
+    if args.max_impedance_deviation is not None and args.stackup is None:
+        parser.error("--max-impedance-deviation needs --stackup")
+    stackup = load_stackup(args.stackup) if args.stackup else None
+    solution = solve_strafe(args.width, args.gap, args.offset, args.max_length, args.min_radius, args.objective,
+                            stackup=stackup, max_impedance_deviation=args.max_impedance_deviation)
+    if not solution.feasible[0]:
+        print("No feasible strafe for these constraints")
+        exit(1)
+
+    print(f"radius_scale: {solution.radius_scale[0]:.6f}")
+    print(f"middle_tangent_angle: {solution.middle_tangent_angle[0]:.6f} rad")
+    print(f"inner bend radius: {solution.min_radius[0]:.4f} mm")
+    print(f"footprint length: {solution.footprint_length[0]:.4f} mm")
+    print(f"trace length: {solution.trace_length[0]:.4f} mm")
+
+    if args.generate:
+        from primitives import Point
+        from strafe import Strafe
+        Strafe(Point(0, 0), args.width, args.gap, args.offset,
+               float(solution.radius_scale[0]), float(solution.middle_tangent_angle[0])).generate_footprint_file()
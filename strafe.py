@@ -1,210 +1,32 @@
 import math
 
-import copy
-from jinja2 import Template
-from primitives import Point, Line, Arc
-from viz import VIZ_WIDTH_SCALE, TraceVisualizer
+from primitives import Point, Line, Arc, PrimitiveBuffer, VIZ_WIDTH_SCALE
+import profiling
+from profiling import span, traced
+from render import STRAFE_FOOTPRINT_TEMPLATE, quantize_parameters, render_footprint
 import uuid
 
-# Embedded Jinja template for Strafe footprint
-STRAFE_FOOTPRINT_TEMPLATE = """(footprint "{{ footprint_name }}"
-	(version {{ version | default("20241229") }})
-	(generator "{{ generator | default("pcbnew") }}")
-	(generator_version "{{ generator_version | default("9.0") }}")
-	(layer "{{ layer | default("F.Cu") }}")
-	(descr "{{ description }}")
-	(property "Reference" "{{ reference | default("REF**") }}"
-		(at {{ ref_pos_x | default(0.1) }} {{ ref_pos_y | default(1.6) }} {{ ref_rotation | default(0) }})
-		(unlocked yes)
-		(layer "{{ ref_layer | default("F.SilkS") }}")
-		(uuid "{{ ref_uuid }}")
-		(effects
-			(font
-				(size {{ ref_font_size | default(1) }} {{ ref_font_size | default(1) }})
-				(thickness {{ ref_font_thickness | default(0.1) }})
-			)
-		)
-	)
-	(property "Value" "{{ value | default("Untitled") }}"
-		(at {{ val_pos_x | default(0) }} {{ val_pos_y | default(1) }} {{ val_rotation | default(0) }})
-		(unlocked yes)
-		(layer "{{ val_layer | default("F.Fab") }}")
-		(uuid "{{ val_uuid }}")
-		(effects
-			(font
-				(size {{ val_font_size | default(1) }} {{ val_font_size | default(1) }})
-				(thickness {{ val_font_thickness | default(0.15) }})
-			)
-		)
-	)
-	(property "Datasheet" "{{ datasheet | default("") }}"
-		(at 0 0 0)
-		(unlocked yes)
-		(layer "F.Fab")
-		(hide yes)
-		(uuid "{{ datasheet_uuid }}")
-		(effects
-			(font
-				(size 1 1)
-				(thickness 0.15)
-			)
-		)
-	)
-	(property "Description" "{{ footprint_name }}"
-		(at 0 0 0)
-		(unlocked yes)
-		(layer "F.Fab")
-		(hide yes)
-		(uuid "{{ description_uuid }}")
-		(effects
-			(font
-				(size 1 1)
-				(thickness 0.15)
-			)
-		)
-	)
-	(attr {{ attributes | default("exclude_from_pos_files exclude_from_bom") }})
-{%- for line in fp_lines %}
-	(fp_line
-		(start {{ line.start_x }} {{ line.start_y }})
-		(end {{ line.end_x }} {{ line.end_y }})
-		(stroke
-			(width {{ line.width }})
-			(type {{ line.type | default("default") }})
-		)
-		(layer "{{ line.layer }}")
-		(uuid "{{ line.uuid }}")
-	)
-{%- endfor %}
-{%- for text in fp_texts %}
-	(fp_text {{ text.text_type }} "{{ text.content }}"
-		(at {{ text.pos_x }} {{ text.pos_y }} {{ text.rotation | default(0) }})
-		(unlocked yes)
-		(layer "{{ text.layer }}")
-		(uuid "{{ text.uuid }}")
-		(effects
-			(font
-				(size {{ text.font_size | default(1) }} {{ text.font_size | default(1) }})
-				(thickness {{ text.font_thickness | default(0.15) }})
-			)
-		)
-	)
-{%- endfor %}
-{%- for pad in pads %}
-	(pad "{{ pad.number }}" smd {{ pad.shape }}
-		(at {{ pad.pos_x }} {{ pad.pos_y }})
-		(size {{ pad.size_x }} {{ pad.size_y }})
-		(layers {{ pad.layers }})
-		{%- if pad.shape == "custom" %}
-		{%- if pad.die_length %}
-		(die_length {{ pad.die_length }})
-		{%- endif %}
-		(options
-			(clearance {{ pad.clearance | default("outline") }})
-			(anchor {{ pad.anchor | default("circle") }})
-		)
-		(primitives
-		{%- for primitive in pad.primitives %}
-			{%- if primitive.type == "gr_arc" %}
-			(gr_arc
-				(start {{ primitive.start_x }} {{ primitive.start_y }})
-				(mid {{ primitive.mid_x }} {{ primitive.mid_y }})
-				(end {{ primitive.end_x }} {{ primitive.end_y }})
-				(width {{ primitive.width }})
-			)
-			{%- elif primitive.type == "gr_line" %}
-			(gr_line
-				(start {{ primitive.start_x }} {{ primitive.start_y }})
-				(end {{ primitive.end_x }} {{ primitive.end_y }})
-				(width {{ primitive.width }})
-			)
-			{%- endif %}
-		{%- endfor %}
-		)
-		{%- endif %}
-		(uuid "{{ pad.uuid }}")
-	)
-{%- endfor %}
-	(embedded_fonts no)
-)"""
+# Bump when a change to the geometry or template alters generated footprints,
+# so that build caches keyed on it are invalidated.
+GENERATOR_VERSION = "3"
 
-# Strafe class for generating curved diffpair offset.
-# Parameters:
-# - start: Starting point of the trace (x: float, y: float)
-# - trace_width: Width of the trace (mm: float)
-# - trace_gap: Gap between traces (mm: float)
-# - offset_x: Offset in the x-direction (mm: float)
-# - radius_scale: Scale factor for the radius, relative to offset_x. (ratio: float)
-# - middle_tangent_angle: Angle (radians) of the middle tangent against original x-axis (rad: float)
-
-class Strafe:
-    def __init__(self, start: Point, trace_width: float, trace_gap: float, offset_x: float, radius_scale: float, middle_tangent_angle: float):
-        self.start = start
-        self.trace_width = trace_width
-        self.trace_gap = trace_gap
-        self.offset_x = offset_x
-        self.radius_scale = radius_scale
-        self.middle_tangent_angle = middle_tangent_angle
-
-        self.minus_primitives = list()
-        self.plus_primitives = list()
-
-        self.offset_dir = False
-        if self.offset_x >= 0:
-            self.offset_dir = True
-
-        self.plus_trace_length = 0.0
-        self.minus_trace_length = 0.0
-
-        self.calculate_trace()
-        self.calculate_trace_length()
-    
-
-    def calculate_trace(self):
-
-        self.minus_start_point = Point(self.start.x -(self.trace_width/2 + self.trace_gap/2), self.start.y)
-        self.plus_start_point = Point(self.start.x + (self.trace_width/2 + self.trace_gap/2), self.start.y)
-
-        trace_center_width = math.fabs(self.plus_start_point.x - self.minus_start_point.x)
-
-        small_radius = math.fabs(self.offset_x * self.radius_scale)
-        big_radius = small_radius + copy.deepcopy(trace_center_width)
-
-        if self.offset_dir:
-            first_bend_center = Point(self.plus_start_point.x + small_radius, self.plus_start_point.y)
-            second_bend_center = Point(self.offset_x + (copy.deepcopy(trace_center_width) / 2) - copy.deepcopy(big_radius), math.fabs(self.offset_x * 2))
+# Namespace for deterministic UUIDs, derived from the footprint name and element role
+STRAFE_UUID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://github.com/martinpalsson/kicad-curved-diffpair-footprints")
 
-            # Order of primitives: [0: Arc1, 1: Arc2, 2: Line between Arc1 and Arc2]
-            self.minus_primitives.append(Arc(copy.deepcopy(first_bend_center), big_radius, math.pi, -math.pi - self.middle_tangent_angle, self.trace_width))
-            self.plus_primitives.append(Arc(copy.deepcopy(first_bend_center), small_radius, math.pi, -math.pi - self.middle_tangent_angle, self.trace_width))
 
-            self.minus_primitives.append(Arc(copy.deepcopy(second_bend_center), small_radius, 0, -(2*math.pi) - self.middle_tangent_angle, self.trace_width))
-            self.plus_primitives.append(Arc(copy.deepcopy(second_bend_center), big_radius, 0, -(2*math.pi) - self.middle_tangent_angle, self.trace_width))
-        else:
-            first_bend_center = Point(self.minus_start_point.x - small_radius, self.minus_start_point.y)
-            second_bend_center = Point(self.offset_x - (copy.deepcopy(trace_center_width) / 2) + big_radius, math.fabs(self.offset_x * 2))
+def strafe_footprint_name(trace_width: float, trace_gap: float, offset_x: float, name_suffix: str = ""):
+    # Name of the Strafe footprint with these parameters, without building its geometry
+    direction = "right" if offset_x >= 0 else "left"
+    return f"dp_strafe_{direction}_w{trace_width}_g{trace_gap}_offs{math.fabs(offset_x)}mm{name_suffix}"
 
-            # Order of primitives: [0: Arc1, 1: Arc2, 2: Line between Arc1 and Arc2]
-            self.minus_primitives.append(Arc(copy.deepcopy(first_bend_center), small_radius, 0, self.middle_tangent_angle, self.trace_width))
-            self.plus_primitives.append(Arc(copy.deepcopy(first_bend_center), big_radius, 0, self.middle_tangent_angle, self.trace_width))
 
-            self.minus_primitives.append(Arc(copy.deepcopy(second_bend_center), big_radius, math.pi, math.pi + self.middle_tangent_angle, self.trace_width))
-            self.plus_primitives.append(Arc(copy.deepcopy(second_bend_center), small_radius, math.pi, math.pi + self.middle_tangent_angle, self.trace_width))
-
-        self.minus_primitives.append(self.minus_primitives[0].get_tangent_line(1))
-        self.minus_primitives[-1] = self.minus_primitives[-1].extend_to_intersection_with_x(self.minus_primitives[1].get_exit_point().x)
-        diff = self.minus_primitives[1].get_exit_point().y - self.minus_primitives[-1].end.y
-        self.minus_primitives[1].center.y -= diff
-
-        self.plus_primitives.append(self.plus_primitives[0].get_tangent_line(1))
-        self.plus_primitives[-1] = self.plus_primitives[-1].extend_to_intersection_with_x(self.plus_primitives[1].get_exit_point().x)
-        diff = self.plus_primitives[1].get_exit_point().y - self.plus_primitives[-1].end.y
-        self.plus_primitives[1].center.y -= diff
-
-
-        self.minus_end_point = self.minus_primitives[1].get_start_point()
-        self.plus_end_point = self.plus_primitives[1].get_start_point()
+# Base class of the curved diffpair footprints: both traces as lists of Arc and Line
+# primitives, output as one custom pad per trace carrying its length as die_length.
+# Subclasses build minus_primitives and plus_primitives and set minus/plus start and
+# end points in calculate_trace, and name the footprint.
 
+class DiffPairFootprint:
+    @traced("calculate_trace_length")
     def calculate_trace_length(self):
         self.minus_trace_length = 0.0
         self.plus_trace_length = 0.0
@@ -215,11 +37,17 @@ class Strafe:
             self.plus_trace_length += primitive.calculate_length()
 
 
+    def get_primitive_buffers(self):
+        # Compact copies of (minus_primitives, plus_primitives), one typed array per trace
+        return PrimitiveBuffer(self.minus_primitives), PrimitiveBuffer(self.plus_primitives)
+
     def print_metrics(self):
         for primitive in self.minus_primitives + self.plus_primitives:
             print(f"Primitive: {primitive}, Length: {primitive.calculate_length()}")
 
     def visualize(self):
+        # Imported here so that geometry and footprint generation never load matplotlib
+        from viz import TraceVisualizer
         viz = TraceVisualizer()
 
         for primitive in self.minus_primitives:
@@ -229,20 +57,20 @@ class Strafe:
 
         viz.show()
     
-    def get_general_direction(self):
-        direction = "left"
-        if self.offset_dir:
-            direction = "right"
-        
-        return direction
-    
-    def generate_footprint_name(self):
-        return f"dp_strafe_{self.get_general_direction()}_w{self.trace_width}_g{self.trace_gap}_offs{math.fabs(self.offset_x)}mm"
-    
-    def generate_footprint_description(self):
-        return f"differential pair strafe/offset to the {self.get_general_direction()}, trae width: {self.trace_width} mm trace gap {self.trace_gap} mm offset {math.fabs(self.offset_x)} mm"
+    @traced("generate_footprint_parameters")
+    def generate_footprint_parameters(self, deterministic_uuids: bool=False):
+        footprint_name = self.generate_footprint_name()
+
+        # Deterministic UUIDs make the same inputs give byte-identical files
+        def new_uuid(role: str):
+            if deterministic_uuids:
+                return str(uuid.uuid5(STRAFE_UUID_NAMESPACE, f"{footprint_name}/{role}"))
+            return str(uuid.uuid4())
+
+        # Only wrapped while profiling, UUIDs are generated nine times per footprint
+        if profiling.is_enabled():
+            new_uuid = traced("uuid")(new_uuid)
 
-    def generate_footprint_parameters(self):
         minus_primitives = list()
         plus_primitives = list()
 
@@ -253,14 +81,14 @@ class Strafe:
 
         parameters = {
                 # Basic footprint info (same as before)
-                "footprint_name": self.generate_footprint_name(),
+                "footprint_name": footprint_name,
                 "description": self.generate_footprint_description(),
 
                 # UUIDs (same as before)
-                "ref_uuid": str(uuid.uuid4()),
-                "val_uuid": str(uuid.uuid4()),
-                "datasheet_uuid": str(uuid.uuid4()),
-                "description_uuid": str(uuid.uuid4()),
+                "ref_uuid": new_uuid("reference"),
+                "val_uuid": new_uuid("value"),
+                "datasheet_uuid": new_uuid("datasheet"),
+                "description_uuid": new_uuid("description"),
 
                 # Construction lines and text (same as before)
                 "fp_texts": [
@@ -271,7 +99,7 @@ class Strafe:
                         "pos_y": 2.5,
                         "rotation": 0,
                         "layer": "F.Fab", 
-                        "uuid": str(uuid.uuid4())
+                        "uuid": new_uuid("text/0")
                     }
                 ],
                 
@@ -286,7 +114,7 @@ class Strafe:
                         "size_x": self.trace_width,
                         "size_y": self.trace_width,
                         "layers": "F.Cu",
-                        "uuid": str(uuid.uuid4())
+                        "uuid": new_uuid("pad/end/1")
                     },
                     {
                         "number": "2",
@@ -296,7 +124,7 @@ class Strafe:
                         "size_x": self.trace_width,
                         "size_y": self.trace_width,
                         "layers": "F.Cu",
-                        "uuid": str(uuid.uuid4())
+                        "uuid": new_uuid("pad/end/2")
                     },
                     
                     # Start pads (custom with trace path)
@@ -312,7 +140,7 @@ class Strafe:
                         "clearance": "outline",
                         "anchor": "circle",
                         "primitives": minus_primitives,
-                        "uuid": str(uuid.uuid4())
+                        "uuid": new_uuid("pad/start/1")
                     },
                     {
                         "number": "2", 
@@ -326,7 +154,7 @@ class Strafe:
                         "clearance": "outline",
                         "anchor": "circle",
                         "primitives": plus_primitives,
-                        "uuid": str(uuid.uuid4())
+                        "uuid": new_uuid("pad/start/2")
                     }
                 ]
             }
@@ -334,47 +162,156 @@ class Strafe:
 
         return parameters
 
-    def generate_footprint_file(self, output_path: str=None):
+    def render_footprint(self, backend: str="template", deterministic_uuids: bool=False, quantize: bool=False, indent: bool=True):
+        """
+        Render the footprint file content without writing it, see generate_footprint_file for the arguments
+
+        Returns:
+            str: The rendered footprint content
+        """
+
+        parameters = self.generate_footprint_parameters(deterministic_uuids)
+
+        # Both backends produce the same text as the embedded template
+        with span("render"):
+            if quantize:
+                parameters = quantize_parameters(parameters)
+            return render_footprint(parameters, backend, indent)
+
+    def generate_footprint_file(self, output_path: str=None, verbose: bool=True, backend: str="template", deterministic_uuids: bool=False,
+                                quantize: bool=False, indent: bool=True):
         """
-        Generate a KiCad footprint file from template and parameters
+        Render this strafe's footprint and write it to a KiCad footprint file
         
         Args:
-            parameters (dict): All the footprint parameters as specified
             output_path (str, optional): Output file path. If None, uses footprint_name + '.kicad_mod'
-            template_string (str, optional): Custom template string. If None, uses embedded template
+            verbose (bool, optional): Print the path of the generated file
+            backend (str, optional): "template" renders the cached Jinja template, "sexpr" writes the S-expression directly
+            deterministic_uuids (bool, optional): Derive UUIDs from the footprint name instead of generating random ones
+            quantize (bool, optional): Snap numbers to KiCad's 1 nm grid as shortest decimals, see render.quantize_parameters
+            indent (bool, optional): Indent the S-expression with tabs, as KiCad does
         
         Returns:
             str: The rendered footprint content
         """
 
-        parameters = self.generate_footprint_parameters()
-
-        # Use embedded template by default
-        template_content = STRAFE_FOOTPRINT_TEMPLATE
-        
-        # Create Jinja template and render
-        template = Template(template_content)
-        rendered_content = template.render(**parameters)
+        rendered_content = self.render_footprint(backend, deterministic_uuids, quantize, indent)
         
         # Determine output path
         if output_path is None:
-            footprint_name = parameters.get('footprint_name', 'untitled_footprint')
-            output_path = f"{footprint_name}.kicad_mod"
+            output_path = f"{self.generate_footprint_name()}.kicad_mod"
         
         # Write to file
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with span("write"), open(output_path, 'w', encoding='utf-8') as f:
             f.write(rendered_content)
         
-        print(f"Generated footprint: {output_path}")
+        if verbose:
+            print(f"Generated footprint: {output_path}")
         return rendered_content
 
+
+# Strafe class for generating curved diffpair offset.
+# Parameters:
+# - start: Starting point of the trace (x: float, y: float)
+# - trace_width: Width of the trace (mm: float)
+# - trace_gap: Gap between traces (mm: float)
+# - offset_x: Offset in the x-direction (mm: float)
+# - radius_scale: Scale factor for the radius, relative to offset_x. (ratio: float)
+# - middle_tangent_angle: Angle (radians) of the middle tangent against original x-axis (rad: float)
+# - name_suffix: Appended to the footprint name, to tell apart variants with the same width, gap and offset (str)
+
+class Strafe(DiffPairFootprint):
+    def __init__(self, start: Point, trace_width: float, trace_gap: float, offset_x: float, radius_scale: float, middle_tangent_angle: float, name_suffix: str = ""):
+        self.start = start
+        self.trace_width = trace_width
+        self.trace_gap = trace_gap
+        self.offset_x = offset_x
+        self.radius_scale = radius_scale
+        self.middle_tangent_angle = middle_tangent_angle
+        self.name_suffix = name_suffix
+
+        self.minus_primitives = list()
+        self.plus_primitives = list()
+
+        self.offset_dir = False
+        if self.offset_x >= 0:
+            self.offset_dir = True
+
+        self.plus_trace_length = 0.0
+        self.minus_trace_length = 0.0
+
+        self.calculate_trace()
+        self.calculate_trace_length()
+    
+
+    @traced("calculate_trace")
+    def calculate_trace(self):
+
+        self.minus_start_point = Point(self.start.x -(self.trace_width/2 + self.trace_gap/2), self.start.y)
+        self.plus_start_point = Point(self.start.x + (self.trace_width/2 + self.trace_gap/2), self.start.y)
+
+        trace_center_width = math.fabs(self.plus_start_point.x - self.minus_start_point.x)
+
+        small_radius = math.fabs(self.offset_x * self.radius_scale)
+        big_radius = small_radius + trace_center_width
+
+        # Each arc gets its own center point, since the second bend centers are moved below
+        if self.offset_dir:
+            first_bend_center = Point(self.plus_start_point.x + small_radius, self.plus_start_point.y)
+            second_bend_center = Point(self.offset_x + (trace_center_width / 2) - big_radius, math.fabs(self.offset_x * 2))
+
+            # Order of primitives: [0: Arc1, 1: Arc2, 2: Line between Arc1 and Arc2]
+            self.minus_primitives.append(Arc(first_bend_center, big_radius, math.pi, -math.pi - self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(Arc(first_bend_center.copy(), small_radius, math.pi, -math.pi - self.middle_tangent_angle, self.trace_width))
+
+            self.minus_primitives.append(Arc(second_bend_center, small_radius, 0, -(2*math.pi) - self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(Arc(second_bend_center.copy(), big_radius, 0, -(2*math.pi) - self.middle_tangent_angle, self.trace_width))
+        else:
+            first_bend_center = Point(self.minus_start_point.x - small_radius, self.minus_start_point.y)
+            second_bend_center = Point(self.offset_x - (trace_center_width / 2) + big_radius, math.fabs(self.offset_x * 2))
+
+            # Order of primitives: [0: Arc1, 1: Arc2, 2: Line between Arc1 and Arc2]
+            self.minus_primitives.append(Arc(first_bend_center, small_radius, 0, self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(Arc(first_bend_center.copy(), big_radius, 0, self.middle_tangent_angle, self.trace_width))
+
+            self.minus_primitives.append(Arc(second_bend_center, big_radius, math.pi, math.pi + self.middle_tangent_angle, self.trace_width))
+            self.plus_primitives.append(Arc(second_bend_center.copy(), small_radius, math.pi, math.pi + self.middle_tangent_angle, self.trace_width))
+
+        self.minus_primitives.append(self.minus_primitives[0].get_tangent_line(1))
+        self.minus_primitives[-1] = self.minus_primitives[-1].extend_to_intersection_with_x(self.minus_primitives[1].get_exit_point().x)
+        diff = self.minus_primitives[1].get_exit_point().y - self.minus_primitives[-1].end.y
+        self.minus_primitives[1].center.y -= diff
+
+        self.plus_primitives.append(self.plus_primitives[0].get_tangent_line(1))
+        self.plus_primitives[-1] = self.plus_primitives[-1].extend_to_intersection_with_x(self.plus_primitives[1].get_exit_point().x)
+        diff = self.plus_primitives[1].get_exit_point().y - self.plus_primitives[-1].end.y
+        self.plus_primitives[1].center.y -= diff
+
+
+        self.minus_end_point = self.minus_primitives[1].get_start_point()
+        self.plus_end_point = self.plus_primitives[1].get_start_point()
+
+    def get_general_direction(self):
+        direction = "left"
+        if self.offset_dir:
+            direction = "right"
+        
+        return direction
+    
+    def generate_footprint_name(self):
+        return strafe_footprint_name(self.trace_width, self.trace_gap, self.offset_x, self.name_suffix)
+    
+    def generate_footprint_description(self):
+        return f"differential pair strafe/offset to the {self.get_general_direction()}, trae width: {self.trace_width} mm trace gap {self.trace_gap} mm offset {math.fabs(self.offset_x)} mm"
+
+
 if __name__ == "__main__":
 
     import sys
     # Get command line arguments.
-    # Coordinate X, Coordinate Y, trace width, trace gap, offset, radius scale, middle_tangent_angle --preview --generate
+    # Coordinate X, Coordinate Y, trace width, trace gap, offset, radius scale, middle_tangent_angle --preview --interactive --generate --backend <template|sexpr> --deterministic-uuids --quantize --no-indent --profile <profile.json>
     if len(sys.argv) < 8:
-        print("Usage: script.py <coord_x> <coord_y> <trace_width> <trace_gap> <offset> <radius_scale> <middle_tangent_angle> --preview --generate")
+        print("Usage: script.py <coord_x> <coord_y> <trace_width> <trace_gap> <offset> <radius_scale> <middle_tangent_angle> --preview --interactive --generate --backend <template|sexpr> --deterministic-uuids --quantize --no-indent --profile <profile.json>")
         sys.exit(1)
 
     coord_x = float(sys.argv[1])
@@ -385,14 +322,35 @@ if __name__ == "__main__":
     radius_scale = float(sys.argv[6])
     middle_tangent_angle = float(sys.argv[7])
     preview = "--preview" in sys.argv
+    interactive = "--interactive" in sys.argv
     generate = "--generate" in sys.argv
+    deterministic_uuids = "--deterministic-uuids" in sys.argv
+    quantize = "--quantize" in sys.argv
+    indent = "--no-indent" not in sys.argv
+    backend = "template"
+    if "--backend" in sys.argv:
+        backend = sys.argv[sys.argv.index("--backend") + 1]
+    profile_path = None
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.enable()
 
     bend = Strafe(Point(coord_x, coord_y), trace_width, trace_gap, offset, radius_scale, middle_tangent_angle)
 
     if generate:
-        bend.generate_footprint_file()
+        bend.generate_footprint_file(backend=backend, deterministic_uuids=deterministic_uuids, quantize=quantize, indent=indent)
+
+    if profile_path is not None:
+        profiling.print_summary()
+        print("Wrote profile to {} and {}".format(*profiling.write_profile(profile_path)))
 
     if preview:
         bend.visualize()
 
+    if interactive:
+        from viz import TraceVisualizer
+        viz = TraceVisualizer()
+        viz.add_strafe_sliders(coord_x, coord_y, trace_width, trace_gap, offset, radius_scale, middle_tangent_angle)
+        viz.show("Strafe")
+
     exit(0)
\ No newline at end of file
@@ -0,0 +1,301 @@
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import StrafeBatch
+from library import GRID_PARAMETERS, expand_grid, load_grid
+from strafe import GENERATOR_VERSION
+from verify import DEFAULT_GAP_TOLERANCE, gap_profile
+
+# Design-space sweep: metrics of every Strafe in a dense parameter grid, and the
+# radius ratio / tangent angle trade-offs worth having.
+#
+# Grids use the library grid format (library.load_grid). Every point is measured
+# with the batch geometry engine, in chunks spread over a process pool:
+# - footprint_length: extent along the direction of travel
+# - bbox_width, bbox_height, bbox_area: copper bounding box of both traces, arcs
+#   included exactly, widened by half the trace width
+# - total_length: both traces together
+# - min_radius: inner radius of the tighter bend
+# - gap_deviation: largest departure of the centre-to-centre spacing from width + gap
+#
+# Within each trace class and offset (same width, gap and offset), the Pareto front
+# keeps the points no other point beats on footprint length, board area and bend
+# radius at once. Points whose gap deviates by more than the tolerance, such as
+# bends overlapping because they are too large for the offset, never make the front.
+#
+# Results are kept in a columnar cache: one .npy file per parameter and metric,
+# loaded memory-mapped, so a large cache costs no memory until rows are read.
+# (.npz archives cannot be memory-mapped.) Points are matched on their parameters
+# rounded to 1e-9, so rerunning with a refined grid only measures the new points.
+# A cache written by another GENERATOR_VERSION or with other metrics is discarded.
+
+METRICS = ("footprint_length", "bbox_width", "bbox_height", "bbox_area", "total_length", "min_radius", "gap_deviation")
+PARETO_OBJECTIVES = (("footprint_length", 1.0), ("bbox_area", 1.0), ("min_radius", -1.0))  # minimized after the sign
+GROUP_PARAMETERS = ("trace_width", "trace_gap", "offset")
+
+KEY_SCALE = 1e9  # parameters are matched on this grid, like cache.normalize_value
+CHUNK_ROWS = 4096  # points per worker task
+CACHE_META = "meta.json"
+
+FRONT_COLUMNS = GRID_PARAMETERS + METRICS
+
+
+def arc_bounds(cx, cy, radius, start, sweep):
+    # Exact x and y extremes of arcs: their end points and the axis crossings within the sweep
+    xs = [cx + radius * np.cos(start), cx + radius * np.cos(start + sweep)]
+    ys = [cy + radius * np.sin(start), cy + radius * np.sin(start + sweep)]
+    for axis_angle in (0.0, math.pi / 2, math.pi, 3 * math.pi / 2):
+        inside = np.remainder((axis_angle - start) * np.sign(sweep), 2 * math.pi) <= np.fabs(sweep)
+        xs.append(np.where(inside, cx + radius * math.cos(axis_angle), xs[0]))
+        ys.append(np.where(inside, cy + radius * math.sin(axis_angle), ys[0]))
+    return xs, ys
+
+
+def trace_bounds(batch: StrafeBatch):
+    # (x min, x max, y min, y max) of the copper of both traces, per strafe
+    xs, ys = list(), list()
+    for trace in (batch.minus, batch.plus):
+        xs += [trace.start_x, trace.end_x, trace.line_start_x, trace.line_end_x]
+        ys += [trace.start_y, trace.end_y, trace.line_start_y, trace.line_end_y]
+        sweep = trace.arc_sweep_angle()
+        for k in range(2):
+            arc_xs, arc_ys = arc_bounds(trace.arc_center_x[:, k], trace.arc_center_y[:, k], trace.arc_radius[:, k],
+                                        trace.arc_start_angle[:, k], sweep[:, k])
+            xs += arc_xs
+            ys += arc_ys
+    xs, ys = np.stack(xs), np.stack(ys)
+    half_width = batch.trace_width / 2
+    return xs.min(axis=0) - half_width, xs.max(axis=0) + half_width, ys.min(axis=0) - half_width, ys.max(axis=0) + half_width
+
+
+def compute_metrics(parameters):
+    """
+    Measure a chunk of strafes
+
+    Args:
+        parameters (np.ndarray): One row per strafe, columns in GRID_PARAMETERS order
+
+    Returns:
+        np.ndarray: One row per strafe, columns in METRICS order
+    """
+
+    batch = StrafeBatch(*parameters.T)
+    x_min, x_max, y_min, y_max = trace_bounds(batch)
+    with np.errstate(invalid="ignore"):
+        gap_deviation = np.fabs(gap_profile(batch) - (batch.trace_width + batch.trace_gap)[:, None]).max(axis=1)
+
+    metrics = np.empty((len(batch), len(METRICS)))
+    metrics[:, 0] = np.maximum(batch.minus.end_y, batch.plus.end_y) - batch.start_y
+    metrics[:, 1] = x_max - x_min
+    metrics[:, 2] = y_max - y_min
+    metrics[:, 3] = metrics[:, 1] * metrics[:, 2]
+    metrics[:, 4] = batch.minus_trace_length + batch.plus_trace_length
+    metrics[:, 5] = batch.small_radius
+    metrics[:, 6] = gap_deviation
+    return metrics
+
+
+def parameter_keys(parameters):
+    # One fixed-size byte string per row, for exact matching of rounded parameters
+    keys = np.ascontiguousarray(np.round(parameters * KEY_SCALE).astype(np.int64))
+    return keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+
+
+class SweepCache:
+    """Columnar store of measured points, one memory-mapped .npy file per column.
+
+    Columns are appended by rewriting them to temporary files that replace the old
+    ones, metadata last, so an interrupted sweep leaves the previous cache intact.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.columns = dict()
+        self.rows = 0
+
+        try:
+            with open(os.path.join(directory, CACHE_META), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["generator_version"] == GENERATOR_VERSION and tuple(meta["columns"]) == FRONT_COLUMNS:
+                self.columns = {name: np.load(self.column_path(name), mmap_mode="r") for name in FRONT_COLUMNS}
+                self.rows = meta["rows"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            self.columns = dict()
+            self.rows = 0
+        if any(len(column) != self.rows for column in self.columns.values()):
+            self.columns = dict()
+            self.rows = 0
+
+    def column_path(self, name: str):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def lookup(self, parameters):
+        """Cache row of every parameter row, -1 where not cached"""
+        rows = np.full(len(parameters), -1, dtype=np.int64)
+        if not self.rows or not len(parameters):
+            return rows
+        cached = parameter_keys(np.stack([self.columns[name] for name in GRID_PARAMETERS], axis=1))
+        order = np.argsort(cached)
+        keys = parameter_keys(parameters)
+        positions = np.minimum(np.searchsorted(cached[order], keys), self.rows - 1)
+        found = cached[order][positions] == keys
+        rows[found] = order[positions[found]]
+        return rows
+
+    def read(self, rows):
+        # Metrics of cache rows, shape (len(rows), len(METRICS))
+        return np.stack([np.asarray(self.columns[name][rows]) for name in METRICS], axis=1)
+
+    def append(self, parameters, metrics):
+        if not len(parameters):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        new_columns = dict(zip(GRID_PARAMETERS, parameters.T))
+        new_columns.update(zip(METRICS, metrics.T))
+        rows = self.rows + len(parameters)
+        for name in FRONT_COLUMNS:
+            temp_path = self.column_path(name) + ".tmp"
+            column = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float64, shape=(rows,))
+            if self.rows:
+                column[:self.rows] = self.columns[name]
+            column[self.rows:] = new_columns[name]
+            column.flush()
+            del column
+            os.replace(temp_path, self.column_path(name))
+
+        temp_path = os.path.join(self.directory, CACHE_META + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"generator_version": GENERATOR_VERSION, "columns": FRONT_COLUMNS, "rows": rows}, f)
+        os.replace(temp_path, os.path.join(self.directory, CACHE_META))
+
+        self.columns = {name: np.load(self.column_path(name), mmap_mode="r") for name in FRONT_COLUMNS}
+        self.rows = rows
+
+
+def pareto_front(objectives):
+    """
+    Rows of objectives (all minimized) that no other row beats in every column
+
+    Rows are visited in lexicographic order, so no later row can dominate an earlier
+    one; each row is compared with the front so far only. Of equal rows the first is kept.
+    """
+
+    front = list()
+    for i in np.lexsort(objectives.T[::-1]):
+        point = objectives[i]
+        if front and np.any(np.all(objectives[front] <= point, axis=1)):
+            continue
+        front.append(i)
+    return np.array(front, dtype=np.int64)
+
+
+def valid_parameters(parameters):
+    # Vectorized library.check_parameters
+    width, gap, offset, radius_scale, angle = parameters.T
+    return (width > 0) & (gap > 0) & (offset != 0) & (radius_scale > 0) & (angle > 0) & (angle < math.pi)
+
+
+def sweep(grid, cache_dir: str = None, workers: int = None, chunk_rows: int = CHUNK_ROWS,
+          gap_tolerance: float = DEFAULT_GAP_TOLERANCE):
+    """
+    Measure every point of a parameter grid and find the Pareto front of each trace class and offset
+
+    Args:
+        grid (list): Grid entries, as returned by library.load_grid
+        cache_dir (str, optional): Columnar cache directory, reused and extended. If None, nothing is cached
+        workers (int, optional): Process pool size. If None, uses the number of CPUs
+        chunk_rows (int, optional): Points measured per worker task
+        gap_tolerance (float, optional): Largest gap deviation of points on the front (mm)
+
+    Returns:
+        dict: parameters and metrics arrays (rows in grid order), front row indices, computed, reused
+              and skipped counts, elapsed time and throughput
+    """
+
+    start_time = time.perf_counter()
+    parameters = np.array(expand_grid(grid), dtype=float).reshape(-1, len(GRID_PARAMETERS))
+    valid = valid_parameters(parameters)
+    skipped = int((~valid).sum())
+    parameters = parameters[valid]
+
+    cache = SweepCache(cache_dir) if cache_dir is not None else None
+    metrics = np.full((len(parameters), len(METRICS)), np.nan)
+    rows = cache.lookup(parameters) if cache is not None else np.full(len(parameters), -1)
+    cached = rows >= 0
+    if cached.any():
+        metrics[cached] = cache.read(rows[cached])
+
+    missing = np.flatnonzero(~cached)
+    if len(missing):
+        chunks = [parameters[missing[start:start + chunk_rows]] for start in range(0, len(missing), chunk_rows)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            metrics[missing] = np.concatenate(list(executor.map(compute_metrics, chunks)))
+        if cache is not None:
+            cache.append(parameters[missing], metrics[missing])
+
+    # Pareto front per (trace_width, trace_gap, offset) over the points with a good gap
+    objectives = np.stack([metrics[:, METRICS.index(name)] * sign for name, sign in PARETO_OBJECTIVES], axis=1)
+    usable = (metrics[:, METRICS.index("gap_deviation")] <= gap_tolerance) & np.isfinite(objectives).all(axis=1)
+    _, group = np.unique(parameter_keys(parameters[:, :len(GROUP_PARAMETERS)]), return_inverse=True)
+    group = group.ravel()
+    front = list()
+    candidates = np.flatnonzero(usable)
+    for members in np.split(candidates[np.argsort(group[candidates], kind="stable")],
+                            np.flatnonzero(np.diff(np.sort(group[candidates]))) + 1):
+        if len(members):
+            front.append(members[pareto_front(objectives[members])])
+    front = np.sort(np.concatenate(front)) if front else np.zeros(0, dtype=np.int64)
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        "parameters": parameters,
+        "metrics": metrics,
+        "front": front,
+        "groups": int(group.max()) + 1 if len(group) else 0,
+        "unusable": int((~usable).sum()),
+        "computed": len(missing),
+        "reused": int(cached.sum()),
+        "skipped": skipped,
+        "elapsed": elapsed,
+        "throughput": len(parameters) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def write_front(path: str, parameters, metrics, front):
+    # Front points grouped by trace class and offset, shortest footprint first
+    order = front[np.lexsort((metrics[front, 0], parameters[front, 2], parameters[front, 1], parameters[front, 0]))]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FRONT_COLUMNS)
+        for i in order:
+            writer.writerow([repr(float(value)) for value in (*parameters[i], *metrics[i])])
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure a Strafe parameter grid and find the Pareto front per trace class")
+    parser.add_argument("grid", help="Parameter grid file (.toml or .csv), as for library.py")
+    parser.add_argument("--cache", default="strafe_sweep_cache", help="Columnar cache directory, reused between runs")
+    parser.add_argument("--no-cache", action="store_true", help="Measure every point, without reading or writing the cache")
+    parser.add_argument("--front", default="strafe_front.csv", help="Pareto front output (CSV)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--gap-tolerance", type=float, default=DEFAULT_GAP_TOLERANCE,
+                        help="Largest gap deviation of points on the front (mm)")
+    args = parser.parse_args()
+
+    result = sweep(load_grid(args.grid), None if args.no_cache else args.cache, workers=args.jobs,
+                   gap_tolerance=args.gap_tolerance)
+    write_front(args.front, result["parameters"], result["metrics"], result["front"])
+
+    print(f"Swept {len(result['parameters'])} points in {result['elapsed']:.2f} s ({result['throughput']:.0f} points/s): "
+          f"{result['computed']} computed, {result['reused']} reused from the cache, {result['skipped']} invalid skipped")
+    print(f"Pareto front: {len(result['front'])} points over {result['groups']} trace classes and offsets, "
+          f"{result['unusable']} points off by more than {args.gap_tolerance} mm in gap, written to {args.front}")
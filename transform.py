@@ -0,0 +1,245 @@
+import functools
+import math
+from array import array
+
+import numpy as np
+
+from primitives import Point, PrimitiveBuffer
+
+# Affine placement transforms for footprint geometry.
+#
+# A Transform maps geometry coordinates (y up, as the footprint classes compute
+# them) by p' = M p + t, with M a rotation, a mirror or a product of them. Footprint
+# files flip y, so counter-clockwise here is counter-clockwise in KiCad as well.
+# Only these keep arcs circular, so other matrices are refused.
+#
+# Both traces of every footprint are packed into PrimitiveBuffer records and moved
+# as one array: arc centres and line end points by the matrix, arc start angles by
+# turning their direction vector, arc end angles by keeping the sweep, which a
+# mirror reverses. Any number of transforms apply to the records of any number of
+# footprints in one einsum, so rotated variants of a footprint all come from a
+# single calculate_trace. Trace lengths, and with them die_length, do not change.
+
+ROTATION_STEP = 45.0  # degrees between the default variants
+DEFAULT_ROTATIONS = tuple(ROTATION_STEP * i for i in range(int(360 / ROTATION_STEP)))
+RIGID_TOLERANCE = 1e-9
+
+# Footprint attributes moved with the primitives
+POINT_NAMES = ("minus_start_point", "plus_start_point", "minus_end_point", "plus_end_point", "start")
+
+
+def rotation_cos_sin(degrees: float):
+    # cos and sin, exact at multiples of 90 degrees so that right angles leave no 6e-17 residue
+    quarter, rest = divmod(degrees, 90.0)
+    if rest == 0:
+        return ((1.0, 0.0), (0.0, 1.0), (-1.0, 0.0), (0.0, -1.0))[int(quarter) % 4]
+    angle = math.radians(degrees)
+    return math.cos(angle), math.sin(angle)
+
+
+class Transform:
+    """Rotation, mirror and translation of footprint geometry: p' = matrix @ p + offset.
+
+    Compose with @: (a @ b) applies b first, then a.
+    """
+
+    __slots__ = ("matrix", "offset")
+
+    def __init__(self, matrix=((1.0, 0.0), (0.0, 1.0)), offset=(0.0, 0.0)):
+        self.matrix = np.asarray(matrix, dtype=float).reshape(2, 2)
+        self.offset = np.asarray(offset, dtype=float).reshape(2)
+        (a, b), (c, d) = self.matrix.tolist()
+        if max(math.fabs(a * a + b * b - 1), math.fabs(c * c + d * d - 1), math.fabs(a * c + b * d)) > RIGID_TOLERANCE:
+            raise ValueError("only rotations, mirrors and translations keep arcs circular")
+
+    @classmethod
+    def rotation(cls, degrees: float, center: Point = None):
+        """Counter-clockwise rotation as seen in KiCad, about center (default the origin)"""
+        cos, sin = rotation_cos_sin(degrees)
+        x, y = (0.0, 0.0) if center is None else (center.x, center.y)
+        return cls(((cos, -sin), (sin, cos)), (x - cos * x + sin * y, y - sin * x - cos * y))
+
+    @classmethod
+    def mirror_x(cls, center: Point = None):
+        """Mirror left to right about the vertical line through center (default the origin), as KiCad flips a footprint"""
+        return cls(((-1.0, 0.0), (0.0, 1.0)), (0.0 if center is None else 2 * center.x, 0.0))
+
+    @classmethod
+    def mirror_y(cls):
+        """Mirror top to bottom, y -> -y"""
+        return cls(((1.0, 0.0), (0.0, -1.0)))
+
+    @classmethod
+    def translation(cls, dx: float, dy: float):
+        return cls(offset=(dx, dy))
+
+    def __matmul__(self, other):
+        return Transform(self.matrix @ other.matrix, self.matrix @ other.offset + self.offset)
+
+    def is_identity(self):
+        return self.matrix.tolist() == [[1.0, 0.0], [0.0, 1.0]] and not self.offset.any()
+
+    def determinant(self):
+        # 1 for rotations, -1 for mirrored transforms
+        (a, b), (c, d) = self.matrix.tolist()
+        return 1.0 if a * d - b * c > 0 else -1.0
+
+    def apply_point(self, point: Point):
+        x, y = (self.matrix @ (point.x, point.y) + self.offset).tolist()
+        return Point(x, y)
+
+    def apply_primitives(self, primitives):
+        """Transformed copies of a list of Arc and Line primitives"""
+        records = np.frombuffer(PrimitiveBuffer(primitives).data, dtype=float).reshape(-1, PrimitiveBuffer.RECORD_SIZE)
+        moved = transform_records(records, self.matrix[None], self.offset[None])
+        return [PrimitiveBuffer.record_primitive(record) for record in moved[0].tolist()]
+
+
+def transform_records(records, matrices, offsets):
+    """
+    Apply transforms to PrimitiveBuffer records
+
+    Args:
+        records (np.ndarray): (m, RECORD_SIZE) primitive records
+        matrices (np.ndarray): (k, 2, 2) rotation or mirror matrices
+        offsets (np.ndarray): (k, 2) translations, or (k, m, 2) for a translation per record
+
+    Returns:
+        np.ndarray: (k, m, RECORD_SIZE) records, one set per transform
+    """
+
+    if offsets.ndim == 2:
+        offsets = offsets[:, None, :]
+    per_record = offsets.shape[1] == len(records)
+    determinants = np.where(matrices[:, 0, 0] * matrices[:, 1, 1] > matrices[:, 0, 1] * matrices[:, 1, 0], 1.0, -1.0)
+
+    moved = np.empty((len(matrices),) + records.shape)
+    moved[:] = records
+    arcs = records[:, 0] == PrimitiveBuffer.ARC_RECORD
+    lines = ~arcs
+
+    def move(points, mask):
+        return np.einsum("kij,mj->kmi", matrices, points) + (offsets[:, mask] if per_record else offsets)
+
+    # Arcs: centre, radius, start angle, end angle, width
+    arc_records = records[arcs]
+    moved[:, arcs, 1:3] = move(arc_records[:, 1:3], arcs)
+    start = arc_records[:, 4]
+    direction = np.einsum("kij,mj->kmi", matrices, np.stack((np.cos(start), np.sin(start)), axis=1))
+    moved_start = np.arctan2(direction[:, :, 1], direction[:, :, 0])
+    moved[:, arcs, 4] = moved_start
+    moved[:, arcs, 5] = moved_start + determinants[:, None] * (arc_records[:, 5] - start)
+
+    # Lines: start, end, width
+    moved[:, lines, 1:3] = move(records[lines, 1:3], lines)
+    moved[:, lines, 3:5] = move(records[lines, 3:5], lines)
+
+    # The identity leaves records bit for bit as they were, angles included
+    identity = (matrices == np.eye(2)).all(axis=(1, 2)) & ~offsets.reshape(len(matrices), -1).any(axis=1)
+    moved[identity] = records
+    return moved
+
+
+def rotation_suffix(degrees: float, mirrored: bool = False):
+    # Footprint name suffix of a variant, empty for the footprint as generated
+    suffix = f"_rot{degrees:g}" if degrees % 360 else ""
+    return suffix + ("_mirrored" if mirrored else "")
+
+
+def move_footprints(footprints, matrices, offsets, name_suffixes):
+    # Copies of every footprint under every transform, offsets (k, footprints, 2). Returns one list of variants per footprint
+    data = array("d")
+    counts = list()
+    for footprint in footprints:
+        minus, plus = footprint.get_primitive_buffers()
+        data.extend(minus.data)
+        data.extend(plus.data)
+        counts.append((len(minus), len(plus)))
+    records = np.frombuffer(data, dtype=float).reshape(-1, PrimitiveBuffer.RECORD_SIZE)
+    owners = np.repeat(np.arange(len(footprints)), [minus + plus for minus, plus in counts])
+    moved_records = transform_records(records, matrices, offsets[:, owners]).tolist()
+
+    points = np.array([[(getattr(footprint, name).x, getattr(footprint, name).y) for name in POINT_NAMES]
+                       for footprint in footprints], dtype=float)
+    moved_points = (np.einsum("kij,npj->knpi", matrices, points) + offsets[:, :, None, :]).tolist()
+    identity = ((matrices == np.eye(2)).all(axis=(1, 2))[:, None] & ~offsets.any(axis=2)).tolist()
+
+    variants = [list() for _ in footprints]
+    for k, name_suffix in enumerate(name_suffixes):
+        first = 0
+        for i, footprint in enumerate(footprints):
+            minus, plus = counts[i]
+            # A shallow copy, as copy.copy makes it but without its protocol lookups
+            variant = footprint.__class__.__new__(footprint.__class__)
+            variant.__dict__.update(footprint.__dict__)
+            variant.name_suffix = footprint.name_suffix + name_suffix
+            variants[i].append(variant)
+            # The identity keeps the footprint's own primitives and points, so that its file is unchanged
+            if not identity[k][i]:
+                primitives = [PrimitiveBuffer.record_primitive(record) for record in moved_records[k][first:first + minus + plus]]
+                variant.minus_primitives = primitives[:minus]
+                variant.plus_primitives = primitives[minus:]
+                for name, (x, y) in zip(POINT_NAMES, moved_points[k][i]):
+                    setattr(variant, name, Point(x, y))
+            first += minus + plus
+    return variants
+
+
+def transform_footprints(footprint, transforms, name_suffixes):
+    """
+    Transformed copies of a footprint, from its geometry as already computed
+
+    Args:
+        footprint (DiffPairFootprint): A Strafe or other footprint with calculated traces
+        transforms (list): Transform instances
+        name_suffixes (list): Appended to the footprint's name_suffix, one per transform
+
+    Returns:
+        list: Footprint copies with moved primitives, start and end points
+    """
+
+    matrices = np.stack([transform.matrix for transform in transforms])
+    offsets = np.stack([transform.offset for transform in transforms])[:, None, :]
+    return move_footprints([footprint], matrices, offsets, name_suffixes)[0]
+
+
+@functools.lru_cache(maxsize=64)
+def rotation_matrices(rotations: tuple, mirror: bool = False):
+    # (k, 2, 2) matrices of the rotations about the origin, after a left to right mirror if mirror
+    matrices = np.stack([Transform.rotation(degrees).matrix for degrees in rotations])
+    if mirror:
+        matrices = matrices @ Transform.mirror_x().matrix
+    matrices.flags.writeable = False
+    return matrices
+
+
+def rotate_footprints(footprints, rotations=DEFAULT_ROTATIONS, mirror: bool = False):
+    """
+    Every footprint rotated about its own start point by every angle in rotations, all in one array operation
+
+    Args:
+        footprints (list): Footprints with calculated traces
+        rotations (iterable, optional): Angles in degrees, counter-clockwise, every 45 by default.
+                                        0 gives the footprint as generated
+        mirror (bool, optional): Mirror left to right before rotating, and add _mirrored to the names
+
+    Returns:
+        list: For each footprint, its variants in the order of rotations, named with a _rot<degrees> suffix
+    """
+
+    rotations = tuple(rotations)
+    matrices = rotation_matrices(rotations, mirror)
+    centers = np.array([(footprint.start.x, footprint.start.y) for footprint in footprints], dtype=float)
+    offsets = centers[None] - np.einsum("kij,nj->kni", matrices, centers)
+    return move_footprints(footprints, matrices, offsets, [rotation_suffix(degrees, mirror) for degrees in rotations])
+
+
+def rotated_variants(footprint, rotations=DEFAULT_ROTATIONS, mirror: bool = False):
+    """
+    The footprint rotated about its start point by every angle in rotations, see rotate_footprints
+
+    Returns:
+        list: One footprint per rotation, named with a _rot<degrees> suffix
+    """
+
+    return rotate_footprints([footprint], rotations, mirror)[0]
@@ -0,0 +1,162 @@
+import csv
+import math
+
+import numpy as np
+
+from batch import StrafeBatch
+
+# Coupling-gap and skew verification for batches of strafes.
+#
+# Both traces are sampled along their arcs and middle tangent line. For every
+# sample on the plus trace the exact distance to the minus trace (its two arcs
+# and line) is the local centre-to-centre spacing, which should equal
+# trace_width + trace_gap everywhere. The skew is the difference between the
+# plus and minus trace lengths that end up as die_length.
+#
+# Strafes whose bends are too large for their offset (the middle tangent line
+# would need a negative length) come out with overlapping bends, and fail the
+# gap check.
+
+DEFAULT_GAP_TOLERANCE = 1e-4  # mm
+DEFAULT_LENGTH_TOLERANCE = 1e-6  # mm
+ARC_SAMPLES = 64
+LINE_SAMPLES = 16
+CHUNK_SIZE = 8192
+
+VERIFY_MODES = ("off", "warn", "fail")
+REPORT_COLUMNS = ("trace_width", "trace_gap", "offset", "radius_scale", "middle_tangent_angle",
+                  "gap_min", "gap_max", "gap_deviation", "length_skew", "passed")
+
+
+def sample_trace(trace, rows, arc_samples: int = ARC_SAMPLES, line_samples: int = LINE_SAMPLES):
+    # Points along both arcs and the line of one trace, shape (len(rows), samples)
+    t = np.linspace(0.0, 1.0, arc_samples)
+    sweep = trace.arc_sweep_angle()[rows]
+    xs, ys = list(), list()
+    for k in range(2):
+        angle = trace.arc_start_angle[rows, k, None] + sweep[:, k, None] * t[None, :]
+        xs.append(trace.arc_center_x[rows, k, None] + trace.arc_radius[rows, k, None] * np.cos(angle))
+        ys.append(trace.arc_center_y[rows, k, None] + trace.arc_radius[rows, k, None] * np.sin(angle))
+
+    t = np.linspace(0.0, 1.0, line_samples)
+    xs.append(trace.line_start_x[rows, None] + (trace.line_end_x - trace.line_start_x)[rows, None] * t[None, :])
+    ys.append(trace.line_start_y[rows, None] + (trace.line_end_y - trace.line_start_y)[rows, None] * t[None, :])
+    return np.concatenate(xs, axis=1), np.concatenate(ys, axis=1)
+
+
+def distance_to_arcs(x, y, trace, rows):
+    # Exact distance from points (len(rows), samples) to each arc of a trace, shape (2, len(rows), samples)
+    sweep = trace.arc_sweep_angle()[rows]
+    distances = list()
+    for k in range(2):
+        cx = trace.arc_center_x[rows, k, None]
+        cy = trace.arc_center_y[rows, k, None]
+        radius = trace.arc_radius[rows, k, None]
+        start = trace.arc_start_angle[rows, k, None]
+        span = sweep[:, k, None]
+
+        # A point projects onto the arc when its angle lies within the swept range
+        angle = np.arctan2(y - cy, x - cx)
+        along = np.remainder((angle - start) * np.sign(span), 2 * math.pi)
+        on_arc = along <= np.fabs(span)
+
+        start_x, start_y = cx + radius * np.cos(start), cy + radius * np.sin(start)
+        end_x, end_y = cx + radius * np.cos(start + span), cy + radius * np.sin(start + span)
+        to_ends = np.minimum(np.hypot(x - start_x, y - start_y), np.hypot(x - end_x, y - end_y))
+        distances.append(np.where(on_arc, np.fabs(np.hypot(x - cx, y - cy) - radius), to_ends))
+    return np.stack(distances)
+
+
+def distance_to_line(x, y, trace, rows):
+    start_x, start_y = trace.line_start_x[rows, None], trace.line_start_y[rows, None]
+    dx = (trace.line_end_x - trace.line_start_x)[rows, None]
+    dy = (trace.line_end_y - trace.line_start_y)[rows, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(((x - start_x) * dx + (y - start_y) * dy) / (dx * dx + dy * dy), 0.0, 1.0)
+    t = np.nan_to_num(t)
+    return np.hypot(x - (start_x + t * dx), y - (start_y + t * dy))
+
+
+def gap_profile(batch: StrafeBatch, rows=None):
+    # Centre-to-centre spacing sampled along the plus trace, shape (len(rows), samples)
+    rows = np.arange(len(batch)) if rows is None else np.asarray(rows)
+    x, y = sample_trace(batch.plus, rows)
+    return np.minimum(distance_to_arcs(x, y, batch.minus, rows).min(axis=0), distance_to_line(x, y, batch.minus, rows))
+
+
+class VerificationReport:
+    """Per-strafe verification results for a StrafeBatch, one row per strafe."""
+
+    def __init__(self, batch: StrafeBatch, gap_tolerance: float, length_tolerance: float):
+        n = len(batch)
+        self.batch = batch
+        self.gap_tolerance = gap_tolerance
+        self.length_tolerance = length_tolerance
+
+        self.gap_min = np.zeros(n)
+        self.gap_max = np.zeros(n)
+        self.gap_deviation = np.zeros(n)
+        self.length_skew = np.zeros(n)
+        self.passed = np.zeros(n, dtype=bool)
+
+    def violations(self):
+        return np.flatnonzero(~self.passed)
+
+    def write_csv(self, path: str):
+        batch = self.batch
+        columns = (batch.trace_width, batch.trace_gap, batch.offset_x, batch.radius_scale, batch.middle_tangent_angle,
+                   self.gap_min, self.gap_max, self.gap_deviation, self.length_skew)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            for i in range(len(batch)):
+                writer.writerow([repr(float(column[i])) for column in columns] + [bool(self.passed[i])])
+
+
+def verify_batch(batch: StrafeBatch, gap_tolerance: float = DEFAULT_GAP_TOLERANCE,
+                 length_tolerance: float = DEFAULT_LENGTH_TOLERANCE):
+    """
+    Check constant coupling gap and zero skew for every strafe in a batch
+
+    Args:
+        batch (StrafeBatch): Strafes to check
+        gap_tolerance (float): Allowed deviation of the centre-to-centre spacing from width + gap (mm)
+        length_tolerance (float): Allowed plus/minus trace length difference (mm)
+
+    Returns:
+        VerificationReport: Gap profile extremes, worst gap deviation, length skew and pass/fail per strafe
+    """
+
+    report = VerificationReport(batch, gap_tolerance, length_tolerance)
+    nominal = batch.trace_width + batch.trace_gap
+
+    for start in range(0, len(batch), CHUNK_SIZE):
+        rows = np.arange(start, min(start + CHUNK_SIZE, len(batch)))
+        gaps = gap_profile(batch, rows)
+        report.gap_min[rows] = gaps.min(axis=1)
+        report.gap_max[rows] = gaps.max(axis=1)
+        report.gap_deviation[rows] = np.fabs(gaps - nominal[rows, None]).max(axis=1)
+
+    report.length_skew = np.fabs(batch.plus_trace_length - batch.minus_trace_length)
+
+    report.passed = (report.gap_deviation <= gap_tolerance) & (report.length_skew <= length_tolerance)
+    return report
+
+
+if __name__ == "__main__":
+
+    import sys
+    import time
+    from batch import random_parameters
+
+    # Usage: verify.py [count] - verifies a random sweep and times it
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    batch = StrafeBatch(*random_parameters(count))
+
+    start_time = time.perf_counter()
+    report = verify_batch(batch)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Verified {count} strafes in {elapsed:.3f} s ({count / elapsed:,.0f} strafes/s)")
+    print(f"Worst gap deviation {report.gap_deviation.max():.3e} mm, worst skew {report.length_skew.max():.3e} mm, "
+          f"{len(report.violations())} violations")
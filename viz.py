@@ -1,9 +1,58 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Arc
+from matplotlib.transforms import Bbox
+from matplotlib.widgets import Slider
+import functools
 import math
+import time
+from primitives import Point, VIZ_WIDTH_SCALE, DEFAULT_CHORD_TOLERANCE
+
+# Interactive Strafe preview: one slider per Strafe parameter, in the order of its
+# arguments, as (parameter, label, minimum, maximum, step). Values are quantized to
+# the steps before the geometry lookup, so scrubbing back and forth hits the cache.
+STRAFE_SLIDERS = (
+    ("start_x", "Start x (mm)", -5.0, 5.0, 0.01),
+    ("start_y", "Start y (mm)", -5.0, 5.0, 0.01),
+    ("trace_width", "Trace width (mm)", 0.05, 1.0, 0.005),
+    ("trace_gap", "Trace gap (mm)", 0.05, 1.0, 0.005),
+    ("offset_x", "Offset (mm)", -10.0, 10.0, 0.01),
+    ("radius_scale", "Radius scale", 0.01, 3.0, 0.005),
+    ("middle_tangent_angle", "Middle tangent angle (rad)", 0.05, 3.09, 0.005),
+)
+PREVIEW_CACHE_SIZE = 512
+FRAME_BUDGET = 1 / 60  # s
+VIEW_MARGIN = 2.0  # view half-size over the traces' half-size after a refit
+ZOOM_IN_RATIO = 5.0  # traces this much smaller than the view are refitted when a drag ends
+SLIDER_PAD = 3  # px around a slider row, for its handle
+
+
+def trace_xy(primitives, chord_tolerance=DEFAULT_CHORD_TOLERANCE):
+    """x and y arrays of all primitives of a trace, separated by NaN so one line artist draws them"""
+    points = list()
+    for primitive in primitives:
+        points.extend(primitive.tessellate(chord_tolerance))
+        points.append((math.nan, math.nan))
+    xy = np.array(points)
+    return xy[:, 0], xy[:, 1]
+
+
+def quantize_slider_value(value, step):
+    """A slider value on its step grid: Slider.set_val does not snap, and float noise would miss the cache"""
+    return round(value / step) * step
+
+
+@functools.lru_cache(maxsize=PREVIEW_CACHE_SIZE)
+def strafe_preview_geometry(start_x, start_y, trace_width, trace_gap, offset_x, radius_scale, middle_tangent_angle):
+    """Drawable geometry of a Strafe: minus (x, y), plus (x, y), minus length, plus length"""
+    from strafe import Strafe
+    if offset_x == 0:
+        raise ValueError("offset must be non-zero")
+    strafe = Strafe(Point(start_x, start_y), trace_width, trace_gap, offset_x, radius_scale, middle_tangent_angle)
+    if not (math.isfinite(strafe.minus_trace_length) and math.isfinite(strafe.plus_trace_length)):
+        raise ValueError("trace length is not finite")
+    return trace_xy(strafe.minus_primitives), trace_xy(strafe.plus_primitives), strafe.minus_trace_length, strafe.plus_trace_length
 
-VIZ_WIDTH_SCALE = 10
 
 class TraceVisualizer:
     def __init__(self, figsize=(12, 8)):
@@ -23,10 +72,10 @@ class TraceVisualizer:
         start_rad = start_angle_rad
         end_rad = end_angle_rad
 
-        # Handle angle wrapping
-        if end_rad < start_rad:
-            end_rad += 2 * math.pi
-            
+        # Draw the arc the short way round, clockwise or counterclockwise, as KiCad does
+        sweep = math.remainder(end_rad - start_rad, 2 * math.pi)
+        end_rad = start_rad + sweep
+
         angles = np.linspace(start_rad, end_rad, 100)
         x_points = center.x + radius * np.cos(angles)
         y_points = center.y + radius * np.sin(angles)
@@ -41,6 +90,174 @@ class TraceVisualizer:
         """Add text annotation"""
         self.ax.annotate(text, (point.x, point.y), fontsize=fontsize)
 
+    def add_strafe_sliders(self, start_x=0.0, start_y=0.0, trace_width=0.2, trace_gap=0.2, offset_x=4.0, radius_scale=0.2,
+                           middle_tangent_angle=1.2):
+        """Draw a Strafe with a slider for every parameter, updated in place on every change"""
+        self.fig.subplots_adjust(bottom=0.4)
+        self.sliders = dict()
+        values = dict(start_x=start_x, start_y=start_y, trace_width=trace_width, trace_gap=trace_gap, offset_x=offset_x,
+                      radius_scale=radius_scale, middle_tangent_angle=middle_tangent_angle)
+        for i, (name, label, minimum, maximum, step) in enumerate(STRAFE_SLIDERS):
+            slider_ax = self.fig.add_axes((0.25, 0.03 + 0.045 * (len(STRAFE_SLIDERS) - 1 - i), 0.5, 0.03))
+            slider = Slider(slider_ax, label, minimum, maximum, valinit=values[name], valstep=step, valfmt="%.3f")
+            # Only the bar, the handle and the value move. They are blitted over the saved
+            # slider row instead of redrawing the slider's axes or the whole figure.
+            slider.drawon = False
+            for artist in (slider.poly, slider._handle, slider.valtext):
+                artist.set_animated(True)
+            slider.on_changed(self.update_strafe)
+            self.sliders[name] = slider
+
+        # The artists are created once; update_strafe only replaces their data. Animated
+        # artists are left out of full redraws and drawn over the saved background. The
+        # lengths have their own axes, outside the traces, and are only redrawn when they
+        # change. Only the numbers are animated: rasterising glyphs is most of a frame, so
+        # the labels and units are static text in the background, on the same lines.
+        self.minus_line, = self.ax.plot([], [], color='blue', solid_capstyle='round', animated=True)
+        self.plus_line, = self.ax.plot([], [], color='red', solid_capstyle='round', animated=True)
+        self.info_ax = self.fig.add_axes((0.02, 0.89, 0.35, 0.1))
+        self.info_ax.set_axis_off()
+        text_style = dict(transform=self.info_ax.transAxes, va='top', family='monospace')
+        self.info_ax.text(0, 1, "minus\nplus\nskew", **text_style)
+        self.info_ax.text(0, 1, "\n".join(" " * 16 + "mm" for _ in range(3)), **text_style)
+        self.length_text = self.info_ax.text(0, 1, "", animated=True, **text_style)
+        self.backgrounds = None
+        self.drawn_values = dict()
+        self.drawn_text = None
+        self.extent = None
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        self.fig.canvas.mpl_connect('button_release_event', self.end_drag)
+        self.frame_times = list()
+        self.frame_redraws = list()
+        self.update_strafe()
+        return self.sliders
+
+    def slider_region(self, slider):
+        """The slider's row: its axes and the value text right of it, where its animated artists draw"""
+        box = slider.ax.bbox
+        return Bbox(((box.x0 - SLIDER_PAD, box.y0 - SLIDER_PAD), (self.fig.bbox.x1, box.y1 + SLIDER_PAD)))
+
+    def on_draw(self, _=None):
+        """After a full redraw: save the static background of each region and draw the animated artists over it"""
+        canvas = self.fig.canvas
+        self.backgrounds = {"traces": canvas.copy_from_bbox(self.ax.bbox), "info": canvas.copy_from_bbox(self.info_ax.bbox)}
+        for name, slider in self.sliders.items():
+            self.backgrounds[name] = canvas.copy_from_bbox(self.slider_region(slider))
+            self.draw_slider_artists(slider)
+        self.drawn_values = {name: slider.val for name, slider in self.sliders.items()}
+        self.ax.draw_artist(self.minus_line)
+        self.ax.draw_artist(self.plus_line)
+        self.info_ax.draw_artist(self.length_text)
+        self.drawn_text = self.length_text.get_text()
+
+    def draw_slider_artists(self, slider):
+        for artist in (slider.poly, slider._handle, slider.valtext):
+            slider.ax.draw_artist(artist)
+
+    def update_strafe(self, _=None):
+        """Slider callback: new geometry (cached) into the existing artists, then a blit or a redraw"""
+        start_time = time.perf_counter()
+        self.redrawn = False
+        values = {name: quantize_slider_value(float(self.sliders[name].val), step) for name, *_, step in STRAFE_SLIDERS}
+        try:
+            (minus_x, minus_y), (plus_x, plus_y), minus_length, plus_length = strafe_preview_geometry(
+                *(values[name] for name, *_ in STRAFE_SLIDERS))
+        except (ValueError, ArithmeticError) as e:
+            self.minus_line.set_data([], [])
+            self.plus_line.set_data([], [])
+            self.length_text.set_text("\n".join([f"{'':6}{'-':>9}"] * 3) + f"\n\ninvalid parameters: {e}")
+            self.blit_strafe()
+            self.record_frame(start_time)
+            return
+
+        width = values["trace_width"] * VIZ_WIDTH_SCALE
+        self.minus_line.set_data(minus_x, minus_y)
+        self.plus_line.set_data(plus_x, plus_y)
+        self.minus_line.set_linewidth(width)
+        self.plus_line.set_linewidth(width)
+        self.length_text.set_text(f"{'':6}{minus_length:9.4f}\n{'':6}{plus_length:9.4f}\n"
+                                  f"{'':6}{plus_length - minus_length:+9.2e}")
+
+        # Keep the view while the traces stay inside it, so frames during a drag only blit.
+        # Traces that leave it get a refit with room to grow, square so the aspect stays equal,
+        # which needs a full redraw for the ticks. Zooming in waits for the end of the drag.
+        x = np.concatenate((minus_x, plus_x))
+        y = np.concatenate((minus_y, plus_y))
+        low_x, high_x, low_y, high_y = np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)
+        self.extent = (low_x, high_x, low_y, high_y, max(high_x - low_x, high_y - low_y) / 2 + values["trace_width"])
+        view_low_x, view_high_x = self.ax.get_xlim()
+        view_low_y, view_high_y = self.ax.get_ylim()
+        if (self.backgrounds is not None
+                and view_low_x <= low_x and high_x <= view_high_x and view_low_y <= low_y and high_y <= view_high_y):
+            self.blit_strafe()
+        else:
+            self.refit_view()
+        self.record_frame(start_time)
+
+    def refit_view(self):
+        """Center the view on the traces, VIEW_MARGIN times their size, and redraw the whole figure"""
+        low_x, high_x, low_y, high_y, half = self.extent
+        center_x, center_y = (low_x + high_x) / 2, (low_y + high_y) / 2
+        self.ax.set_xlim(center_x - VIEW_MARGIN * half, center_x + VIEW_MARGIN * half)
+        self.ax.set_ylim(center_y - VIEW_MARGIN * half, center_y + VIEW_MARGIN * half)
+        self.redrawn = True
+        self.fig.canvas.draw_idle()
+
+    def end_drag(self, _=None):
+        """Mouse release: zoom in on traces that shrank well inside the view during the drag"""
+        if self.extent is None:
+            return
+        start_time = time.perf_counter()
+        self.redrawn = False
+        view_low_x, view_high_x = self.ax.get_xlim()
+        if view_high_x - view_low_x > 2 * ZOOM_IN_RATIO * self.extent[4]:
+            self.refit_view()
+            self.record_frame(start_time)
+
+    def record_frame(self, start_time):
+        self.frame_times.append(time.perf_counter() - start_time)
+        self.frame_redraws.append(self.redrawn)
+
+    def blit_strafe(self):
+        """Redraw the traces, the moved sliders and the length text if it changed, each over its saved background"""
+        if self.backgrounds is None:
+            self.redrawn = True
+            self.fig.canvas.draw_idle()
+            return
+        canvas = self.fig.canvas
+        canvas.restore_region(self.backgrounds["traces"])
+        self.ax.draw_artist(self.minus_line)
+        self.ax.draw_artist(self.plus_line)
+        canvas.blit(self.ax.bbox)
+        for name, slider in self.sliders.items():
+            if slider.val != self.drawn_values[name]:
+                canvas.restore_region(self.backgrounds[name])
+                self.draw_slider_artists(slider)
+                canvas.blit(self.slider_region(slider))
+                self.drawn_values[name] = slider.val
+        text = self.length_text.get_text()
+        if text != self.drawn_text:
+            canvas.restore_region(self.backgrounds["info"])
+            self.info_ax.draw_artist(self.length_text)
+            canvas.blit(self.info_ax.bbox)
+            self.drawn_text = text
+
+    def measure_slider_frames(self, steps=50):
+        """Drag every slider across its range and back, then release it. Returns frame times (s) and whether each was a full redraw"""
+        self.fig.canvas.draw()
+        self.frame_times = list()
+        self.frame_redraws = list()
+        for name, _, minimum, maximum, step in STRAFE_SLIDERS:
+            slider = self.sliders[name]
+            initial = slider.val
+            # Values on the step grid, as a mouse drag gives them
+            forward = [quantize_slider_value(value, step) for value in np.linspace(minimum, maximum, steps)]
+            for value in forward + forward[::-1]:
+                slider.set_val(value)
+            slider.set_val(initial)
+            self.end_drag()
+        return np.array(self.frame_times), np.array(self.frame_redraws)
+
     def set_limits(self, xlim=None, ylim=None):
         """Set axis limits"""
         if xlim:
@@ -65,4 +282,33 @@ class TraceVisualizer:
         if self.ax.get_legend_handles_labels()[0]:
             self.ax.legend()
         plt.savefig(filename, dpi=300, bbox_inches='tight')
-        print(f"Saved to {filename}")
\ No newline at end of file
+        print(f"Saved to {filename}")
+
+
+if __name__ == "__main__":
+
+    import sys
+
+    # Usage: viz.py [--benchmark] - interactive Strafe preview, or headless slider frame timing
+    if "--benchmark" in sys.argv:
+        plt.switch_backend("Agg")
+        viz = TraceVisualizer()
+        viz.add_strafe_sliders()
+        frames, redraws = viz.measure_slider_frames()
+        cache = strafe_preview_geometry.cache_info()
+        p95 = np.percentile(frames, 95)
+        print(f"{len(frames)} slider frames, {(frames <= FRAME_BUDGET).mean() * 100:.0f}% within the {FRAME_BUDGET * 1e3:.1f} ms budget, "
+              f"p95 {p95 * 1e3:.1f} ms")
+        for label, selected in (("blitted", frames[~redraws]), ("full redraw", frames[redraws])):
+            if len(selected):
+                print(f"  {label:12} {len(selected):4} frames: median {np.median(selected) * 1e3:6.1f} ms, "
+                      f"p95 {np.percentile(selected, 95) * 1e3:6.1f} ms, max {selected.max() * 1e3:6.1f} ms")
+        print(f"Geometry cache: {cache.hits} hits, {cache.misses} misses")
+        if p95 > FRAME_BUDGET:
+            print(f"p95 frame time is over the {FRAME_BUDGET * 1e3:.1f} ms budget")
+            exit(1)
+        exit(0)
+
+    viz = TraceVisualizer()
+    viz.add_strafe_sliders()
+    viz.show("Strafe")
@@ -0,0 +1,212 @@
+import io
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+from profiling import span
+
+# Pipelined output stage for footprint files.
+#
+# Rendering happens elsewhere (library build workers); finished footprints are
+# handed to FootprintWriter, which writes them on dedicated threads fed by a
+# bounded queue. When the writers fall behind, submit blocks, so a slow disk or
+# network share throttles rendering instead of piling up memory. Per-file latency
+# is overlapped by the writer threads.
+#
+# Every file is written to a temporary name in the target directory and renamed
+# into place, so readers never see half-written footprints. Alternatively the whole
+# library goes into one .zip or .tar archive, written by a single thread to a
+# temporary file that is renamed when the archive is complete.
+
+DEFAULT_THREADS = 16
+DEFAULT_QUEUE_SIZE = 256  # footprints waiting to be written
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+
+ARCHIVE_MODES = {".zip": "zip", ".tar": "w", ".tar.gz": "w:gz", ".tgz": "w:gz", ".tar.xz": "w:xz"}
+
+_DONE = object()
+
+
+def archive_mode(path: str):
+    # zip, a tarfile write mode, or None if path is not an archive
+    for extension, mode in ARCHIVE_MODES.items():
+        if path.endswith(extension):
+            return mode
+    return None
+
+
+def archive_root(path: str):
+    # Directory inside the archive: strafe.pretty.zip -> strafe.pretty
+    for extension in ARCHIVE_MODES:
+        if path.endswith(extension):
+            return os.path.basename(path[:-len(extension)])
+    return os.path.basename(path)
+
+
+def write_atomic(path: str, content: str):
+    """Write content to path through a temporary file in the same directory, renamed into place"""
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ProgressReporter:
+    """Prints one progress line per interval instead of one per file."""
+
+    def __init__(self, total: int, label: str = "footprints", interval: float = PROGRESS_INTERVAL):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.lock = threading.Lock()
+
+    def update(self, count: int = 1):
+        with self.lock:
+            self.done += count
+            now = time.perf_counter()
+            if now - self.last_time >= self.interval:
+                self.last_time = now
+                self._print(now)
+
+    def finish(self):
+        with self.lock:
+            self._print(time.perf_counter())
+
+    def _print(self, now: float):
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        print(f"  {self.done}/{self.total} {self.label} written ({rate:.0f}/s)", flush=True)
+
+
+class FootprintWriter:
+    """Writes footprint files on background threads fed by a bounded queue.
+
+    Use as a context manager, or call close() when all files are submitted. Files
+    that fail to write are collected in errors as (file name, message); a failing
+    archive raises from close().
+    """
+
+    def __init__(self, target: str, threads: int = DEFAULT_THREADS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 progress: ProgressReporter = None):
+        """
+        Args:
+            target (str): Output directory, or an archive path ending in .zip, .tar, .tar.gz, .tgz or .tar.xz
+            threads (int, optional): Writer threads for a directory; an archive always has one
+            queue_size (int, optional): Footprints that may wait for a writer before submit blocks
+            progress (ProgressReporter, optional): Updated after every written file
+        """
+
+        self.target = target
+        self.mode = archive_mode(target)
+        self.progress = progress
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.errors = list()
+        self.written = 0
+        self.bytes_written = 0
+        self.lock = threading.Lock()
+        self.archive = None
+        self.closed = False
+
+        if self.mode is None:
+            os.makedirs(target, exist_ok=True)
+        else:
+            threads = 1
+            self.root = archive_root(target)
+            self.temp_path = f"{target}.tmp"
+            directory = os.path.dirname(target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.mode == "zip":
+                self.archive = zipfile.ZipFile(self.temp_path, "w", compression=zipfile.ZIP_DEFLATED)
+            else:
+                self.archive = tarfile.open(self.temp_path, self.mode)
+
+        self.start_time = time.perf_counter()
+        self.threads = [threading.Thread(target=self._run, name=f"footprint-writer-{i}", daemon=True)
+                        for i in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, file_name: str, content: str):
+        """Queue one file, blocking while the queue is full"""
+        if self.closed:
+            raise ValueError("writer is closed")
+        self.queue.put((file_name, content))
+
+    def _write(self, file_name: str, content: str):
+        with span("write"):
+            data = content.encode("utf-8")
+            if self.mode is None:
+                write_atomic(os.path.join(self.target, file_name), content)
+            elif self.mode == "zip":
+                self.archive.writestr(f"{self.root}/{file_name}", data)
+            else:
+                info = tarfile.TarInfo(f"{self.root}/{file_name}")
+                info.size = len(data)
+                info.mtime = int(time.time())
+                info.mode = 0o644
+                self.archive.addfile(info, io.BytesIO(data))
+        return len(data)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            file_name, content = item
+            try:
+                size = self._write(file_name, content)
+            except Exception as e:
+                # Any failure is recorded: a worker that died here would stop draining the
+                # queue, and submit() would block forever once it is full
+                with self.lock:
+                    self.errors.append((file_name, str(e)))
+                continue
+            with self.lock:
+                self.written += 1
+                self.bytes_written += size
+            if self.progress is not None:
+                self.progress.update()
+
+    def close(self, abort: bool = False):
+        """Wait for the queued files, then finish the archive. With abort, an archive is discarded"""
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self.threads:
+            self.queue.put(_DONE)
+        for thread in self.threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self.start_time
+
+        if self.archive is not None:
+            self.archive.close()
+            if abort or self.errors:
+                os.unlink(self.temp_path)
+                if not abort:
+                    raise OSError(f"could not write {self.errors[0][0]} to {self.target}: {self.errors[0][1]}")
+            else:
+                os.replace(self.temp_path, self.target)
+        if self.progress is not None and not abort:
+            self.progress.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self.close(abort=exc_type is not None)
+        return False